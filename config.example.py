@@ -21,15 +21,118 @@ MODEL_NAME = os.getenv("MODEL_NAME", "gemini-pro")
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1024"))
 
+# LLM backend: "gemini", "local" (the fine-tuned GPT-2 + LoRA model on CPU, no network)
+# or "fake" (canned answers, no network - for tests and benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+FAKE_LLM_FIRST_TOKEN_DELAY = float(os.getenv("FAKE_LLM_FIRST_TOKEN_DELAY", "0.2"))
+FAKE_LLM_TOKEN_DELAY = float(os.getenv("FAKE_LLM_TOKEN_DELAY", "0.02"))
+LOCAL_LLM_BASE_MODEL = os.getenv("LOCAL_LLM_BASE_MODEL", "gpt2")
+LOCAL_LLM_ADAPTER = os.getenv("LOCAL_LLM_ADAPTER", "models/gpt2-jai-resume-lora")  # "": base model only
+LOCAL_LLM_MAX_NEW_TOKENS = int(os.getenv("LOCAL_LLM_MAX_NEW_TOKENS", "128"))
+LOCAL_LLM_TOP_P = float(os.getenv("LOCAL_LLM_TOP_P", "0.9"))
+# Concurrent requests decoded together: up to LOCAL_LLM_MAX_BATCH, gathered for LOCAL_LLM_BATCH_WINDOW_MS
+LOCAL_LLM_MAX_BATCH = int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+LOCAL_LLM_BATCH_WINDOW_MS = float(os.getenv("LOCAL_LLM_BATCH_WINDOW_MS", "10"))
+# Gemini REST endpoint (point it at benchmarks/gemini_stub.py to test failure handling)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "32"))  # kept-alive connections to the API
+# Generation resilience: per-attempt timeout and per-call deadline (seconds), retries with
+# jittered backoff on timeouts/429/5xx, optional hedging, and a circuit breaker; when no
+# answer can be generated the API answers from the retrieved context alone
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "20"))
+LLM_DEADLINE_S = float(os.getenv("LLM_DEADLINE_S", "30"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_RETRY_BACKOFF_S = float(os.getenv("LLM_RETRY_BACKOFF_S", "0.5"))  # doubles per retry
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY_S = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "1.0"))  # hedge after max(this, recent p95)
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))  # consecutive failures that open it
+LLM_BREAKER_RESET_S = float(os.getenv("LLM_BREAKER_RESET_S", "30"))  # open time before a trial call
+
 # RAG Configuration
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 TOP_K_RESULTS = int(os.getenv("TOP_K_RESULTS", "3"))
+# Retrieval mode: "dense" (embeddings), "sparse" (BM25 keywords) or "hybrid" (both, fused)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "dense")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # per retriever, before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Optional rerank stage: a cross-encoder reorders RERANK_CANDIDATES results down to top-k,
+# within RERANK_BUDGET_MS per request (0: no limit); past the budget the retriever's order is kept
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "250"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))  # (query, candidate) pairs per forward pass
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))  # tokens per pair
+# Routing: curated Q&A matches are answered directly and small talk skips retrieval
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_QA_THRESHOLD = float(os.getenv("ROUTER_QA_THRESHOLD", "0.92"))  # cosine similarity to a curated question
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+COLLECTION_NAME = "jai_resume"
+# Vector store backend: "chroma" or "numpy" (exact search in-process, best for small corpora)
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")
+NUMPY_STORE_MMAP = os.getenv("NUMPY_STORE_MMAP", "true").lower() == "true"  # memory-map persisted embeddings
+# Keep the vector index on disk (CHROMA_DB_DIR) and reuse it across restarts
+PERSIST_INDEX = os.getenv("PERSIST_INDEX", "true").lower() == "true"
+
+# Query encoder: LRU cache of query embeddings + micro-batching of concurrent encodes
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+ENCODER_BATCH_WINDOW_MS = float(os.getenv("ENCODER_BATCH_WINDOW_MS", "2"))
+ENCODER_MAX_BATCH = int(os.getenv("ENCODER_MAX_BATCH", "64"))
+# Embedding backend: "torch" (sentence-transformers) or "onnx" (exported model run with
+# ONNX Runtime, no PyTorch at serve time; export with rag-deployment/backend/onnx_encoder.py)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "models/onnx")
+# Embedding model loading: defer it to the first query, and/or use an int8 model
+EMBEDDING_LAZY_LOAD = os.getenv("EMBEDDING_LAZY_LOAD", "false").lower() == "true"
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "false").lower() == "true"
+
+# Concurrency limits (per API worker)
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))  # threads for embedding + vector search
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))  # in-flight LLM calls
+# POST /chat/batch: questions per request, and answers generated at once per request
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "32"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+
+# Semantic response cache (reuses answers for near-identical questions)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))  # cosine similarity
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Prompt assembly (counted with the embedding model's tokenizer, estimated only if it is
+# unavailable; indexed chunk counts are reused when they come from the same tokenizer)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1536"))  # whole prompt, excluding the answer
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "384"))  # newest conversation turns
+
+# Single-flight coalescing: identical concurrent fresh questions share one retrieval + LLM call
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+
+# Per-stage latency histograms (/metrics, Server-Timing header)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Conversation sessions (history kept server-side, keyed by session ID)
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")  # "memory" (one worker) or "sqlite" (shared by workers)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))  # messages kept per session (ring buffer)
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # least recently used evicted first
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))  # across all sessions
+
+# Startup: "background" accepts connections immediately and loads models/index
+# behind it; "blocking" finishes loading before the server starts listening
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "10"))  # seconds a request waits for startup
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "30"))  # min seconds between LLM load retries
+
+# Bulk ingestion (POST /ingest): disabled unless an API key is set (sent as X-API-Key)
+INGEST_API_KEY = os.getenv("INGEST_API_KEY", "")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "128"))  # documents embedded per model call
 
 # Paths
-DATA_DIR = "data"
+DATA_DIR = os.getenv("DATA_DIR", "data")
 MODELS_DIR = "models"
-CHROMA_DB_DIR = "chroma_db"
+CHROMA_DB_DIR = os.getenv("CHROMA_DB_DIR", "chroma_db")
 
 # Fine-tuning Configuration
 FINE_TUNE_MODEL = "gpt2"  # or "microsoft/phi-2"
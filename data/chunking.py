@@ -0,0 +1,88 @@
+"""
+Token-aware chunking: pack sentence/line segments into chunks under a token budget
+"""
+
+import re
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+# Token counting is shared with the backend's prompt assembly, so indexed
+# chunk counts and prompt budgets come from the same implementation
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "rag-deployment" / "backend"))
+from token_counter import DEFAULT_EMBEDDING_MODEL, TokenCounter  # noqa: E402
+
+# Sentence ends inside a line; line breaks in PDF text are also boundaries
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;])\s+(?=[A-Z0-9(])')
+
+DEFAULT_CHUNK_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 32
+
+
+def iter_segments(pages: Iterable[str], clean) -> Iterator[str]:
+    """Split raw page text at line and sentence boundaries, cleaning each segment"""
+    for page in pages:
+        for line in page.splitlines():
+            for sentence in SENTENCE_BOUNDARY.split(line):
+                cleaned = clean(sentence)
+                if cleaned:
+                    yield cleaned
+
+
+def _count_segments(segments: Iterable[str], counter: TokenCounter, max_tokens: int,
+                    batch_size: int = 256) -> Iterator[Tuple[str, int]]:
+    """Attach token counts (tokenized in batches); split segments over the budget by words"""
+    batch = []
+    for segment in segments:
+        batch.append(segment)
+        if len(batch) == batch_size:
+            yield from _counted_batch(batch, counter, max_tokens)
+            batch = []
+    yield from _counted_batch(batch, counter, max_tokens)
+
+
+def _counted_batch(batch: List[str], counter: TokenCounter, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    for text, n_tokens in zip(batch, counter.count_many(batch)):
+        if n_tokens <= max_tokens:
+            yield text, n_tokens
+            continue
+        words = text.split()
+        if len(words) == 1:
+            yield text, n_tokens  # a single huge "word": nothing sensible to split on
+            continue
+        # Split proportionally, then re-check the pieces
+        per_piece = max(1, len(words) * max_tokens // n_tokens)
+        pieces = [' '.join(words[i:i + per_piece]) for i in range(0, len(words), per_piece)]
+        yield from _counted_batch(pieces, counter, max_tokens)
+
+
+def iter_token_chunks(segments: Iterable[str], counter: TokenCounter,
+                      max_tokens: int = DEFAULT_CHUNK_TOKENS,
+                      overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Iterator[Tuple[str, int]]:
+    """
+    Greedily pack segments into chunks of at most `max_tokens` tokens.
+
+    Chunks only break between segments (sentences/lines). Each new chunk
+    starts with the trailing segments of the previous one, up to
+    `overlap_tokens`. Yields (text, token_count); the count is the sum of
+    segment counts, which matches re-tokenizing the joined text for
+    whitespace-pretokenized tokenizers like MiniLM's WordPiece.
+    """
+    window = deque()
+    window_tokens = 0
+    fresh = False  # window holds segments not yet emitted
+
+    for text, n_tokens in _count_segments(segments, counter, max_tokens):
+        if window and window_tokens + n_tokens > max_tokens:
+            yield ' '.join(t for t, _ in window), window_tokens
+            fresh = False
+            # Keep a tail of the chunk as overlap, leaving room for the new segment
+            while window and (window_tokens > overlap_tokens or window_tokens + n_tokens > max_tokens):
+                window_tokens -= window.popleft()[1]
+        window.append((text, n_tokens))
+        window_tokens += n_tokens
+        fresh = True
+
+    if fresh:
+        yield ' '.join(t for t, _ in window), window_tokens
@@ -1,25 +1,55 @@
 """
 Process resume PDFs into structured data for fine-tuning and RAG
+
+PDFs are processed in parallel across a process pool. Each file's pages are
+streamed through cleaning and chunking, and the result is cached under
+data/.cache keyed by the file's SHA-256, so unchanged PDFs are skipped on
+rerun. Outputs are then written incrementally, one cached file at a time.
+
+RAG chunks are packed to a token budget of the embedding model's tokenizer
+at sentence/line boundaries (see chunking.py) and carry their token count,
+so the backend can budget prompt context without re-tokenizing.
+
+Usage:
+    python data/process_data.py [--workers N] [--no-cache]
+                                [--chunk-tokens N] [--overlap-tokens N] [--tokenizer MODEL]
 """
 
+import argparse
+import hashlib
 import json
+import os
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List
 import PyPDF2
 
+from chunking import (DEFAULT_CHUNK_TOKENS, DEFAULT_EMBEDDING_MODEL, DEFAULT_OVERLAP_TOKENS,
+                      TokenCounter, iter_segments, iter_token_chunks)
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract text content from PDF"""
-    text = ""
-    try:
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-    except Exception as e:
-        print(f"Error reading {pdf_path}: {e}")
-    return text
+# Bump when cleaning/chunking changes so cached results are recomputed
+CACHE_VERSION = 3
+CHUNK_OVERLAP = 50
+TRAINING_CHUNK_SIZE = 300
+
+_token_counters: Dict[str, TokenCounter] = {}
+
+
+def get_token_counter(model_name: str) -> TokenCounter:
+    """Tokenizer per model, loaded once per (worker) process"""
+    if model_name not in _token_counters:
+        _token_counters[model_name] = TokenCounter(model_name)
+    return _token_counters[model_name]
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """Yield the text of each PDF page (read errors propagate, so partial text is never cached)"""
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page in pdf_reader.pages:
+            yield page.extract_text() or ""
 
 
 def clean_text(text: str) -> str:
@@ -31,16 +61,28 @@ def clean_text(text: str) -> str:
     return text.strip()
 
 
-def chunk_text(text: str, chunk_size: int = 500, overlap: int = 50) -> List[str]:
-    """Split text into overlapping chunks"""
-    words = text.split()
-    chunks = []
-    
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = ' '.join(words[i:i + chunk_size])
-        chunks.append(chunk)
+def iter_words(texts: Iterable[str]) -> Iterator[str]:
+    """Yield words from a stream of text pieces (e.g. cleaned pages)"""
+    for text in texts:
+        yield from text.split()
+
+
+def iter_chunks(words: Iterable[str], chunk_size: int = 500, overlap: int = 50) -> Iterator[str]:
+    """Yield overlapping chunks from a word stream, holding at most one chunk in memory"""
+    step = chunk_size - overlap
+    window = deque()
+    for word in words:
+        window.append(word)
+        if len(window) == chunk_size:
+            yield ' '.join(window)
+            for _ in range(step):
+                window.popleft()
     
-    return chunks
+    # Tail: the remaining partial windows, still overlapping
+    while window:
+        yield ' '.join(list(window)[:chunk_size])
+        for _ in range(min(step, len(window))):
+            window.popleft()
 
 
 def create_qa_pairs() -> List[Dict[str, str]]:
@@ -90,87 +132,209 @@ def create_qa_pairs() -> List[Dict[str, str]]:
     return qa_pairs
 
 
-def create_training_data(resume_texts: List[str], qa_pairs: List[Dict]) -> List[Dict]:
-    """Create training data in instruction format"""
-    training_data = []
-    
-    # Add Q&A pairs
+def create_training_data(qa_pairs: List[Dict], training_chunks: Iterable[str]) -> Iterator[Dict]:
+    """Create training data in instruction format: Q&A pairs first, then resume context"""
     for qa in qa_pairs:
-        training_data.append({
+        yield {
             "instruction": qa["question"],
             "input": "",
             "output": qa["answer"]
-        })
+        }
+    
+    for chunk in training_chunks:
+        yield {
+            "instruction": "Tell me about your background and experience.",
+            "input": "",
+            "output": chunk
+        }
+
+
+def file_hash(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def process_pdf(pdf_path: Path, cache_dir: Path, use_cache: bool = True,
+                tokenizer: str = DEFAULT_EMBEDDING_MODEL,
+                chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> Dict:
+    """
+    Extract, clean and chunk one PDF (runs in a worker process).
+    
+    The result is written to `cache_dir` as JSON keyed by the file hash and
+    chunking parameters, including whether tokens were counted with the
+    tokenizer or estimated; returns {"name", "cache_path", "cached", "error"}.
+    Estimated counts are used for packing but not stored with the chunks,
+    so the backend counts those chunks itself. A PDF that cannot be read
+    is not cached (`cache_path` None, `error` set) and is retried next run.
+    """
+    counter = get_token_counter(tokenizer)
+    params = hashlib.sha256(f"{counter.name}:{chunk_tokens}:{overlap_tokens}".encode()).hexdigest()[:8]
+    cache_path = cache_dir / f"{file_hash(pdf_path)}.{params}.v{CACHE_VERSION}.json"
+    if use_cache and cache_path.exists():
+        return {"name": pdf_path.name, "cache_path": str(cache_path), "cached": True, "error": None}
+    
+    cleaned_pages = []  # the document text; training chunks are cut from it afterwards
     
-    # Add resume context
-    for i, text in enumerate(resume_texts):
-        chunks = chunk_text(text, chunk_size=300)
-        for chunk in chunks:
-            training_data.append({
-                "instruction": "Tell me about your background and experience.",
-                "input": "",
-                "output": chunk
-            })
+    def raw_pages() -> Iterator[str]:
+        """Pages as they are read, keeping their cleaned text on the way"""
+        for page in iter_pdf_pages(str(pdf_path)):
+            cleaned = clean_text(page)
+            if cleaned:
+                cleaned_pages.append(cleaned)
+            yield page
     
-    return training_data
+    # Written as it is produced: RAG chunks keep raw line/sentence structure
+    # until segmentation, and training chunks consume the cleaned word stream
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("{\n" + f'  "source": {json.dumps(pdf_path.name)},\n  "tokenizer": {json.dumps(counter.name)}')
+            resume_chunks = JsonArrayWriter(f, "resume_chunks")
+            for text, tokens in iter_token_chunks(iter_segments(raw_pages(), clean_text), counter,
+                                                  chunk_tokens, overlap_tokens):
+                resume_chunks.write({"text": text, "tokens": tokens if counter.exact else None,
+                                     "source": pdf_path.name})
+            resume_chunks.close()
+            training_chunks = JsonArrayWriter(f, "training_chunks")
+            for chunk in iter_chunks(iter_words(cleaned_pages), TRAINING_CHUNK_SIZE, CHUNK_OVERLAP):
+                training_chunks.write(chunk)
+            training_chunks.close()
+            f.write(f',\n  "text": {json.dumps(" ".join(cleaned_pages))}\n}}\n')
+    except Exception as e:
+        tmp_path.unlink(missing_ok=True)
+        return {"name": pdf_path.name, "cache_path": None, "cached": False, "error": f"{type(e).__name__}: {e}"}
+    os.replace(tmp_path, cache_path)
+    return {"name": pdf_path.name, "cache_path": str(cache_path), "cached": False, "error": None}
+
+
+def iter_processed(cache_paths: List[str]) -> Iterator[Dict]:
+    """Load processed files back one at a time"""
+    for cache_path in cache_paths:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            yield json.load(f)
+
+
+class JsonArrayWriter:
+    """Write a JSON array item by item inside an already-open object"""
+    
+    def __init__(self, f, key: str, first_key: bool = False):
+        self.f = f
+        self.first = True
+        f.write(("" if first_key else ",\n") + f'  {json.dumps(key)}: [')
+    
+    def write(self, item):
+        self.f.write(("\n    " if self.first else ",\n    ") + json.dumps(item))
+        self.first = False
+    
+    def close(self):
+        self.f.write("]" if self.first else "\n  ]")
 
 
 def main():
     """Main processing pipeline"""
+    parser = argparse.ArgumentParser(description="Process resume PDFs into training and RAG data")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="parallel PDF workers")
+    parser.add_argument("--no-cache", action="store_true", help="reprocess every PDF")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS,
+                        help="token budget per RAG chunk")
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS,
+                        help="tokens carried over between consecutive chunks")
+    parser.add_argument("--tokenizer", default=DEFAULT_EMBEDDING_MODEL,
+                        help="embedding model whose tokenizer sizes the chunks")
+    args = parser.parse_args()
+    
     data_dir = Path(__file__).parent
     output_dir = data_dir
+    cache_dir = data_dir / ".cache"
+    cache_dir.mkdir(exist_ok=True)
     
     print("Processing resumes...")
     
     # Find all PDF files
-    pdf_files = list(data_dir.glob("*.pdf"))
+    pdf_files = sorted(data_dir.glob("*.pdf"))
     
     if not pdf_files:
         print("⚠️  No PDF files found. Please download resumes first!")
         print("Run: python data/download_resumes.py")
         return
     
-    # Extract text from all resumes
-    all_texts = []
-    combined_text = ""
+    # Extract text from all resumes in parallel
+    processed = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(pdf_files)))) as pool:
+        futures = [pool.submit(process_pdf, pdf_file, cache_dir, not args.no_cache,
+                               args.tokenizer, args.chunk_tokens, args.overlap_tokens)
+                   for pdf_file in pdf_files]
+        for future in as_completed(futures):
+            result = future.result()
+            if result["error"]:
+                print(f"⚠️  Error reading {result['name']}, skipping it: {result['error']}")
+                continue
+            processed[result["name"]] = result["cache_path"]
+            print(f"{'Cached' if result['cached'] else 'Processed'}: {result['name']}")
+    cache_paths = [processed[pdf_file.name] for pdf_file in pdf_files if pdf_file.name in processed]
     
-    for pdf_file in pdf_files:
-        print(f"Processing: {pdf_file.name}")
-        text = extract_text_from_pdf(pdf_file)
-        cleaned = clean_text(text)
-        all_texts.append(cleaned)
-        combined_text += cleaned + "\n\n"
-    
-    # Save combined resume text
-    with open(output_dir / "combined_resume.txt", 'w', encoding='utf-8') as f:
-        f.write(combined_text)
-    print(f"✅ Saved combined resume text")
-    
-    # Create Q&A pairs
+    # Create Q&A pairs, with token counts for context budgeting (exact ones only)
     qa_pairs = create_qa_pairs()
+    counter = get_token_counter(args.tokenizer)
+    if counter.exact:
+        texts = [f"Q: {qa['question']}\nA: {qa['answer']}" for qa in qa_pairs]
+        for qa, tokens in zip(qa_pairs, counter.count_many(texts)):
+            qa["tokens"] = tokens
     
-    # Create training data
-    training_data = create_training_data(all_texts, qa_pairs)
-    
-    # Save in different formats
-    
-    # 1. JSONL format for fine-tuning
-    with open(output_dir / "training_data.jsonl", 'w', encoding='utf-8') as f:
-        for item in training_data:
-            f.write(json.dumps(item) + '\n')
-    print(f"✅ Saved {len(training_data)} training examples to training_data.jsonl")
+    # Stream outputs one processed file at a time
+    n_training = 0
+    n_chunks = 0
+    chunk_tokens = []
+    with open(output_dir / "combined_resume.txt", 'w', encoding='utf-8') as combined, \
+            open(output_dir / "training_data.jsonl", 'w', encoding='utf-8') as jsonl, \
+            open(output_dir / "processed_data.json.tmp", 'w', encoding='utf-8') as f:
+        f.write("{\n")
+        f.write(f'  "qa_pairs": {json.dumps(qa_pairs)}')
+        
+        chunks = JsonArrayWriter(f, "resume_chunks")
+        
+        def iter_training_chunks() -> Iterator[str]:
+            """Each file's training chunks, writing its text and RAG chunks on the way"""
+            nonlocal n_chunks
+            for doc in iter_processed(cache_paths):
+                combined.write(doc["text"] + "\n\n")
+                for chunk in doc["resume_chunks"]:
+                    chunks.write(chunk)
+                    if chunk.get("tokens") is not None:
+                        chunk_tokens.append(chunk["tokens"])
+                    n_chunks += 1
+                yield from doc["training_chunks"]
+        
+        for example in create_training_data(qa_pairs, iter_training_chunks()):
+            jsonl.write(json.dumps(example) + '\n')
+            n_training += 1
+        chunks.close()
+        
+        # processed_data.json also embeds the training data: copy it back
+        # from the JSONL file line by line
+        jsonl.flush()
+        training = JsonArrayWriter(f, "training_data")
+        with open(output_dir / "training_data.jsonl", 'r', encoding='utf-8') as written:
+            for line in written:
+                training.write(json.loads(line))
+        training.close()
+        f.write("\n}\n")
+    os.replace(output_dir / "processed_data.json.tmp", output_dir / "processed_data.json")
     
-    # 2. JSON format
-    with open(output_dir / "processed_data.json", 'w', encoding='utf-8') as f:
-        json.dump({
-            "qa_pairs": qa_pairs,
-            "resume_chunks": chunk_text(combined_text),
-            "training_data": training_data
-        }, f, indent=2)
-    print(f"✅ Saved processed data to processed_data.json")
+    print("✅ Saved combined resume text")
+    print(f"✅ Saved {n_training} training examples to training_data.jsonl")
+    print(f"✅ Saved processed data to processed_data.json ({n_chunks} resume chunks)")
+    if chunk_tokens:
+        print(f"   Chunk tokens ({counter.name}): min {min(chunk_tokens)}, "
+              f"mean {sum(chunk_tokens) / len(chunk_tokens):.0f}, max {max(chunk_tokens)}")
     
     print("\n✨ Data processing complete!")
-    print(f"Total training examples: {len(training_data)}")
+    print(f"Total training examples: {n_training}")
     print(f"Total Q&A pairs: {len(qa_pairs)}")
 
 
@@ -14,7 +14,7 @@ def check_dependencies():
     print("🔍 Checking dependencies...")
     
     try:
-        import google.generativeai
+        import httpx
         import chromadb
         import fastapi
         print("✅ All dependencies installed")
@@ -2,15 +2,34 @@
 FastAPI backend for Jai's Resume Chatbot using RAG with Google Gemini
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import google.generativeai as genai
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio
+import contextvars
+import hmac
+import json
+import os
+import time
+import weakref
 import sys
 sys.path.append('../..')
 from config import *
-from embeddings import ResumeRAG
+from llm import LLMError, create_llm
+from prompt_builder import PromptBuilder
+from resilience import ResilientLLM
+from response_cache import SemanticCache
+from session_store import create_session_store, new_session_id
+from coalescing import SingleFlight
+from embeddings import validate_document, summarize_ingest
+from encoder import normalize_query
+from metrics import TimingMiddleware, metrics, request_timings
+from router import QueryRouter
+from startup import StartupTracker
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -26,37 +45,187 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel(MODEL_NAME)
+# Per-stage timings: Server-Timing header per request, histograms at /metrics
+app.add_middleware(TimingMiddleware, paths=("/chat", "/chat/stream", "/chat/batch"))
 
-# Initialize RAG system
+# Configure LLM backend (Gemini, the local fine-tuned model, or the fake for
+# tests); its connection pool or model is loaded in the background at startup. Requests go through llm_client:
+# deadlines, retries, hedging and a circuit breaker
+llm = create_llm()
+llm_client = ResilientLLM(llm)
+
+# Initialize RAG system (set by the "rag" startup phase)
 rag_system = None
 
+# Slow initialization runs after the server starts accepting connections; a
+# failed warm-up leaves the service ready but degraded (queries retry the loads),
+# and a failed LLM load is retried by requests, at most every STARTUP_RETRY_INTERVAL
+startup = StartupTracker("llm", "rag", "warmup", optional=("warmup",), retry_interval=STARTUP_RETRY_INTERVAL)
+
+# Retrieval (SentenceTransformer encode + vector search) is synchronous and
+# CPU-bound, so it runs on its own bounded pool instead of the event loop
+retrieval_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_WORKERS,
+    thread_name_prefix="retrieval"
+)
+
+# asyncio primitives belong to one event loop (on Python 3.9, the loop current
+# when they are created), so each is created on first use in the running loop
+_loop_primitives = weakref.WeakKeyDictionary()
+
+
+def loop_primitive(name: str, factory):
+    """The running loop's primitive `name`, created with `factory()` on first use"""
+    primitives = _loop_primitives.setdefault(asyncio.get_running_loop(), {})
+    if name not in primitives:
+        primitives[name] = factory()
+    return primitives[name]
+
+
+def llm_semaphore() -> asyncio.Semaphore:
+    """Bounds in-flight LLM calls to LLM_MAX_CONCURRENCY"""
+    return loop_primitive("llm", lambda: asyncio.Semaphore(LLM_MAX_CONCURRENCY))
+
+
+def ingest_lock() -> asyncio.Lock:
+    """One /ingest at a time, each a single store batch (saved once when it ends)"""
+    return loop_primitive("ingest", asyncio.Lock)
+
+
+# Bulk ingestion embeds whole batches; one thread keeps it off the retrieval pool
+ingest_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+# Answers for near-identical questions are served from here instead of the LLM.
+# It is invalidated when the index version changes; with Chroma that version
+# is per process, so after an /ingest other workers keep serving their cached
+# answers for up to RESPONSE_CACHE_TTL (the NumPy store's version is shared)
+response_cache = SemanticCache() if RESPONSE_CACHE_ENABLED else None
+
+# Conversation history lives server-side; clients send only the new message
+session_store = create_session_store()
+
+# Curated Q&A answers and small talk bypass retrieval (loaded with the RAG system)
+router = QueryRouter()
+
+# Identical fresh questions in flight at the same time share one retrieval + LLM call
+single_flight = SingleFlight() if COALESCE_REQUESTS else None
+
 
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: Optional[List[dict]] = []
+    session_id: Optional[str] = None  # omitted on the first message; returned in the response
+    conversation_history: Optional[List[dict]] = []  # legacy clients; overrides the stored session
+    retrieval_mode: Optional[Literal["dense", "sparse", "hybrid"]] = None  # default: RETRIEVAL_MODE
 
 
 class ChatResponse(BaseModel):
     response: str
     sources: Optional[List[str]] = []
+    session_id: Optional[str] = None
+    metadata: Optional[Dict] = None  # prompt_tokens, context_chunks, history_turns, cached
+
+
+class BatchChatRequest(BaseModel):
+    questions: List[str]  # answered independently, without conversation history
+    retrieval_mode: Optional[Literal["dense", "sparse", "hybrid"]] = None
+
+
+class BatchAnswer(BaseModel):
+    question: str
+    response: Optional[str] = None
+    sources: Optional[List[str]] = []
+    metadata: Optional[Dict] = None
+    error: Optional[str] = None  # set instead of response if this question failed
+
+
+class BatchChatResponse(BaseModel):
+    answers: List[BatchAnswer]  # in the order of the questions
+    metadata: Optional[Dict] = None
+
+
+def load_rag_system():
+    """Load the embedding model and open (or build) the index"""
+    from embeddings import ResumeRAG  # imports chromadb / sentence-transformers
+    
+    rag = ResumeRAG(
+        data_dir=str(Path("../..") / DATA_DIR),
+        persist_dir=str(Path("../..") / CHROMA_DB_DIR) if PERSIST_INDEX else None
+    )
+    router.load(rag.qa_pairs, rag.embedding_fn)
+    prompt_builder.counter.load()
+    return rag
+
+
+async def initialize():
+    """Startup phases: LLM client and RAG system in parallel, then a warm-up query"""
+    global rag_system
+    _, rag_system = await asyncio.gather(
+        startup.run_phase("llm", llm_client.warm),
+        startup.run_phase("rag", load_rag_system)
+    )
+    if rag_system is None:
+        print(f"⚠️  Warning: Could not initialize RAG system: {startup.phases['rag'].get('error')}")
+        print("The chatbot will work but without resume context.")
+        return
+    if EMBEDDING_LAZY_LOAD:
+        # Each worker loads the embedding model when it serves its first query
+        startup.skip_phase("warmup")
+    else:
+        # First query loads the embedding model (and the reranker, which also
+        # measures its scoring speed for the latency budget) before real traffic does
+        await startup.run_phase("warmup", rag_system.query, "What are your skills?", TOP_K_RESULTS)
+        if "warmup" in startup.degraded:
+            print(f"⚠️  Warm-up query failed ({startup.phases['warmup']['error']}); serving without it")
+    print(f"✅ Ready in {startup.snapshot()['uptime_s']:.1f}s")
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize RAG system on startup"""
-    global rag_system
+    """Initialize the LLM client and RAG system (in the background unless STARTUP_MODE=blocking)"""
     print("🚀 Initializing RAG system...")
-    try:
-        rag_system = ResumeRAG(data_dir="../../data")
-        print("✅ RAG system initialized!")
-    except Exception as e:
-        print(f"⚠️  Warning: Could not initialize RAG system: {e}")
-        print("The chatbot will work but without resume context.")
+    startup.begin()
+    if STARTUP_MODE == "blocking":
+        await initialize()
+    else:
+        app.state.startup_task = asyncio.create_task(initialize())
+
+
+async def wait_until_ready() -> bool:
+    """
+    Wait up to STARTUP_WAIT_TIMEOUT for startup to finish.
+    
+    Raises 503 with Retry-After if the LLM is still loading, and 500 if
+    loading it failed (and retrying it failed again, see
+    StartupTracker.retry); returns False if the RAG system is unavailable,
+    in which case the request is answered without resume context.
+    """
+    deadline = time.perf_counter() + STARTUP_WAIT_TIMEOUT
+    llm_ready = await startup.wait("llm", STARTUP_WAIT_TIMEOUT)
+    if llm_ready == "failed":
+        llm_ready = await startup.retry("llm", max(0.0, deadline - time.perf_counter()))
+    if llm_ready == "failed":
+        raise HTTPException(
+            status_code=500,
+            detail=f"The language model failed to load: {startup.phases['llm'].get('error')}"
+        )
+    if not llm_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is starting up, please try again shortly",
+            headers={"Retry-After": "5"}
+        )
+    return await startup.wait("rag", max(0.0, deadline - time.perf_counter())) is True
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release worker threads and the LLM's HTTP connections"""
+    retrieval_executor.shutdown(wait=False)
+    ingest_executor.shutdown(wait=False)
+    await llm_client.aclose()
 
 
 @app.get("/")
@@ -69,16 +238,303 @@ async def root():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Stage and request latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """200 once startup has finished, 503 before (for platform readiness probes)"""
+    snapshot = startup.snapshot()
+    return JSONResponse(snapshot, status_code=200 if snapshot["ready"] else 503)
+
+
+def health_status() -> str:
+    """Overall status: healthy, degraded (a warm-up failed), failed (a required phase failed) or starting"""
+    if startup.failed:
+        return "failed"
+    if not startup.ready:
+        return "starting"
+    return "degraded" if startup.degraded else "healthy"
+
+
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
     return {
-        "status": "healthy",
+        "status": health_status(),
+        "ready": startup.ready,
+        "worker_pid": os.getpid(),
+        "startup": startup.snapshot(),
         "gemini_configured": bool(GEMINI_API_KEY),
-        "rag_initialized": rag_system is not None
+        "llm_backend": LLM_BACKEND,
+        "llm": llm_client.stats(),
+        "local_llm": llm.stats() if LLM_BACKEND == "local" else None,
+        "rag_initialized": rag_system is not None,
+        "response_cache": response_cache.stats() if response_cache else None,
+        "sessions": session_store.stats(),
+        "coalescing": single_flight.stats() if single_flight else None,
+        "routing": router.stats(),
+        "reranker": rag_system.reranker.stats() if rag_system and rag_system.reranker else None,
+        "stage_timings": metrics.summary() if metrics.enabled else None,
+        "query_encoder": rag_system.query_encoder.stats() if rag_system else None
+    }
+
+
+SYSTEM_PROMPT = """You are a helpful assistant answering questions about Jai Adithya Nayani based on his resume. 
+Be professional, concise, and friendly. If you don't have specific information, provide a helpful general answer.
+Speak in first person as if you are Jai when answering about his experience and background."""
+
+GENERATION_CONFIG = {
+    "temperature": TEMPERATURE,
+    "max_output_tokens": MAX_TOKENS,
+}
+
+
+def quick_route(user_message: str) -> Optional[Dict]:
+    """Routing decisions that need no embedding: small talk and exact curated questions"""
+    if router.is_small_talk(user_message):
+        return {"route": "smalltalk", "qa": None, "chunks": [], "embedding": None}
+    qa = router.match_qa(user_message)
+    if qa:
+        return {"route": "qa", "qa": qa, "chunks": [], "embedding": None}
+    return None
+
+
+def route_messages(user_messages: List[str], mode: Optional[str] = None) -> List[Dict]:
+    """
+    Route each message and retrieve context for those that need it:
+    {"route", "qa", "chunks", "embedding"} per message (see QueryRouter).
+    Messages that need embedding share one encoder pass, and those that
+    still need retrieval after the curated Q&A check share one vector search.
+    """
+    plans = [quick_route(message) or {"route": "rag", "qa": None, "chunks": [], "embedding": None}
+             for message in user_messages]
+    pending = [i for i, plan in enumerate(plans) if plan["route"] == "rag"]
+    if not rag_system or not pending:
+        return plans
+    
+    texts = [user_messages[i] for i in pending]
+    # A single message goes through the encoder's cross-request micro-batching
+    embeddings = rag_system.embed_queries(texts) if len(texts) > 1 else [rag_system.embed_query(texts[0])]
+    to_search = []
+    for i, embedding in zip(pending, embeddings):
+        plans[i]["embedding"] = embedding
+        qa = router.match_qa(user_messages[i], embedding)
+        if qa:
+            plans[i].update(route="qa", qa=qa)
+        else:
+            to_search.append(i)
+    if not to_search:
+        return plans
+    
+    results = rag_system.query_many(
+        [user_messages[i] for i in to_search],
+        top_k=TOP_K_RESULTS,
+        query_embeddings=[plans[i]["embedding"] for i in to_search],
+        mode=mode or RETRIEVAL_MODE
+    )
+    for i, chunks in zip(to_search, results):
+        plans[i]["chunks"] = chunks
+    return plans
+
+
+async def run_retrieval(fn, *args):
+    """Run a retrieval function on the retrieval pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    submitted = time.perf_counter()
+    
+    def run():
+        metrics.observe_stage("retrieval_queue", time.perf_counter() - submitted)
+        return fn(*args)
+    
+    # Copy the request context so stage timings reach this request's Server-Timing header
+    return await loop.run_in_executor(retrieval_executor, contextvars.copy_context().run, run)
+
+
+async def route_message(user_message: str, mode: Optional[str] = None) -> Dict:
+    """Route one message, retrieving on the retrieval pool only if needed (see route_messages)"""
+    return quick_route(user_message) or (await run_retrieval(route_messages, [user_message], mode))[0]
+
+
+# Static system prompt prefix is rendered and counted once
+prompt_builder = PromptBuilder(SYSTEM_PROMPT)
+
+
+def build_prompt(user_message: str, relevant_chunks: List[Dict],
+                 conversation_history: Optional[List[dict]] = None) -> Dict:
+    """Build the LLM prompt within PROMPT_TOKEN_BUDGET (see PromptBuilder.build)"""
+    return prompt_builder.build(user_message, relevant_chunks, conversation_history)
+
+
+def prompt_metadata(built: Optional[Dict], plan: Dict) -> Dict:
+    """Per-request route and prompt size reported to the client"""
+    if plan["route"] == "qa":  # curated answer, no retrieval or LLM call
+        return {"cached": False, "prompt_tokens": 0, "route": "qa", "qa_similarity": plan["qa"]["similarity"]}
+    if built is None:  # answered from the response cache, no prompt sent
+        return {"cached": True, "prompt_tokens": 0, "route": plan["route"]}
+    return {
+        "cached": False,
+        "route": plan["route"],
+        "prompt_tokens": built["prompt_tokens"],
+        "context_chunks": built["context_chunks"],
+        "dropped_chunks": built["dropped_chunks"],
+        "history_turns": built["history_turns"],
+        "question_truncated": built["question_truncated"],
     }
 
 
+def format_sources(relevant_chunks: List[Dict]) -> List[str]:
+    """Short source snippets returned to the client"""
+    return [chunk["text"][:100] + "..." for chunk in relevant_chunks[:2]]
+
+
+def context_answer(relevant_chunks: List[Dict], error: Exception) -> str:
+    """Degraded answer from the retrieved context alone, served when the LLM fails"""
+    print(f"⚠️  LLM unavailable, answering from context: {error}")
+    metrics.increment("llm", "event", "context_answer")
+    if not relevant_chunks:
+        return "I can't answer right now because my language model is unavailable. Please try again in a moment."
+    context = "\n\n".join(chunk["text"] for chunk in relevant_chunks[:2])
+    return ("I can't write a full answer right now, but here is the most relevant part of my resume:\n\n"
+            + context)
+
+
+def load_history(request: ChatRequest) -> Tuple[str, List[dict]]:
+    """Session ID for the request (new if absent) and the conversation so far"""
+    session_id = request.session_id or new_session_id()
+    if request.conversation_history:
+        return session_id, request.conversation_history
+    return session_id, session_store.get(session_id) if request.session_id else []
+
+
+def save_turn(session_id: str, user_message: str, response_text: str):
+    """Record a completed exchange in the session"""
+    session_store.append(session_id, [
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": response_text},
+    ])
+
+
+def cache_key(history: List[dict], query_embedding, relevant_chunks: List[Dict]) -> Optional[Dict]:
+    """Arguments identifying a cacheable request, or None if it must not be cached"""
+    # Answers depend on the conversation so far, so only cache fresh questions
+    if response_cache is None or query_embedding is None or history:
+        return None
+    return {
+        "embedding": query_embedding,
+        "source_ids": [chunk["id"] for chunk in relevant_chunks],
+        "index_version": rag_system.index_version,
+    }
+
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def coalescing_key(user_message: str, history: List[dict], mode: Optional[str]) -> Optional[Tuple]:
+    """Key under which identical concurrent requests share work, or None if they must not"""
+    # With history the answer depends on the conversation, so never share it
+    if single_flight is None or history:
+        return None
+    return normalize_query(user_message), mode or RETRIEVAL_MODE
+
+
+def qa_sources(qa: Dict) -> List[str]:
+    """Source shown for a curated Q&A answer"""
+    return [f"Q: {qa['question']}"]
+
+
+async def generate_answer(user_message: str, history: List[dict], mode: Optional[str]) -> Dict:
+    """Route, retrieve, consult the cache and generate: {"response", "sources", "metadata"}"""
+    plan = await route_message(user_message, mode)
+    return await answer_from_context(user_message, history, plan)
+
+
+async def answer_from_context(user_message: str, history: List[dict], plan: Dict) -> Dict:
+    """generate_answer after routing and retrieval: consult the cache, then generate"""
+    router.record(plan["route"])
+    if plan["route"] == "qa":
+        return {"response": plan["qa"]["answer"], "sources": qa_sources(plan["qa"]),
+                "metadata": prompt_metadata(None, plan)}
+    relevant_chunks, query_embedding = plan["chunks"], plan["embedding"]
+    sources = format_sources(relevant_chunks)
+    
+    key = cache_key(history, query_embedding, relevant_chunks)
+    if key:
+        with metrics.timer("cache_lookup"):
+            cached = response_cache.get(**key)
+        if cached:
+            return dict(cached, metadata=prompt_metadata(None, plan))
+    
+    with metrics.timer("prompt"):
+        built = build_prompt(user_message, relevant_chunks, history)
+    
+    # Generate response with the LLM backend
+    try:
+        async with llm_semaphore():
+            with metrics.timer("llm"):
+                response_text = await llm_client.agenerate(built["prompt"], GENERATION_CONFIG)
+    except LLMError as e:
+        return {"response": context_answer(relevant_chunks, e), "sources": sources,
+                "metadata": dict(prompt_metadata(built, plan), llm_fallback=True)}
+    
+    if key:
+        response_cache.put(response=response_text, sources=sources, **key)
+    return {"response": response_text, "sources": sources, "metadata": prompt_metadata(built, plan)}
+
+
+async def generate_events(user_message: str, history: List[dict], mode: Optional[str]) -> AsyncIterator[Tuple[str, Dict]]:
+    """Streaming counterpart of generate_answer: (event, data) for sources, tokens and done"""
+    plan = await route_message(user_message, mode)
+    router.record(plan["route"])
+    if plan["route"] == "qa":
+        answer = plan["qa"]["answer"]
+        yield "sources", {"sources": qa_sources(plan["qa"])}
+        yield "token", {"text": answer}
+        yield "done", {"response": answer, "tokens": 1, **prompt_metadata(None, plan)}
+        return
+    relevant_chunks, query_embedding = plan["chunks"], plan["embedding"]
+    sources = format_sources(relevant_chunks)
+    yield "sources", {"sources": sources}
+    
+    key = cache_key(history, query_embedding, relevant_chunks)
+    with metrics.timer("cache_lookup"):
+        cached = response_cache.get(**key) if key else None
+    
+    parts = []
+    built = None
+    fallback = {}
+    if cached:
+        parts.append(cached["response"])
+        yield "token", {"text": cached["response"]}
+    else:
+        with metrics.timer("prompt"):
+            built = build_prompt(user_message, relevant_chunks, history)
+        try:
+            async with llm_semaphore():
+                start = time.perf_counter()
+                async for text in llm_client.astream(built["prompt"], GENERATION_CONFIG):
+                    if not parts:
+                        metrics.observe_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(text)
+                    yield "token", {"text": text}
+                metrics.observe_stage("llm", time.perf_counter() - start)
+        except LLMError as e:
+            if parts:  # the client already has part of an answer
+                raise
+            parts.append(context_answer(relevant_chunks, e))
+            fallback = {"llm_fallback": True}
+            yield "token", {"text": parts[0]}
+        if key and not fallback:
+            response_cache.put(response="".join(parts), sources=sources, **key)
+    
+    yield "done", {"response": "".join(parts), "tokens": len(parts), **prompt_metadata(built, plan), **fallback}
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Main chat endpoint"""
@@ -88,52 +544,262 @@ async def chat(request: ChatRequest):
         if not user_message:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
         
-        # Get relevant context from RAG
-        relevant_chunks = []
-        if rag_system:
-            relevant_chunks = rag_system.query(user_message, top_k=TOP_K_RESULTS)
-        
-        # Build context
-        context = ""
-        if relevant_chunks:
-            context = "Based on Jai's resume:\n\n"
-            context += "\n\n".join([chunk["text"] for chunk in relevant_chunks])
-            context += "\n\n"
-        
-        # Build prompt
-        system_prompt = """You are a helpful assistant answering questions about Jai Adithya Nayani based on his resume. 
-Be professional, concise, and friendly. If you don't have specific information, provide a helpful general answer.
-Speak in first person as if you are Jai when answering about his experience and background."""
-        
-        full_prompt = f"""{system_prompt}
-
-{context}Question: {user_message}
-
-Answer:"""
-        
-        # Generate response with Gemini
-        response = model.generate_content(
-            full_prompt,
-            generation_config={
-                "temperature": TEMPERATURE,
-                "max_output_tokens": MAX_TOKENS,
-            }
-        )
+        context_ready = await wait_until_ready()
+        session_id, history = load_history(request)
+        key = coalescing_key(user_message, history, request.retrieval_mode)
+        if key:
+            answer, coalesced = await single_flight.call(
+                key, lambda: generate_answer(user_message, history, request.retrieval_mode)
+            )
+        else:
+            answer, coalesced = await generate_answer(user_message, history, request.retrieval_mode), False
+        save_turn(session_id, user_message, answer["response"])
         
         return ChatResponse(
-            response=response.text,
-            sources=[chunk["text"][:100] + "..." for chunk in relevant_chunks[:2]]
+            response=answer["response"],
+            sources=answer["sources"],
+            session_id=session_id,
+            metadata=dict(answer["metadata"], coalesced=coalesced, degraded=not context_ready)
         )
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streaming chat endpoint (server-sent events).
+    
+    Emits a `sources` event first, then one `token` event per generated
+    text fragment, and finally a `done` event with the full response and
+    timing summary. Failures after the stream has started are reported
+    as an `error` event. Identical concurrent questions subscribe to one
+    shared generation, replaying any tokens they missed.
+    """
+    user_message = request.message.strip()
+    
+    if not user_message:
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    context_ready = await wait_until_ready()
+    
+    async def event_stream() -> AsyncIterator[str]:
+        start = time.perf_counter()
+        try:
+            session_id, history = load_history(request)
+            key = coalescing_key(user_message, history, request.retrieval_mode)
+            if key:
+                events, coalesced = single_flight.stream(
+                    key, lambda: generate_events(user_message, history, request.retrieval_mode)
+                )
+            else:
+                events, coalesced = generate_events(user_message, history, request.retrieval_mode), False
+            
+            first_token_at = None
+            async for event, data in events:
+                if event == "sources":
+                    data = dict(data, session_id=session_id)
+                elif event == "token" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                elif event == "done":
+                    save_turn(session_id, user_message, data["response"])
+                    end = time.perf_counter()
+                    data = dict(
+                        data,
+                        session_id=session_id,
+                        coalesced=coalesced,
+                        degraded=not context_ready,
+                        time_to_first_token_ms=round(((first_token_at or end) - start) * 1000, 1),
+                        total_ms=round((end - start) * 1000, 1),
+                        # Streamed responses send headers before any stage runs,
+                        # so their Server-Timing equivalent is reported here
+                        stages_ms={stage: round(ms, 2) for stage, ms in (request_timings() or {}).items()},
+                    )
+                yield sse_event(event, data)
+        except Exception as e:
+            print(f"Error: {e}")
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def read_documents(request: Request) -> AsyncIterator[Tuple[int, object]]:
+    """
+    (line number, parsed JSON or ValueError) for each document in the body:
+    a JSON object {"documents": [...]} or JSON array, or JSON Lines (one
+    document per line), which is parsed as it streams in.
+    """
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        documents = body.get("documents") if isinstance(body, dict) else body
+        if not isinstance(documents, list):
+            raise HTTPException(status_code=400, detail='Expected {"documents": [...]} or a JSON array')
+        for i, document in enumerate(documents, 1):
+            yield i, document
+        return
+    
+    buffer = b""
+    line_no = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as e:
+                    yield line_no, e
+    if buffer.strip():
+        try:
+            yield line_no + 1, json.loads(buffer)
+        except ValueError as e:
+            yield line_no + 1, e
+
+
+@app.post("/ingest")
+async def ingest(request: Request):
+    """
+    Bulk-add documents to the knowledge base.
+    
+    Send JSON Lines (one {"text", "metadata"?, "id"?} per line) or JSON
+    with a "documents" list, with the INGEST_API_KEY as X-API-Key. Documents
+    are embedded INGEST_BATCH_SIZE at a time while the next batch is parsed;
+    invalid ones are skipped and listed under "errors". Documents without
+    an "id" are keyed by a hash of their text, so re-sending them is
+    reported as duplicates rather than stored twice. A persisted index is
+    saved once per request, after the last batch.
+    """
+    if not INGEST_API_KEY or not hmac.compare_digest(request.headers.get("x-api-key", ""), INGEST_API_KEY):
+        raise HTTPException(status_code=403, detail="Ingestion is disabled or the API key is wrong")
+    await wait_until_ready()
+    if rag_system is None:
+        raise HTTPException(status_code=503, detail="The knowledge base is not loaded", headers={"Retry-After": "5"})
+    
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    reports, errors = [], []
+    batch = []
+    pending = None  # previous batch, embedding while this one fills
+    async with ingest_lock():
+        # The batch is begun and ended on the ingest thread, like every write
+        await loop.run_in_executor(ingest_executor, rag_system.store.begin_batch)
+        try:
+            async for line_no, document in read_documents(request):
+                try:
+                    if isinstance(document, ValueError):
+                        raise ValueError(f"invalid JSON: {document}")
+                    batch.append(validate_document(document))
+                except ValueError as e:
+                    errors.append({"line": line_no, "error": str(e)})
+                    continue
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    if pending:
+                        reports.append(await pending)
+                    pending = loop.run_in_executor(ingest_executor, rag_system.add_batch, batch)
+                    batch = []
+            if pending:
+                reports.append(await pending)
+            if batch:
+                reports.append(await loop.run_in_executor(ingest_executor, rag_system.add_batch, batch))
+        finally:
+            await loop.run_in_executor(ingest_executor, rag_system.store.end_batch)
+    
+    report = summarize_ingest(reports, time.perf_counter() - start)
+    print(f"📥 Ingested {report['added']}/{report['received']} documents in {report['total_s']:.2f}s")
+    return dict(report, errors=errors, index_version=rag_system.index_version)
+
+
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer a list of independent questions in one request.
+    
+    All questions are embedded in one encoder pass and retrieved with one
+    vector search; answers are then generated concurrently, at most
+    CHAT_BATCH_CONCURRENCY at a time (and within LLM_MAX_CONCURRENCY),
+    and returned in question order. Repeated questions are answered once.
+    A failed question carries an `error` instead of failing the batch.
+    """
+    questions = [question.strip() for question in request.questions]
+    if not questions or not all(questions):
+        raise HTTPException(status_code=400, detail="Questions must be a non-empty list of non-empty strings")
+    if len(questions) > CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {CHAT_BATCH_MAX_QUESTIONS} questions per batch")
+    
+    context_ready = await wait_until_ready()
+    start = time.perf_counter()
+    
+    # One slot per distinct question (after the response cache's normalization)
+    slots = {}
+    for question in questions:
+        slots.setdefault(normalize_query(question), question)
+    unique = list(slots.values())
+    try:
+        plans = await run_retrieval(route_messages, unique, request.retrieval_mode)
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    retrieved_at = time.perf_counter()
+    
+    semaphore = asyncio.Semaphore(CHAT_BATCH_CONCURRENCY)
+    
+    async def answer(question: str, plan: Dict) -> Dict:
+        if plan["route"] == "qa":  # no LLM call to bound
+            return await answer_from_context(question, [], plan)
+        async with semaphore:
+            return await answer_from_context(question, [], plan)
+    
+    results = await asyncio.gather(
+        *(answer(question, plan) for question, plan in zip(unique, plans)),
+        return_exceptions=True
+    )
+    by_key = dict(zip(slots, results))
+    
+    answers = []
+    for question in questions:
+        result = by_key[normalize_query(question)]
+        if isinstance(result, Exception):
+            print(f"Error: {result}")
+            answers.append(BatchAnswer(question=question, error=str(result)))
+        else:
+            answers.append(BatchAnswer(
+                question=question,
+                response=result["response"],
+                sources=result["sources"],
+                metadata=dict(result["metadata"], degraded=not context_ready)
+            ))
+    
+    end = time.perf_counter()
+    return BatchChatResponse(answers=answers, metadata={
+        "questions": len(questions),
+        "unique_questions": len(unique),
+        "failed": sum(answer.error is not None for answer in answers),
+        "retrieval_ms": round((retrieved_at - start) * 1000, 1),
+        "total_ms": round((end - start) * 1000, 1),
+    })
+
+
+class ResetRequest(BaseModel):
+    session_id: Optional[str] = None
 
 
 @app.post("/reset")
-async def reset_conversation():
+async def reset_conversation(request: Optional[ResetRequest] = None):
     """Reset conversation history"""
-    return {"status": "conversation reset"}
+    cleared = bool(request and request.session_id and session_store.clear(request.session_id))
+    return {"status": "conversation reset", "cleared": cleared}
 
 
 if __name__ == "__main__":
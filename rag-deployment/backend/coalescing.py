@@ -0,0 +1,106 @@
+"""
+Single-flight request coalescing: identical concurrent requests share one execution
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class SharedStream:
+    """
+    Fan out one async iterator to any number of subscribers.
+
+    Items are buffered, so a subscriber that joins late first replays
+    everything produced so far and then follows live. The source runs in
+    its own task and is not cancelled when a subscriber disconnects.
+    """
+
+    def __init__(self, source: AsyncIterator):
+        """Start pumping `source`"""
+        self.items: List = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator):
+        try:
+            async for item in source:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        """Yield every item from the start; re-raises the source's exception"""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: position < len(self.items) or self.done)
+                items = self.items[position:]
+                finished = self.done
+            position += len(items)
+            for item in items:
+                yield item
+            if finished:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key.
+
+    The first caller for a key (the leader) starts the work; callers with
+    the same key that arrive while it is in flight wait for, and share,
+    its result. Once the work finishes the key is released, so later
+    requests start fresh.
+    """
+
+    def __init__(self):
+        """Create an empty in-flight table"""
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._streams: Dict[Hashable, SharedStream] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def call(self, key: Hashable, fn: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Result of `fn()` (shared with concurrent callers), and whether it was coalesced"""
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Shielded: one waiter disconnecting must not cancel the others' result
+        return await asyncio.shield(task), coalesced
+
+    def stream(self, key: Hashable, fn: Callable[[], AsyncIterator]) -> Tuple[AsyncIterator, bool]:
+        """Subscription to the items of `fn()` (shared with concurrent callers), and whether it was coalesced"""
+        shared = self._streams.get(key)
+        coalesced = shared is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.leaders += 1
+            shared = SharedStream(fn())
+            self._streams[key] = shared
+            shared.task.add_done_callback(lambda _: self._streams.pop(key, None))
+        return shared.subscribe(), coalesced
+
+    def stats(self) -> Dict:
+        """Counters for /health"""
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
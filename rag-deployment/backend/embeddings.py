@@ -1,93 +1,206 @@
 """
-RAG system using ChromaDB for semantic search over resume data
+RAG system using ChromaDB (or in-process NumPy search) for semantic search over resume data
 """
 
-import chromadb
-from chromadb.utils import embedding_functions
+from contextlib import contextmanager
 from pathlib import Path
+import hashlib
 import json
-from typing import List, Dict
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import sys
 sys.path.append('../..')
 from config import *
+from encoder import QueryEncoder, create_embedder
+from metrics import metrics
+from reranker import CrossEncoderReranker
+from sparse_index import BM25Index, reciprocal_rank_fusion
+from vector_store import create_vector_store
+
+
+# Document types managed by the index sync (anything else, e.g. documents
+# added through add_document, is left alone)
+MANAGED_TYPES = ("resume_chunk", "qa_pair", "default")
+
+
+def content_id(prefix: str, text: str) -> str:
+    """Stable document ID derived from its content"""
+    return f"{prefix}_{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+
+def validate_document(document) -> Dict:
+    """
+    Check one document for ingestion: {"text": str, "metadata": {...}, "id": str},
+    metadata and id optional. Returns it normalized; raises ValueError.
+    """
+    if not isinstance(document, dict):
+        raise ValueError("expected a JSON object")
+    text = document.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('"text" must be a non-empty string')
+    metadata = document.get("metadata") or {}
+    if not isinstance(metadata, dict) or not all(
+        isinstance(key, str) and isinstance(value, (str, int, float, bool)) for key, value in metadata.items()
+    ):
+        raise ValueError('"metadata" must map strings to strings, numbers or booleans')
+    doc_id = document.get("id")
+    if doc_id is not None and (not isinstance(doc_id, str) or not doc_id):
+        raise ValueError('"id" must be a non-empty string')
+    return {"text": text, "metadata": dict(metadata, type=metadata.get("type", "custom")), "id": doc_id}
+
+
+def summarize_ingest(batch_reports: List[Dict], elapsed_s: float) -> Dict:
+    """Totals and throughput for a bulk ingest from its per-batch reports"""
+    report = {"received": 0, "added": 0, "duplicates": 0, "batches": len(batch_reports), "embed_s": 0.0, "write_s": 0.0}
+    for batch_report in batch_reports:
+        for key in ("received", "added", "duplicates", "embed_s", "write_s"):
+            report[key] += batch_report[key]
+    report.update(
+        embed_s=round(report["embed_s"], 3),
+        write_s=round(report["write_s"], 3),
+        total_s=round(elapsed_s, 3),
+        docs_per_s=round(report["received"] / elapsed_s, 1) if elapsed_s > 0 else None
+    )
+    return report
+
+
+@contextmanager
+def index_lock(persist_dir: Optional[str]):
+    """
+    Exclusive lock on a persisted index while it is opened and synced.
+    
+    API workers starting together take turns: the first one builds the
+    index, the others then find it current and just open it.
+    """
+    if not persist_dir:
+        yield
+        return
+    try:
+        import fcntl
+    except ImportError:  # Windows: no advisory locks, run one worker
+        yield
+        return
+    Path(persist_dir).mkdir(parents=True, exist_ok=True)
+    with open(Path(persist_dir) / ".index.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
 
 
 class ResumeRAG:
     """RAG system for resume-based Q&A"""
     
-    def __init__(self, data_dir: str = "../../data"):
-        """Initialize RAG system"""
+    def __init__(self, data_dir: str = "../../data", persist_dir: Optional[str] = None,
+                 embedding_model: str = EMBEDDING_MODEL, vector_store: str = VECTOR_STORE,
+                 embedding_backend: str = EMBEDDING_BACKEND, quantize: bool = EMBEDDING_QUANTIZE,
+                 embedding_fn: Optional[Callable] = None,
+                 reranker: Optional[CrossEncoderReranker] = None):
+        """
+        Initialize RAG system.
+        
+        With `persist_dir` set, embeddings are stored on disk and reused on
+        the next start as long as the source data and embedding model are
+        unchanged; otherwise an in-memory index is built on every start.
+        `vector_store` selects the backend ("chroma" or "numpy"). The numpy
+        store's persisted embeddings are memory-mapped, so API workers on
+        one host share a single copy. `embedding_backend` is "torch" or
+        "onnx" (see onnx_encoder.py); apart from Chroma's own
+        sentence-transformers function, the model is loaded on first embed.
+        Pass an `embedding_fn` from create_embedder() to share one loaded
+        model between several instances. `reranker` adds a rerank stage
+        to every query (by default one is created when RERANK_ENABLED).
+        """
         self.data_dir = Path(data_dir)
         
-        # Initialize ChromaDB
-        self.client = chromadb.Client()
+        if embedding_fn is not None:
+            self.embedding_fn = embedding_fn
+            self.embedding_model = getattr(embedding_fn, "id", embedding_model)
+        elif vector_store == "chroma" and embedding_backend == "torch" and not quantize:
+            # Chroma stores the embedding function's config with the collection
+            from chromadb.utils import embedding_functions
+            
+            self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name=embedding_model
+            )
+            self.embedding_model = embedding_model
+        else:
+            self.embedding_fn = create_embedder(embedding_model, embedding_backend, quantize)
+            self.embedding_model = self.embedding_fn.id  # includes backend quantization
+        # Memoized, micro-batched encoder for incoming queries
+        self.query_encoder = QueryEncoder(self.embedding_fn)
         
-        # Use sentence transformers for embeddings
-        self.embedding_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+        # Keyword index over the same documents, for sparse/hybrid retrieval
+        self.sparse_index = BM25Index()
+        self._sparse_version = None
+        self._sparse_lock = threading.Lock()
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="jai_resume",
-            embedding_function=self.embedding_fn
-        )
+        # Optional cross-encoder rerank of a wider candidate set
+        if reranker is None and RERANK_ENABLED:
+            reranker = CrossEncoderReranker()
+        self.reranker = reranker
         
-        # Load resume data
-        self._load_resume_data()
+        self.qa_pairs: List[Dict] = []  # curated {"question", "answer"} pairs from processed data
+        self.last_sync = None
+        self._write_lock = threading.Lock()  # serializes bulk-ingest writes
+        
+        # Open the vector store and load resume data (built by one process at a time)
+        with index_lock(persist_dir):
+            self.store = create_vector_store(vector_store, COLLECTION_NAME, self.embedding_fn, persist_dir)
+            self._load_resume_data()
+        self._ensure_sparse_index()
     
-    def _load_resume_data(self):
-        """Load and index resume data"""
+    def _read_documents(self) -> Tuple[List[str], List[Dict], List[str]]:
+        """Read documents, metadatas and ids to index from processed data"""
         processed_data_path = self.data_dir / "processed_data.json"
         
         if not processed_data_path.exists():
             print("⚠️  Processed data not found. Using default data.")
-            self._create_default_data()
-            return
+            return self._default_documents()
         
         print(f"📥 Loading resume data from {processed_data_path}")
         
         with open(processed_data_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
-        # Check if collection is empty
-        if self.collection.count() > 0:
-            print(f"✅ Collection already has {self.collection.count()} documents")
-            return
-        
-        # Add resume chunks
         chunks = data.get("resume_chunks", [])
         qa_pairs = data.get("qa_pairs", [])
+        self.qa_pairs = qa_pairs
         
         documents = []
         metadatas = []
         ids = []
         
-        # Add resume chunks
+        # Add resume chunks (plain strings from older processed_data.json files,
+        # {"text", "tokens", "source"} objects from the token-aware chunker)
         for i, chunk in enumerate(chunks):
-            documents.append(chunk)
-            metadatas.append({"type": "resume_chunk", "index": i})
-            ids.append(f"chunk_{i}")
+            if isinstance(chunk, str):
+                chunk = {"text": chunk}
+            metadata = {"type": "resume_chunk", "index": i}
+            for key in ("tokens", "source"):
+                if chunk.get(key) is not None:
+                    metadata[key] = chunk[key]
+            documents.append(chunk["text"])
+            metadatas.append(metadata)
+            ids.append(content_id("chunk", chunk["text"]))
         
         # Add Q&A pairs
         for i, qa in enumerate(qa_pairs):
             # Add both question and answer for better retrieval
             text = f"Q: {qa['question']}\nA: {qa['answer']}"
+            metadata = {"type": "qa_pair", "index": i}
+            if qa.get("tokens") is not None:
+                metadata["tokens"] = qa["tokens"]
             documents.append(text)
-            metadatas.append({"type": "qa_pair", "index": i})
-            ids.append(f"qa_{i}")
-        
-        # Add to collection
-        if documents:
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            print(f"✅ Indexed {len(documents)} documents")
+            metadatas.append(metadata)
+            ids.append(content_id("qa", text))
+        
+        return documents, metadatas, ids
     
-    def _create_default_data(self):
-        """Create default data if no processed data exists"""
+    def _default_documents(self) -> Tuple[List[str], List[Dict], List[str]]:
+        """Default data used if no processed data exists"""
         default_data = [
             "Jai Adithya Nayani is a software engineer specializing in AI/ML and full-stack development.",
             "Proficient in Python, Java, C++, JavaScript with expertise in machine learning frameworks.",
@@ -96,41 +209,268 @@ class ResumeRAG:
             "Strong background in computer vision, NLP, and data engineering.",
             "Passionate about building scalable AI systems and solving real-world problems."
         ]
-        
-        self.collection.add(
-            documents=default_data,
-            metadatas=[{"type": "default", "index": i} for i in range(len(default_data))],
-            ids=[f"default_{i}" for i in range(len(default_data))]
+        return (
+            default_data,
+            [{"type": "default", "index": i} for i in range(len(default_data))],
+            [content_id("default", text) for text in default_data]
         )
-        print(f"✅ Created default knowledge base with {len(default_data)} documents")
     
-    def query(self, query_text: str, top_k: int = 3) -> List[Dict]:
-        """Query the knowledge base"""
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=top_k
+    def _index_hash(self, documents: List[str], metadatas: List[Dict], ids: List[str]) -> str:
+        """Content hash identifying an index build (source data + embedding model)"""
+        payload = json.dumps(
+            {"model": self.embedding_model, "documents": documents, "metadatas": metadatas, "ids": ids},
+            sort_keys=True
         )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _load_resume_data(self):
+        """Load and index resume data, reusing a persisted index when it is current"""
+        start = time.perf_counter()
+        documents, metadatas, ids = self._read_documents()
+        index_hash = self._index_hash(documents, metadatas, ids)
         
-        # Format results
-        formatted_results = []
-        if results and results['documents']:
-            for i, doc in enumerate(results['documents'][0]):
-                formatted_results.append({
-                    "text": doc,
-                    "metadata": results['metadatas'][0][i],
-                    "distance": results['distances'][0][i] if 'distances' in results else None
-                })
+        # The hash is only written after a complete sync, so a match means
+        # the stored embeddings are exactly what we would compute now
+        if self.store.metadata.get("index_hash") == index_hash:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"✅ Loaded persisted index with {self.store.count()} documents in {elapsed_ms:.0f} ms")
+            return
         
-        return formatted_results
+        with self.store.batch():
+            self.sync_index(documents, metadatas, ids)
+            self.store.set_metadata({"index_hash": index_hash, "embedding_model": self.embedding_model})
     
-    def add_document(self, text: str, metadata: Dict = None):
-        """Add a new document to the knowledge base"""
-        doc_id = f"custom_{self.collection.count()}"
-        self.collection.add(
-            documents=[text],
-            metadatas=[metadata or {"type": "custom"}],
-            ids=[doc_id]
+    def sync_index(self, documents: List[str], metadatas: List[Dict], ids: List[str]) -> Dict:
+        """
+        Bring the vector store in line with the given documents.
+        
+        IDs are content-derived, so a document whose ID is already indexed
+        is unchanged and is not re-embedded (only its metadata is refreshed
+        if it moved). New IDs are embedded and managed documents that are no
+        longer present are deleted. Returns counts and per-phase timings.
+        """
+        timings = {}
+        
+        # Existing embeddings are unusable if they came from another model
+        stored_model = self.store.metadata.get("embedding_model")
+        if stored_model and stored_model != self.embedding_model:
+            print(f"🔄 Embedding model changed ({stored_model} -> {self.embedding_model}), rebuilding index")
+            self.store.reset()
+        
+        # Diff wanted documents against what is indexed
+        phase_start = time.perf_counter()
+        wanted = {}
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            wanted.setdefault(doc_id, (document, metadata))
+        
+        existing_metadata = self.store.get_metadatas()
+        
+        to_add = [doc_id for doc_id in wanted if doc_id not in existing_metadata]
+        to_update = [
+            doc_id for doc_id in wanted
+            if doc_id in existing_metadata and existing_metadata[doc_id] != wanted[doc_id][1]
+        ]
+        to_delete = [
+            doc_id for doc_id, metadata in existing_metadata.items()
+            if doc_id not in wanted and (metadata or {}).get("type") in MANAGED_TYPES
+        ]
+        timings["diff_ms"] = (time.perf_counter() - phase_start) * 1000
+        
+        phase_start = time.perf_counter()
+        if to_delete:
+            self.store.delete(to_delete)
+        timings["delete_ms"] = (time.perf_counter() - phase_start) * 1000
+        
+        phase_start = time.perf_counter()
+        if to_update:
+            self.store.update_metadatas(to_update, [wanted[doc_id][1] for doc_id in to_update])
+        timings["update_ms"] = (time.perf_counter() - phase_start) * 1000
+        
+        phase_start = time.perf_counter()
+        if to_add:
+            self.store.add(
+                documents=[wanted[doc_id][0] for doc_id in to_add],
+                metadatas=[wanted[doc_id][1] for doc_id in to_add],
+                ids=to_add
+            )
+        timings["embed_ms"] = (time.perf_counter() - phase_start) * 1000
+        
+        report = {
+            "embedded": len(to_add),
+            "skipped": len(wanted) - len(to_add),
+            "deleted": len(to_delete),
+            "metadata_updated": len(to_update),
+            "timings_ms": {phase: round(ms, 1) for phase, ms in timings.items()},
+        }
+        self.last_sync = report
+        print(
+            f"✅ Index synced: {report['embedded']} embedded, {report['skipped']} skipped, "
+            f"{report['deleted']} deleted "
+            f"(diff {timings['diff_ms']:.0f} ms, delete {timings['delete_ms']:.0f} ms, "
+            f"embed {timings['embed_ms']:.0f} ms)"
         )
+        return report
+    
+    @property
+    def index_version(self) -> int:
+        """Changes whenever indexed content changes, also when another worker sharing the index changed it"""
+        return self.store.version
+    
+    def embed_query(self, query_text: str) -> List[float]:
+        """Embed a query with the index's embedding model"""
+        with metrics.timer("embed"):
+            return self.query_encoder.encode(query_text)
+    
+    def _ensure_sparse_index(self):
+        """(Re)build the BM25 postings if the indexed documents changed"""
+        with self._sparse_lock:
+            if self._sparse_version == self.index_version:
+                return
+            start = time.perf_counter()
+            self.sparse_index.build(*self.store.get_documents())
+            self._sparse_version = self.index_version
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"✅ Built keyword index over {len(self.sparse_index.ids)} documents in {elapsed_ms:.0f} ms")
+    
+    def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """Embed several queries, all cache misses in one model pass"""
+        with metrics.timer("embed"):
+            return self.query_encoder.encode_many(query_texts)
+    
+    def query(self, query_text: str, top_k: int = 3, query_embedding: Optional[List[float]] = None,
+              where: Optional[Dict] = None, mode: str = RETRIEVAL_MODE,
+              rerank: bool = True) -> List[Dict]:
+        """
+        Query the knowledge base.
+        
+        `mode` is "dense" (embedding similarity), "sparse" (BM25 keywords)
+        or "hybrid" (both, merged by reciprocal rank fusion). Pass
+        `query_embedding` to skip re-encoding, and `where` to filter on
+        metadata, e.g. {"type": "qa_pair"}. With a reranker configured,
+        `rerank=False` returns the retriever's order.
+        """
+        return self.query_many(
+            [query_text], top_k, None if query_embedding is None else [query_embedding], where, mode, rerank
+        )[0]
+    
+    def query_many(self, query_texts: List[str], top_k: int = 3,
+                   query_embeddings: Optional[List[List[float]]] = None,
+                   where: Optional[Dict] = None, mode: str = RETRIEVAL_MODE,
+                   rerank: bool = True) -> List[List[Dict]]:
+        """query() for several questions: one encoder pass and one vector search for all of them"""
+        if mode not in ("dense", "sparse", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode: {mode}")
+        if not query_texts:
+            return []
+        
+        # The reranker picks top_k from a wider candidate set
+        reranker = self.reranker if rerank else None
+        n_results = max(top_k, reranker.candidates) if reranker else top_k
+        # Hybrid fuses wider candidate lists from both retrievers
+        n_candidates = max(n_results, HYBRID_CANDIDATES) if mode == "hybrid" else n_results
+        
+        dense_results = [[] for _ in query_texts]
+        if mode in ("dense", "hybrid"):
+            if query_embeddings is None:
+                query_embeddings = self.embed_queries(query_texts)
+            with metrics.timer("dense_search"):
+                dense_results = self.store.query(query_embeddings, n_candidates, where=where)
+        
+        if mode == "dense":
+            results = dense_results
+        else:
+            self._ensure_sparse_index()
+            with metrics.timer("sparse_search"):
+                sparse_results = [self.sparse_index.search(text, n_candidates, where=where) for text in query_texts]
+            if mode == "sparse":
+                results = sparse_results
+            else:
+                with metrics.timer("fusion"):
+                    results = [reciprocal_rank_fusion([dense, sparse], n_results, k=RRF_K)
+                               for dense, sparse in zip(dense_results, sparse_results)]
+        
+        if reranker is None:
+            return results
+        try:
+            return reranker.rerank_many(query_texts, results, top_k)
+        except Exception as e:
+            # A broken cross-encoder costs ranking quality, not the request
+            print(f"⚠️  Reranking failed, keeping the retrieval order: {e}")
+            reranker.record_error(len(results))
+            return [matches[:top_k] for matches in results]
+    
+    def add_document(self, text: str, metadata: Dict = None) -> Dict:
+        """Add a new document to the knowledge base"""
+        return self.add_documents([{"text": text, "metadata": metadata}])
+    
+    def add_documents(self, documents: Iterable[Dict], batch_size: int = INGEST_BATCH_SIZE) -> Dict:
+        """
+        Bulk-add documents ({"text", optional "metadata" and "id"}).
+        
+        Documents are validated, embedded `batch_size` at a time (one model
+        call per batch) and written to the store one batch at a time; a
+        persisted store is saved once, after the last batch. Without an
+        "id", the ID is a hash of the text, so ingesting the same document
+        again is skipped as a duplicate instead of stored twice. Metadata
+        "type" defaults to "custom"; such documents are kept when the
+        resume data is re-synced. Returns counts, timings and throughput
+        (see summarize_ingest).
+        """
+        start = time.perf_counter()
+        reports = []
+        batch = []
+        with self.store.batch():
+            for document in documents:
+                batch.append(validate_document(document))
+                if len(batch) >= batch_size:
+                    reports.append(self.add_batch(batch))
+                    batch = []
+            if batch:
+                reports.append(self.add_batch(batch))
+        return summarize_ingest(reports, time.perf_counter() - start)
+    
+    def add_batch(self, batch: List[Dict]) -> Dict:
+        """Embed and store one batch of validated documents (see add_documents)"""
+        texts, metadatas, ids = [], [], []
+        for document in batch:
+            doc_id = document.get("id") or content_id("custom", document["text"])
+            if doc_id in ids:
+                continue
+            texts.append(document["text"])
+            metadatas.append(document["metadata"])
+            ids.append(doc_id)
+        
+        existing = self.store.existing_ids(ids)
+        new = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+        
+        # Embedding runs outside the write lock so it does not hold up other
+        # writers (the API runs its batches one at a time on the ingest thread;
+        # what overlaps there is embedding one batch and parsing the next)
+        phase_start = time.perf_counter()
+        embeddings = self.embedding_fn([texts[i] for i in new]) if new else []
+        embed_s = time.perf_counter() - phase_start
+        
+        phase_start = time.perf_counter()
+        with self._write_lock:
+            # Another batch may have added some of these in the meantime
+            existing = self.store.existing_ids([ids[i] for i in new])
+            keep = [(i, embedding) for i, embedding in zip(new, embeddings) if ids[i] not in existing]
+            if keep:
+                self.store.add(
+                    documents=[texts[i] for i, _ in keep],
+                    metadatas=[metadatas[i] for i, _ in keep],
+                    ids=[ids[i] for i, _ in keep],
+                    embeddings=[embedding for _, embedding in keep]
+                )
+        write_s = time.perf_counter() - phase_start
+        
+        return {
+            "received": len(batch),
+            "added": len(keep),
+            "duplicates": len(batch) - len(keep),
+            "embed_s": embed_s,
+            "write_s": write_s,
+        }
 
 
 # Test the RAG system
@@ -0,0 +1,228 @@
+"""
+Embedding model wrapper and a query encoder with an LRU embedding cache and
+micro-batching of concurrent requests
+"""
+
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+
+
+def normalize_query(text: str) -> str:
+    """Identity of a question (routing, coalescing, batch dedup): case- and whitespace-insensitive"""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class SentenceEmbedder:
+    """
+    SentenceTransformer embedding function (list of texts -> list of float32
+    vectors), loaded on first use.
+
+    Loading is deferred so a worker that opens an already-built index does
+    not pay for the model until it serves a query. With `quantize`, the
+    model's linear layers are converted to int8 (PyTorch dynamic
+    quantization), roughly quartering their weights' memory on CPU; the
+    vectors change slightly, so `id` differs and an index built with the
+    other setting is rebuilt.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, quantize: bool = EMBEDDING_QUANTIZE):
+        """Record settings; the model is loaded by load() or the first call"""
+        self.model_name = model_name
+        self.quantize = quantize
+        self.id = f"{model_name}+int8" if quantize else model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the model (idempotent)"""
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                model = SentenceTransformer(self.model_name, device="cpu")
+                if self.quantize:
+                    import torch
+
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+                self._model = model
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def do_lower_case(self) -> bool:
+        """Whether the tokenizer lowercases its input (False until the model is loaded)"""
+        return bool(getattr(getattr(self._model, "tokenizer", None), "do_lower_case", False))
+
+    def __call__(self, input: List[str]) -> List[np.ndarray]:
+        model = self._model or self.load()
+        embeddings = model.encode(list(input), convert_to_numpy=True)
+        return [np.asarray(embedding, dtype=np.float32) for embedding in embeddings]
+
+
+def create_embedder(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND,
+                    quantize: bool = EMBEDDING_QUANTIZE):
+    """Create the configured embedding function ("torch" or "onnx")"""
+    if backend == "torch":
+        return SentenceEmbedder(model_name, quantize=quantize)
+    if backend == "onnx":
+        from onnx_encoder import OnnxEmbedder
+        return OnnxEmbedder(model_name, quantize=quantize)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+class QueryEncoder:
+    """
+    Encode queries through `embed_fn` (a list-of-texts -> list-of-vectors
+    callable such as SentenceEmbedder or Chroma's
+    SentenceTransformerEmbeddingFunction).
+
+    Results are memoized in a bounded LRU keyed by the text that is
+    encoded: whitespace is collapsed, and it is lowercased only if the
+    embedding function reports an uncased tokenizer (`do_lower_case`), so
+    a cased model always sees the query's original case.
+    Cache misses from concurrent callers that arrive within `batch_window_ms`
+    of each other are encoded together in a single model forward pass by a
+    background thread.
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], Sequence],
+                 cache_size: int = QUERY_CACHE_SIZE,
+                 batch_window_ms: float = ENCODER_BATCH_WINDOW_MS,
+                 max_batch_size: int = ENCODER_MAX_BATCH):
+        """Start the batching thread"""
+        self.embed_fn = embed_fn
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._queue = queue.Queue()
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+        self._worker = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._worker.start()
+
+    def _key(self, text: str) -> str:
+        """Text to encode for a query, which is also its cache key"""
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text.lower() if getattr(self.embed_fn, "do_lower_case", False) else text
+
+    def _cache_get(self, key: str):
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return vector
+
+    def _cache_put(self, key: str, vector: np.ndarray):
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _encode_now(self, texts: List[str]) -> List[np.ndarray]:
+        """One forward pass for a batch of texts"""
+        vectors = []
+        for vector in self.embed_fn(texts):
+            vector = np.asarray(vector, dtype=np.float32)
+            vector.setflags(write=False)  # shared through the cache
+            vectors.append(vector)
+        with self._cache_lock:
+            self.batches += 1
+            self.batched_texts += len(texts)
+        return vectors
+
+    def _run(self):
+        """Batching loop: collect requests for up to batch_window, then encode them together"""
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(pending) < self.max_batch_size:
+                # Requests that queued up during the previous forward pass are
+                # always taken; only then wait out the rest of the window
+                try:
+                    pending.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Identical texts in the same batch are encoded once
+            futures_by_key: Dict[str, List[Future]] = OrderedDict()
+            for key, future in pending:
+                futures_by_key.setdefault(key, []).append(future)
+
+            keys = list(futures_by_key)
+            try:
+                vectors = self._encode_now(keys)
+            except Exception as e:
+                for futures in futures_by_key.values():
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+
+            for key, vector in zip(keys, vectors):
+                self._cache_put(key, vector)
+                for future in futures_by_key[key]:
+                    future.set_result(vector)
+
+    def encode(self, text: str) -> np.ndarray:
+        """Embedding for one query (blocks until its batch is encoded)"""
+        key = self._key(text)
+        vector = self._cache_get(key)
+        if vector is not None:
+            return vector
+
+        future = Future()
+        self._queue.put((key, future))
+        return future.result()
+
+    def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings for several queries, encoding all cache misses in one pass"""
+        keys = [self._key(text) for text in texts]
+        vectors = {key: self._cache_get(key) for key in keys}
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            for key, vector in zip(missing, self._encode_now(missing)):
+                self._cache_put(key, vector)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+    def stats(self) -> Dict:
+        """Cache and batching counters"""
+        with self._cache_lock:
+            return {
+                "cache_entries": len(self._cache),
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "batches": self.batches,
+                "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            }
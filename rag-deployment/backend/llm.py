@@ -0,0 +1,297 @@
+"""
+LLM backends used by the chat API (Google Gemini, the local fine-tuned model and a fake for testing)
+"""
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+import sys
+sys.path.append('../..')
+from config import *
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def prompt_question(prompt: str) -> str:
+    """The user's question in a prompt from prompt_builder.py"""
+    return prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+
+
+# generation_config keys (SDK style) -> REST API field names
+CONFIG_FIELDS = {
+    "temperature": "temperature",
+    "max_output_tokens": "maxOutputTokens",
+    "top_p": "topP",
+    "top_k": "topK",
+    "stop_sequences": "stopSequences",
+    "candidate_count": "candidateCount",
+}
+
+
+class LLMError(Exception):
+    """
+    A failed generation call. `retryable` marks transient upstream errors
+    (timeouts, connection errors, 429 and 5xx); `retry_after` is the delay
+    in seconds the upstream asked for, if any.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+
+class GeminiLLM:
+    """
+    Google Gemini text generation over the REST API.
+
+    Requests go through pooled, keep-alive httpx clients (one per event
+    loop for async calls), so consecutive calls reuse TLS connections.
+    Failures are raised as LLMError; retries, deadlines and the circuit
+    breaker live in resilience.py. `base_url` points the client at another
+    server, e.g. the fault-injecting stub in benchmarks/gemini_stub.py.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, api_key: str = GEMINI_API_KEY,
+                 base_url: str = GEMINI_API_BASE, timeout: float = LLM_TIMEOUT_S,
+                 max_connections: int = LLM_POOL_CONNECTIONS):
+        """Record settings; the HTTP clients are created by warm() or on first use"""
+        self.model_name = model_name
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._lock = threading.Lock()
+
+    def _client_settings(self) -> Dict:
+        import httpx
+
+        return dict(
+            base_url=self.base_url,
+            headers={"x-goog-api-key": self.api_key},
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+        )
+
+    def warm(self):
+        """Import httpx and create the connection pool"""
+        self._sync_client()
+
+    def _sync_client(self):
+        with self._lock:
+            if self._client is None:
+                import httpx
+
+                self._client = httpx.Client(**self._client_settings())
+            return self._client
+
+    def _async_client(self):
+        # An httpx.AsyncClient's connections belong to the loop that opened them
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(**self._client_settings())
+        return client
+
+    def close(self):
+        """Close the sync client's connections (async clients are closed by aclose())"""
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Close every HTTP client (at shutdown); later calls open new ones"""
+        clients = list(self._async_clients.values())
+        self._async_clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:  # e.g. connections opened on a loop that is already closed
+                print(f"⚠️  Could not close an HTTP client: {e}")
+        self.close()
+
+    def _path(self, method: str) -> str:
+        return f"/v1beta/models/{self.model_name}:{method}"
+
+    def _body(self, prompt: str, generation_config: Optional[Dict]) -> Dict:
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if generation_config:
+            body["generationConfig"] = {CONFIG_FIELDS.get(key, key): value for key, value in generation_config.items()}
+        return body
+
+    @staticmethod
+    def _raise_for_status(response):
+        if response.status_code < 400:
+            return
+        try:
+            detail = response.json()["error"]["message"]
+        except Exception:
+            detail = response.text[:200]
+        retry_after = response.headers.get("retry-after")
+        raise LLMError(
+            f"Gemini API error {response.status_code}: {detail}",
+            retryable=response.status_code in RETRYABLE_STATUS,
+            status=response.status_code,
+            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+
+    @staticmethod
+    def _text(payload: Dict, partial: bool = False) -> str:
+        """Answer text of a response (or, with `partial`, of one streamed chunk)"""
+        candidates = payload.get("candidates") or []
+        reason = (payload.get("promptFeedback") or {}).get("blockReason")
+        if not candidates and (reason or not partial):
+            raise LLMError(f"Gemini returned no answer: {reason or 'no candidates'}")
+        if not candidates:
+            return ""
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        if not parts and not partial:
+            # e.g. stopped for SAFETY or RECITATION: not an answer to serve or cache
+            raise LLMError(f"Gemini returned no answer: finish reason {candidates[0].get('finishReason', 'unknown')}")
+        return "".join(part.get("text", "") for part in parts)
+
+    @staticmethod
+    def _transport_error(error: Exception) -> LLMError:
+        return LLMError(f"Gemini API unreachable: {type(error).__name__}: {error}", retryable=True)
+
+    def generate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Generate a complete response"""
+        import httpx
+
+        try:
+            response = self._sync_client().post(self._path("generateContent"),
+                                                 json=self._body(prompt, generation_config))
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+        self._raise_for_status(response)
+        return self._text(response.json())
+
+    def stream(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """Yield response text as Gemini produces it (server-sent events)"""
+        import httpx
+
+        try:
+            with self._sync_client().stream("POST", self._path("streamGenerateContent"), params={"alt": "sse"},
+                                            json=self._body(prompt, generation_config)) as response:
+                if response.status_code >= 400:
+                    response.read()
+                self._raise_for_status(response)
+                for line in response.iter_lines():
+                    if line.startswith("data:"):
+                        text = self._text(json.loads(line[5:]), partial=True)
+                        if text:
+                            yield text
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+
+    async def agenerate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Generate a complete response without blocking the event loop"""
+        import httpx
+
+        try:
+            response = await self._async_client().post(self._path("generateContent"),
+                                                       json=self._body(prompt, generation_config))
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+        self._raise_for_status(response)
+        return self._text(response.json())
+
+    async def astream(self, prompt: str, generation_config: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async version of stream()"""
+        import httpx
+
+        try:
+            async with self._async_client().stream("POST", self._path("streamGenerateContent"),
+                                                   params={"alt": "sse"},
+                                                   json=self._body(prompt, generation_config)) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                self._raise_for_status(response)
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        text = self._text(json.loads(line[5:]), partial=True)
+                        if text:
+                            yield text
+        except httpx.TransportError as e:
+            raise self._transport_error(e) from e
+
+
+class FakeLLM:
+    """Deterministic local backend for tests and benchmarks (no network)"""
+
+    def __init__(self, first_token_delay: float = FAKE_LLM_FIRST_TOKEN_DELAY,
+                 token_delay: float = FAKE_LLM_TOKEN_DELAY):
+        """Set simulated latencies in seconds"""
+        self.model_name = "fake"
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def warm(self):
+        """Nothing to load"""
+
+    async def aclose(self):
+        """Nothing to release"""
+
+    def _answer(self, prompt: str) -> str:
+        """Build a canned answer that echoes the question"""
+        return (
+            f"This is a simulated answer to \"{prompt_question(prompt)}\". "
+            "I'm Jai, a software engineer working on AI/ML and full-stack development."
+        )
+
+    def _tokens(self, prompt: str, generation_config: Optional[Dict]) -> List[str]:
+        """Split the canned answer into streamed fragments"""
+        max_tokens = (generation_config or {}).get("max_output_tokens")
+        words = self._answer(prompt).split(" ")
+        if max_tokens:
+            words = words[:max_tokens]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def stream(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """Yield the canned answer word by word with simulated delays"""
+        time.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens(prompt, generation_config)):
+            if i > 0:
+                time.sleep(self.token_delay)
+            yield token
+
+    def generate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Generate the full canned answer"""
+        return "".join(self.stream(prompt, generation_config))
+
+    async def astream(self, prompt: str, generation_config: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async version of stream()"""
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(self._tokens(prompt, generation_config)):
+            if i > 0:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    async def agenerate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Async version of generate()"""
+        return "".join([token async for token in self.astream(prompt, generation_config)])
+
+
+def create_llm(backend: str = LLM_BACKEND):
+    """Create the configured LLM backend ("gemini", "local" or "fake")"""
+    if backend == "gemini":
+        return GeminiLLM()
+    if backend == "local":
+        from local_llm import LocalLLM  # imports torch / transformers when loaded
+        return LocalLLM(adapter_path=str(Path("../..") / LOCAL_LLM_ADAPTER) if LOCAL_LLM_ADAPTER else "")
+    if backend == "fake":
+        return FakeLLM()
+    raise ValueError(f"Unknown LLM backend: {backend}")
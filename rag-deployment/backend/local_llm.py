@@ -0,0 +1,331 @@
+"""
+Local generation backend: the GPT-2 + LoRA model from fine-tuning/train.py on CPU, with dynamic batching
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+import sys
+sys.path.append('../..')
+from config import *
+from llm import LLMError, prompt_question
+
+# The adapter was trained on "Question: ...\nAnswer: ..." pairs; a new
+# "Question:" means the model has moved on to inventing the next pair
+STOP_STRINGS = ("\nQuestion:",)
+
+_DONE = object()
+
+
+def held_back(text: str, stop_strings=STOP_STRINGS) -> int:
+    """Length of the end of `text` that could be the start of a stop string"""
+    return max((n for stop in stop_strings for n in range(1, len(stop)) if text.endswith(stop[:n])), default=0)
+
+
+class _Request:
+    """One prompt in the batching queue; `emit` receives text deltas, then _DONE or an exception"""
+
+    def __init__(self, input_ids: List[int], max_new_tokens: int, temperature: float, top_p: float,
+                 emit: Callable[[object], None]):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.emit = emit
+        self.cancelled = False
+
+
+class LocalLLM:
+    """
+    GPT-2 with the LoRA adapter from fine-tuning/train.py, served on CPU.
+
+    load() merges the adapter into the base weights (peft merge_and_unload),
+    so generation runs a plain GPT-2 with no adapter overhead. A background
+    thread collects requests for up to `batch_window_ms` (at most
+    `max_batch_size`) and decodes them together: prompts are left-padded
+    into one batch and every step feeds only the new tokens, reusing the
+    attention key/value cache. Each request streams its own text and
+    leaves the batch at EOS, a stop string or its token limit. Requests
+    arriving during a batch wait for the next one.
+
+    The adapter was trained on bare "Question: ...\\nAnswer:" pairs, so the
+    model gets the question from the API prompt in that format, without
+    the retrieved context (which would not fit GPT-2's context window).
+    With an empty `adapter_path` the base model is served as is.
+    """
+
+    def __init__(self, base_model: str = LOCAL_LLM_BASE_MODEL, adapter_path: str = LOCAL_LLM_ADAPTER,
+                 max_new_tokens: int = LOCAL_LLM_MAX_NEW_TOKENS, top_p: float = LOCAL_LLM_TOP_P,
+                 max_batch_size: int = LOCAL_LLM_MAX_BATCH, batch_window_ms: float = LOCAL_LLM_BATCH_WINDOW_MS,
+                 kv_cache: bool = True):
+        """Record settings and start the batching thread; the model is loaded by warm() or the first request"""
+        self.base_model = base_model
+        self.adapter_path = adapter_path
+        self.model_name = f"{base_model}+{Path(adapter_path).name}" if adapter_path else base_model
+        self.max_new_tokens = max_new_tokens
+        self.top_p = top_p
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.kv_cache = kv_cache  # False recomputes the whole sequence every step (for comparison only)
+        self._model = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.generated_tokens = 0
+        self.decode_s = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="local-llm", daemon=True)
+        self._worker.start()
+
+    def load(self):
+        """Load the tokenizer and model and merge the adapter (idempotent); raises LLMError on failure"""
+        with self._lock:
+            if self._model is None:
+                try:
+                    self._tokenizer, self._model = self._load()
+                except Exception as e:
+                    raise LLMError(f"Could not load the local model: {type(e).__name__}: {e}") from e
+        return self._model
+
+    def _load(self):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        # Checked first: loading the base model can take a download
+        if self.adapter_path and not Path(self.adapter_path).exists():
+            raise FileNotFoundError(
+                f"LoRA adapter not found at {self.adapter_path} (train it with fine-tuning/train.py)"
+            )
+        # train.py saves the tokenizer next to the adapter
+        tokenizer_source = self.adapter_path if (
+            self.adapter_path and (Path(self.adapter_path) / "tokenizer_config.json").exists()
+        ) else self.base_model
+        tokenizer = AutoTokenizer.from_pretrained(tokenizer_source)
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        model = AutoModelForCausalLM.from_pretrained(self.base_model, torch_dtype=torch.float32)
+        if self.adapter_path:
+            from peft import PeftModel
+
+            model = PeftModel.from_pretrained(model, self.adapter_path).merge_and_unload()
+        model.eval()
+        return tokenizer, model
+
+    def warm(self):
+        """Load the model (run in the background at startup)"""
+        self.load()
+
+    async def aclose(self):
+        """Nothing to release: the batching thread is a daemon"""
+
+    @property
+    def n_positions(self) -> int:
+        """Longest sequence (prompt + answer) the model can attend over"""
+        return getattr(self._model.config, "n_positions", 1024)
+
+    def _prompt_ids(self, prompt: str, max_new_tokens: int) -> List[int]:
+        text = f"Question: {prompt_question(prompt)}\nAnswer:"
+        ids = self._tokenizer(text)["input_ids"]
+        # Keep the end of the prompt if it would not leave room for the answer
+        return ids[-max(self.n_positions - max_new_tokens, 1):]
+
+    def _submit(self, prompt: str, generation_config: Optional[Dict], emit: Callable[[object], None]) -> _Request:
+        if self._model is None:
+            self.load()
+        config = generation_config or {}
+        max_new_tokens = min(self.max_new_tokens, config.get("max_output_tokens") or self.max_new_tokens,
+                             self.n_positions - 1)  # at least one prompt token must fit
+        request = _Request(
+            self._prompt_ids(prompt, max_new_tokens), max_new_tokens,
+            float(config.get("temperature", TEMPERATURE)), float(config.get("top_p", self.top_p)), emit
+        )
+        self._queue.put(request)
+        return request
+
+    # --- batching thread --------------------------------------------------
+
+    def _run(self):
+        """Batching loop: collect requests for up to batch_window, then decode them together"""
+        while True:
+            pending = [self._queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(pending) < self.max_batch_size:
+                # Requests that queued up during the previous batch are always
+                # taken; only then wait out the rest of the window
+                try:
+                    pending.append(self._queue.get_nowait())
+                    continue
+                except queue.Empty:
+                    pass
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            pending = [request for request in pending if not request.cancelled]
+            if not pending:
+                continue
+            try:
+                self._decode(pending)
+            except Exception as e:
+                error = LLMError(f"Local generation failed: {type(e).__name__}: {e}")
+                for request in pending:
+                    request.emit(error)
+
+    def _sample(self, logits, temperatures, top_ps):
+        """Next token per row: greedy where temperature is 0, else nucleus sampling"""
+        import torch
+
+        greedy = logits.argmax(dim=-1)
+        scaled = logits / temperatures.clamp(min=1e-5).unsqueeze(1)
+        probs = torch.softmax(scaled, dim=-1)
+        sorted_probs, order = probs.sort(dim=-1, descending=True)
+        # Drop tokens once the more likely ones already cover top_p
+        sorted_probs[(sorted_probs.cumsum(dim=-1) - sorted_probs) > top_ps.unsqueeze(1)] = 0.0
+        sampled = order.gather(1, torch.multinomial(sorted_probs, 1)).squeeze(1)
+        return torch.where(temperatures > 0, sampled, greedy)
+
+    def _decode(self, requests: List[_Request]):
+        """KV-cached decoding of a batch of requests"""
+        import torch
+
+        tokenizer, model = self._tokenizer, self._model
+        n = len(requests)
+        width = max(len(request.input_ids) for request in requests)
+        input_ids = torch.full((n, width), tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((n, width), dtype=torch.long)
+        for i, request in enumerate(requests):
+            input_ids[i, width - len(request.input_ids):] = torch.tensor(request.input_ids)
+            attention_mask[i, width - len(request.input_ids):] = 1
+        # Left padding: positions count real tokens only
+        position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+        temperatures = torch.tensor([request.temperature for request in requests])
+        top_ps = torch.tensor([request.top_p for request in requests])
+
+        generated: List[List[int]] = [[] for _ in requests]
+        sent = [0] * n
+        active = [True] * n
+        sequence = input_ids
+        past = None
+        start = time.perf_counter()
+        with torch.inference_mode():
+            for _ in range(max(request.max_new_tokens for request in requests)):
+                if self.kv_cache:
+                    out = model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                                past_key_values=past, use_cache=True)
+                    past = out.past_key_values
+                else:
+                    full_positions = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+                    out = model(input_ids=sequence, attention_mask=attention_mask, position_ids=full_positions,
+                                use_cache=False)
+                next_tokens = self._sample(out.logits[:, -1, :].float(), temperatures, top_ps)
+
+                for i, request in enumerate(requests):
+                    if not active[i]:
+                        continue
+                    token = int(next_tokens[i])
+                    if request.cancelled or token == tokenizer.eos_token_id:
+                        active[i] = False
+                    else:
+                        generated[i].append(token)
+                        text = tokenizer.decode(generated[i], skip_special_tokens=True)
+                        stop = min((text.find(s) for s in STOP_STRINGS if s in text), default=-1)
+                        if stop >= 0:
+                            text, active[i] = text[:stop], False
+                        elif len(generated[i]) >= request.max_new_tokens:
+                            active[i] = False
+                        end = len(text) if not active[i] else len(text) - held_back(text)
+                        if end > sent[i]:
+                            request.emit(text[sent[i]:end])
+                            sent[i] = end
+                    if not active[i]:
+                        request.emit(_DONE)
+                if not any(active):
+                    break
+
+                # Finished rows keep decoding padding until the batch is done
+                next_tokens = torch.where(torch.tensor(active), next_tokens,
+                                          torch.full_like(next_tokens, tokenizer.pad_token_id))
+                input_ids = next_tokens.unsqueeze(1)
+                sequence = torch.cat([sequence, input_ids], dim=1)
+                attention_mask = torch.cat([attention_mask, torch.ones((n, 1), dtype=torch.long)], dim=1)
+                position_ids = position_ids[:, -1:] + 1
+
+        with self._stats_lock:
+            self.batches += 1
+            self.batched_requests += n
+            self.generated_tokens += sum(map(len, generated))
+            self.decode_s += time.perf_counter() - start
+
+    # --- LLM backend interface ----------------------------------------------
+
+    def stream(self, prompt: str, generation_config: Optional[Dict] = None) -> Iterator[str]:
+        """Yield the answer as it is decoded (in a batch with concurrent requests)"""
+        results = queue.Queue()
+        request = self._submit(prompt, generation_config, results.put)
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            request.cancelled = True
+
+    def generate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Generate a complete response"""
+        return "".join(self.stream(prompt, generation_config))
+
+    async def astream(self, prompt: str, generation_config: Optional[Dict] = None) -> AsyncIterator[str]:
+        """Async version of stream()"""
+        loop = asyncio.get_running_loop()
+        results = asyncio.Queue()
+        if self._model is None:
+            await loop.run_in_executor(None, self.load)
+
+        def emit(item):
+            try:
+                loop.call_soon_threadsafe(results.put_nowait, item)
+            except RuntimeError:  # the event loop is gone
+                request.cancelled = True
+
+        request = self._submit(prompt, generation_config, emit)
+        try:
+            while True:
+                item = await results.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stops decoding for a client that went away (or timed out)
+            request.cancelled = True
+
+    async def agenerate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """Async version of generate()"""
+        return "".join([text async for text in self.astream(prompt, generation_config)])
+
+    def stats(self) -> Dict:
+        """Batching and decoding counters"""
+        with self._stats_lock:
+            return {
+                "loaded": self._model is not None,
+                "batches": self.batches,
+                "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+                "generated_tokens": self.generated_tokens,
+                "tokens_per_s": round(self.generated_tokens / self.decode_s, 1) if self.decode_s else 0.0,
+            }
@@ -0,0 +1,224 @@
+"""
+Per-stage latency histograms, Prometheus text export and Server-Timing headers
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sys
+sys.path.append('../..')
+from config import *
+
+# Upper bounds in seconds (1-2-3-5-7 steps, 0.1 ms to 60 s); +Inf is implicit
+BUCKETS = tuple(
+    round(step * 10.0 ** exponent, 6)
+    for exponent in range(-4, 2)
+    for step in (1, 2, 3, 5, 7)
+    if step * 10.0 ** exponent <= 60
+) + (60.0,)
+
+# Stage durations (ms) of the request being handled, for its Server-Timing header
+_request_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        """Create an empty histogram"""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # per bucket, not cumulative; last is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile by linear interpolation within its bucket"""
+        with self._lock:
+            counts, count, low, high = list(self.counts), self.count, self.min, self.max
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                # Narrow the bucket to the observed range (exact for a single sample)
+                lower = max(self.buckets[index - 1] if index else 0.0, low)
+                upper = min(self.buckets[index] if index < len(self.buckets) else high, high)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return high
+
+
+class Metrics:
+    """
+    Registry of stage and request latency histograms, plus labelled counters.
+
+    Stages are timed with `metrics.timer("stage")` (or recorded with
+    `observe_stage`); each observation also goes to the current request's
+    Server-Timing entries when a request is being tracked.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        """Create an empty registry"""
+        self.enabled = enabled
+        self._stages: Dict[str, Histogram] = {}
+        self._requests: Dict[str, Histogram] = {}
+        self._counters: Dict[Tuple[str, str, str], int] = {}  # (name, label, value) -> count
+        self._lock = threading.Lock()
+
+    def _histogram(self, table: Dict[str, Histogram], key: str) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram())
+        return histogram
+
+    def observe_stage(self, stage: str, seconds: float):
+        """Record one duration for a pipeline stage"""
+        if not self.enabled:
+            return
+        self._histogram(self._stages, stage).observe(seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+    def observe_request(self, path: str, seconds: float):
+        """Record one end-to-end request duration"""
+        if self.enabled:
+            self._histogram(self._requests, path).observe(seconds)
+
+    def increment(self, name: str, label: str, value: str):
+        """Count one event, exported as rag_<name>_total{<label>="<value>"}"""
+        if self.enabled:
+            with self._lock:
+                key = (name, label, value)
+                self._counters[key] = self._counters.get(key, 0) + 1
+
+    def timer(self, stage: str) -> "StageTimer":
+        """Context manager timing a block as `stage`"""
+        return StageTimer(self, stage)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-stage count and p50/p95/p99 in ms"""
+        result = {}
+        for name, histogram in list(self._stages.items()) + [(f"request {path}", h) for path, h in self._requests.items()]:
+            result[name] = {"count": histogram.count}
+            for q in (0.5, 0.95, 0.99):
+                value = histogram.quantile(q)
+                result[name][f"p{round(q * 100)}_ms"] = round(value * 1000, 3) if value is not None else None
+        return result
+
+    def render_prometheus(self) -> str:
+        """All histograms in the Prometheus text exposition format"""
+        lines = []
+        for metric, label, table, help_text in (
+            ("rag_stage_duration_seconds", "stage", self._stages, "Duration of chat pipeline stages"),
+            ("rag_request_duration_seconds", "path", self._requests, "End-to-end HTTP request duration"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in sorted(table.items()):
+                counts, total, count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label}="{key}"}} {total:.6f}')
+                lines.append(f'{metric}_count{{{label}="{key}"}} {count}')
+        with self._lock:
+            counters = sorted(self._counters.items())
+        for name in sorted({name for (name, _, _), _ in counters}):
+            lines.append(f"# TYPE rag_{name}_total counter")
+            for (counter, label, value), count in counters:
+                if counter == name:
+                    lines.append(f'rag_{name}_total{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """Times a `with` block into a stage histogram"""
+
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: Metrics, stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+metrics = Metrics()
+
+
+def request_timings() -> Optional[Dict[str, float]]:
+    """Stage durations (ms) recorded so far for the current request"""
+    return _request_timings.get()
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage durations as a Server-Timing header value"""
+    return ", ".join(f"{stage};dur={ms:.2f}" for stage, ms in timings.items())
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: per-request stage collection, Server-Timing header and
+    request duration histogram for the given paths.
+
+    The header is sent with the response start, so it covers every stage of
+    a regular response but only the stages before the first byte of a
+    streamed one.
+    """
+
+    def __init__(self, app, paths: Iterable[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths or not metrics.enabled:
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = dict(timings, total=(time.perf_counter() - start) * 1000)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(entries).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            metrics.observe_request(scope["path"], time.perf_counter() - start)
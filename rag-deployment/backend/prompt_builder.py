@@ -0,0 +1,173 @@
+"""
+Prompt assembly: pack retrieved chunks and recent history into a token budget
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import sys
+sys.path.append('../..')
+from config import *
+from token_counter import TokenCounter
+
+MIN_OVERLAP_WORDS = 8  # shorter shared runs are coincidence, not chunk overlap
+MIN_CHUNK_TOKENS = 16  # not worth including a chunk trimmed below this
+
+
+def _overlap(left: List[str], right: List[str]) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`, in words"""
+    for size in range(min(len(left), len(right)), MIN_OVERLAP_WORDS - 1, -1):
+        if left[-size] == right[0] and left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def dedupe_chunks(chunks: List[Dict]) -> List[Dict]:
+    """
+    Remove text repeated across retrieved chunks, keeping rank order.
+
+    Consecutive chunks of a document share an overlap window; when both
+    are retrieved, the lower-ranked one loses the shared words. Chunks
+    fully contained in a higher-ranked one are dropped. Returns
+    {"chunk", "text", "tokens"} entries; `tokens` comes from the chunk's
+    indexed metadata when present, scaled if the text was trimmed, and is
+    None otherwise.
+    """
+    kept = []
+    for chunk in chunks:
+        text = chunk["text"]
+        if any(text in entry["chunk"]["text"] for entry in kept):
+            continue
+        words = text.split()
+        start, end = 0, len(words)
+        for entry in kept:
+            kept_words = entry["chunk"]["text"].split()
+            start = max(start, _overlap(kept_words, words))
+            end = min(end, len(words) - _overlap(words, kept_words))
+        trimmed = start > 0 or end < len(words)
+        if trimmed and end - start < MIN_OVERLAP_WORDS:
+            continue  # (almost) nothing new left
+
+        tokens = (chunk.get("metadata") or {}).get("tokens")
+        if trimmed:
+            text = " ".join(words[start:end])
+            tokens = round(tokens * (end - start) / len(words)) if tokens else None
+        kept.append({"chunk": chunk, "text": text, "tokens": tokens or None})
+    return kept
+
+
+class PromptBuilder:
+    """
+    Assemble LLM prompts under a token budget.
+
+    Every part of the prompt is counted with one TokenCounter (indexed
+    chunk counts are used as they are only when it has the tokenizer they
+    were made with). The system prompt prefix is rendered and counted once.
+    Per request, the question is always included, cut to what is left of
+    the budget after the prefix if it is longer; the newest history turns
+    take up to `history_budget`, and retrieved chunks fill the remainder in
+    rank order, so the lowest-scoring context is trimmed first.
+    """
+
+    def __init__(self, system_prompt: str, token_budget: int = PROMPT_TOKEN_BUDGET,
+                 history_budget: int = HISTORY_TOKEN_BUDGET, counter: Optional[TokenCounter] = None):
+        """Record the static prefix; it is counted when the tokenizer is loaded"""
+        self.counter = counter or TokenCounter(EMBEDDING_MODEL, onnx_dir=str(Path("../..") / ONNX_MODEL_DIR))
+        self.prefix = f"{system_prompt}\n\n"
+        self.context_header = "Based on Jai's resume:\n\n"
+        self.history_header = "Conversation so far:\n"
+        self.question_template = "Question: {}\n\nAnswer:"
+        self.token_budget = token_budget
+        self.history_budget = history_budget
+        self._static_tokens = None
+
+    def static_tokens(self) -> Dict[str, int]:
+        """Token counts of the fixed prompt parts, computed once"""
+        if self._static_tokens is None:
+            counts = self.counter.count_many(
+                [self.prefix, self.context_header, self.history_header, self.question_template.format("")]
+            )
+            self._static_tokens = dict(zip(("prefix", "context_header", "history_header", "question"), counts))
+        return self._static_tokens
+
+    def _pack_history(self, history: List[Dict], budget: int) -> List[Tuple[str, int]]:
+        """(line, tokens) for the newest turns that fit in `budget`, in chronological order"""
+        lines = []
+        for turn in history or []:
+            content = (turn.get("content") or "").strip()
+            if content:
+                speaker = "User" if turn.get("role") == "user" else "Assistant"
+                lines.append(f"{speaker}: {content}")
+        kept = []
+        for line, tokens in zip(reversed(lines), reversed(self.counter.count_many(lines))):
+            if tokens > budget:
+                break
+            kept.append((line, tokens))
+            budget -= tokens
+        kept.reverse()
+        return kept
+
+    def build(self, question: str, chunks: List[Dict],
+              history: Optional[List[Dict]] = None) -> Dict:
+        """
+        Build the prompt for `question`.
+
+        Returns {"prompt", "prompt_tokens", "context_chunks", "dropped_chunks",
+        "history_turns", "question_truncated"}; `prompt_tokens` is the prompt
+        size, summed from the cached fixed-part counts and per-part counts.
+        """
+        static = self.static_tokens()
+        used = static["prefix"] + static["question"]
+        question_tokens = self.counter.count(question)
+        question_truncated = question_tokens > self.token_budget - used
+        if question_truncated:
+            question = self.counter.truncate(question, self.token_budget - used)
+            question_tokens = self.counter.count(question)
+        suffix = self.question_template.format(question)
+        used += question_tokens
+
+        history_lines = []
+        if history:
+            history_budget = min(self.history_budget, self.token_budget - used) - static["history_header"]
+            history_lines = self._pack_history(history, history_budget)
+            if history_lines:
+                used += static["history_header"] + sum(tokens for _, tokens in history_lines)
+
+        entries = dedupe_chunks(chunks)
+        # Indexed counts are only comparable when they come from the same tokenizer
+        uncounted = [entry for entry in entries if entry["tokens"] is None or not self.counter.exact]
+        for entry, tokens in zip(uncounted, self.counter.count_many([entry["text"] for entry in uncounted])):
+            entry["tokens"] = tokens
+        texts = []
+        if entries:
+            used += static["context_header"]
+        for entry in entries:
+            remaining = self.token_budget - used
+            if entry["tokens"] <= remaining:
+                texts.append(entry["text"])
+                used += entry["tokens"]
+                continue
+            # Budget runs out inside this chunk: keep its head if that is still useful
+            if remaining >= MIN_CHUNK_TOKENS:
+                head = self.counter.truncate(entry["text"], remaining)
+                texts.append(head)
+                used += min(remaining, self.counter.count(head))
+            break
+        if not texts and entries:
+            used -= static["context_header"]
+
+        prompt = self.prefix
+        if texts:
+            prompt += self.context_header + "\n\n".join(texts) + "\n\n"
+        if history_lines:
+            prompt += self.history_header + "\n".join(line for line, _ in history_lines) + "\n\n"
+        prompt += suffix
+
+        return {
+            "prompt": prompt,
+            "prompt_tokens": used,
+            "context_chunks": len(texts),
+            "dropped_chunks": len(chunks) - len(texts),
+            "history_turns": len(history_lines),
+            "question_truncated": question_truncated,
+        }
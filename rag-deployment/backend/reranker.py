@@ -0,0 +1,151 @@
+"""
+Optional rerank stage: reorder a wider retrieval candidate set with a cross-encoder
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+from metrics import metrics
+
+
+class CrossEncoderReranker:
+    """
+    Cross-encoder reranker, loaded on first use.
+
+    The retriever fetches `candidates` results per query and rerank_many()
+    scores every (query, candidate) pair with the cross-encoder, in batches
+    of `batch_size` pairs shared across queries, then keeps the top k.
+
+    `budget_ms` is a per-request target for scoring time, planned from the
+    measured time per pair: the reranker only scores the queries whose
+    candidates all fit in the budget, and before each batch it checks that
+    the batch is predicted to end before the deadline. It is a prediction,
+    so a batch slower than measured can overrun it. Every query whose
+    candidates were not all scored keeps the retriever's order. A budget
+    of 0 disables the limit. Loading seeds the measurement with a timed
+    batch of pairs at the maximum length, so even the first request is
+    planned from a (pessimistic) estimate; loading is not counted.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL, candidates: int = RERANK_CANDIDATES,
+                 budget_ms: float = RERANK_BUDGET_MS, batch_size: int = RERANK_BATCH_SIZE,
+                 max_length: int = RERANK_MAX_LENGTH):
+        """Record settings; the model is loaded by load() or the first call"""
+        self.model_name = model_name
+        self.candidates = candidates
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._pair_s: Optional[float] = None  # moving average of scoring seconds per pair
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "queries": 0, "reranked": 0, "fallbacks": 0, "errors": 0, "scoring_s": 0.0}
+
+    def load(self):
+        """Load the model and measure its time per pair (idempotent)"""
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_length)
+        if self._pair_s is None:
+            self._calibrate()
+        return self._model
+
+    def _calibrate(self):
+        """Seed the time per pair with full batches of pairs truncated to max_length (the slowest case)"""
+        pairs = [["warm up", " ".join(["warm up"] * self.max_length)]] * self.batch_size
+        self._model.predict(pairs, batch_size=len(pairs), convert_to_numpy=True, show_progress_bar=False)
+        self._score(pairs)  # timed once the first-call overhead is paid
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def _score(self, pairs: List[List[str]]) -> np.ndarray:
+        start = time.perf_counter()
+        scores = self._model.predict(pairs, batch_size=len(pairs), convert_to_numpy=True, show_progress_bar=False)
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        with self._lock:
+            self._pair_s = per_pair if self._pair_s is None else 0.8 * self._pair_s + 0.2 * per_pair
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+    def rerank_many(self, query_texts: List[str], candidates: List[List[Dict]], top_k: int) -> List[List[Dict]]:
+        """
+        The top_k of each query's candidates by cross-encoder score (added to
+        each result as "rerank_score"), or its first top_k as given when the
+        budget ran out before they were scored
+        """
+        if self._model is None or self._pair_s is None:
+            self.load()
+        pairs = [(i, j) for i, results in enumerate(candidates) for j in range(len(results))]
+        scores = [np.full(len(results), np.nan, dtype=np.float32) for results in candidates]
+
+        start = time.perf_counter()
+        deadline = start + self.budget_ms / 1000 if self.budget_ms > 0 else None
+        if deadline is not None:
+            # Only score the queries whose candidates can all be scored in time
+            fit = int(self.budget_ms / 1000 / self._pair_s) if self._pair_s else len(pairs)
+            ends = np.cumsum([len(results) for results in candidates])
+            pairs = pairs[:max((int(end) for end in ends if end <= fit), default=0)]
+        with metrics.timer("rerank"):
+            for offset in range(0, len(pairs), self.batch_size):
+                batch = pairs[offset:offset + self.batch_size]
+                if deadline is not None and time.perf_counter() + len(batch) * self._pair_s > deadline:
+                    break
+                batch_scores = self._score([[query_texts[i], candidates[i][j]["text"]] for i, j in batch])
+                for (i, j), value in zip(batch, batch_scores):
+                    scores[i][j] = value
+        elapsed = time.perf_counter() - start
+
+        reranked, fallbacks = [], 0
+        for results, result_scores in zip(candidates, scores):
+            if np.isnan(result_scores).any():
+                reranked.append(results[:top_k])
+                fallbacks += 1
+                metrics.increment("rerank", "outcome", "fallback")
+                continue
+            order = np.argsort(-result_scores, kind="stable")[:top_k]
+            reranked.append([dict(results[j], rerank_score=round(float(result_scores[j]), 4)) for j in order])
+            metrics.increment("rerank", "outcome", "reranked")
+
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["queries"] += len(candidates)
+            self.counts["reranked"] += len(candidates) - fallbacks
+            self.counts["fallbacks"] += fallbacks
+            self.counts["scoring_s"] += elapsed
+        return reranked
+
+    def record_error(self, queries: int):
+        """Count a request whose reranking raised (the caller keeps the retriever's order)"""
+        for _ in range(queries):
+            metrics.increment("rerank", "outcome", "error")
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["queries"] += queries
+            self.counts["fallbacks"] += queries
+            self.counts["errors"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts)
+            pair_ms = self._pair_s * 1000 if self._pair_s is not None else None
+        requests = counts.pop("requests")
+        scoring_s = counts.pop("scoring_s")
+        return {
+            "model": self.model_name,
+            "loaded": self.loaded,
+            "candidates": self.candidates,
+            "budget_ms": self.budget_ms,
+            "requests": requests,
+            **counts,
+            "fallback_rate": round(counts["fallbacks"] / counts["queries"], 4) if counts["queries"] else 0.0,
+            "mean_ms": round(scoring_s / requests * 1000, 2) if requests else 0.0,
+            "ms_per_pair": round(pair_ms, 3) if pair_ms is not None else None,
+        }
@@ -0,0 +1,262 @@
+"""
+Resilient generation: deadlines, jittered retries, hedged requests and a circuit breaker around an LLM backend
+"""
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+from llm import LLMError
+from metrics import metrics
+
+
+class LLMUnavailable(LLMError):
+    """No answer within the deadline and retries, or the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After `failure_threshold` transient failures in a row the breaker opens
+    and calls fail fast for `reset_timeout` seconds. Then it is half-open:
+    one trial call goes through, and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURES, reset_timeout: float = LLM_BREAKER_RESET_S):
+        """Start closed"""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                self.times_opened += 1
+                metrics.increment("llm", "event", "breaker_open")
+            self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+
+    def release(self):
+        """End a trial call that neither succeeded nor failed upstream (e.g. a rejected prompt)"""
+        self.trial_in_flight = False
+
+
+class ResilientLLM:
+    """
+    Wraps an LLM backend (llm.py) for the API's async calls.
+
+    - Deadlines: every attempt is cut off after `timeout` seconds and a call
+      (all attempts and backoff) after `deadline` seconds.
+    - Retries: transient failures (LLMError.retryable, timeouts) are retried
+      up to `retries` times with full-jitter exponential backoff starting at
+      `backoff` seconds, or after the upstream's Retry-After if longer.
+    - Hedging (`hedge`): if agenerate() has no answer after the p95 of recent
+      successful calls (at least `hedge_min_delay`), a second identical
+      request is sent and the first answer wins. Streams are not hedged.
+    - Circuit breaker: see CircuitBreaker. While it is open, calls fail fast.
+
+    When no answer can be produced, LLMUnavailable is raised so the caller
+    can serve a degraded answer. A stream is only retried until its first
+    token; a failure after that ends it.
+    """
+
+    def __init__(self, backend, timeout: float = LLM_TIMEOUT_S, deadline: float = LLM_DEADLINE_S,
+                 retries: int = LLM_RETRIES, backoff: float = LLM_RETRY_BACKOFF_S,
+                 hedge: bool = LLM_HEDGE_ENABLED, hedge_min_delay: float = LLM_HEDGE_MIN_DELAY_S,
+                 breaker: Optional[CircuitBreaker] = None):
+        """Wrap `backend` (GeminiLLM or FakeLLM)"""
+        self.backend = backend
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=200)  # seconds of recent successful agenerate attempts
+        self.counts = dict.fromkeys(
+            ("calls", "attempts", "retries", "timeouts", "errors", "hedges", "hedge_wins", "rejected", "unavailable"), 0
+        )
+
+    @property
+    def model_name(self) -> str:
+        return self.backend.model_name
+
+    def warm(self):
+        self.backend.warm()
+
+    async def aclose(self):
+        await self.backend.aclose()
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging (None until enough calls have been seen)"""
+        if not self.hedge or len(self._latencies) < 20:
+            return None
+        return max(self.hedge_min_delay, float(np.percentile(self._latencies, 95)))
+
+    def _count(self, name: str):
+        self.counts[name] += 1
+        if name in ("retries", "timeouts", "hedges", "hedge_wins", "rejected", "unavailable"):
+            metrics.increment("llm", "event", name)
+
+    def _admit(self):
+        self.counts["calls"] += 1
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailable("LLM circuit breaker is open")
+
+    def _retry_wait(self, attempt: int, error: Exception, deadline: float) -> float:
+        """
+        Record a failed attempt and return the backoff before the next one;
+        raises `error` if it is not transient, or LLMUnavailable when out of
+        attempts, out of time or the breaker opened
+        """
+        transient = isinstance(error, asyncio.TimeoutError) or getattr(error, "retryable", False)
+        self._count("timeouts" if isinstance(error, asyncio.TimeoutError) else "errors")
+        if not transient:
+            self.breaker.release()
+            raise error
+        self.breaker.record_failure()
+
+        # Full jitter, but never sooner than the upstream asked
+        wait = max(random.uniform(0, self.backoff * 2 ** attempt), getattr(error, "retry_after", None) or 0.0)
+        if attempt == self.retries or time.perf_counter() + wait >= deadline or not self.breaker.allow():
+            self._count("unavailable")
+            raise LLMUnavailable(f"LLM unavailable after {attempt + 1} attempts: {error}") from error
+        self._count("retries")
+        return wait
+
+    async def _attempt(self, prompt: str, generation_config: Optional[Dict], timeout: float) -> str:
+        """One upstream call, hedged after hedge_delay() if it is slow (the hedge is a second attempt)"""
+        start = time.perf_counter()
+        self._count("attempts")
+        first = asyncio.ensure_future(self.backend.agenerate(prompt, generation_config))
+        tasks = [first]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self._count("hedges")
+                    self._count("attempts")  # every upstream request counts, hedges included
+                    tasks.append(asyncio.ensure_future(self.backend.agenerate(prompt, generation_config)))
+            end = start + timeout
+            error = None
+            while tasks:
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, end - time.perf_counter()),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError()
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        if task is not first:
+                            self._count("hedge_wins")
+                        self._latencies.append(time.perf_counter() - start)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def agenerate(self, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        """backend.agenerate with deadlines, retries, hedging and the breaker"""
+        self._admit()
+        deadline = time.perf_counter() + self.deadline
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.perf_counter()
+            try:
+                text = await self._attempt(prompt, generation_config, min(self.timeout, remaining))
+            except (LLMError, asyncio.TimeoutError) as e:
+                await asyncio.sleep(self._retry_wait(attempt, e, deadline))
+                continue
+            except BaseException:
+                # Cancelled (client went away) or a bug: not the upstream's fault
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return text
+
+    async def astream(self, prompt: str, generation_config: Optional[Dict] = None) -> AsyncIterator[str]:
+        """backend.astream, retried until the first token; each later token must arrive within `timeout`"""
+        self._admit()
+        deadline = time.perf_counter() + self.deadline
+        for attempt in range(self.retries + 1):
+            remaining = deadline - time.perf_counter()
+            self._count("attempts")
+            stream = self.backend.astream(prompt, generation_config).__aiter__()
+            try:
+                first = await asyncio.wait_for(stream.__anext__(), min(self.timeout, remaining))
+            except StopAsyncIteration:
+                self.breaker.record_success()
+                return
+            except (LLMError, asyncio.TimeoutError) as e:
+                await stream.aclose()
+                await asyncio.sleep(self._retry_wait(attempt, e, deadline))
+                continue
+            except BaseException:
+                await stream.aclose()
+                self.breaker.release()
+                raise
+            break
+
+        self.breaker.record_success()
+        try:
+            yield first
+            while True:
+                try:
+                    text = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                yield text
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise LLMError(f"LLM stream stalled for {self.timeout:.0f}s")
+        finally:
+            await stream.aclose()
+
+    def stats(self) -> Dict:
+        delay = self.hedge_delay()
+        return {
+            "backend": self.model_name,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            **self.counts,
+            "p95_ms": round(float(np.percentile(self._latencies, 95)) * 1000, 1) if self._latencies else None,
+            "hedge_delay_ms": round(delay * 1000, 1) if delay is not None else None,
+        }
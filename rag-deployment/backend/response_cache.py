@@ -0,0 +1,160 @@
+"""
+Semantic response cache: reuse LLM answers for near-identical questions
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+
+
+class SemanticCache:
+    """
+    LRU + TTL cache of chat responses keyed by query embedding.
+
+    A lookup hits when a cached question's embedding is within
+    `threshold` cosine similarity of the new one *and* retrieval returned
+    the same set of source documents, so answers are only reused when the
+    prompt context would be identical. Entries are therefore bucketed by
+    their source set, and a lookup scores only its bucket, with one
+    matrix-vector product; expired entries are dropped when their bucket
+    is looked up (or evicted as least recently used before that).
+    """
+
+    def __init__(self, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 ttl: float = RESPONSE_CACHE_TTL,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        """Create an empty cache"""
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # key -> entry dict, least recently used first
+        self._buckets: Dict[frozenset, Dict] = {}  # source key -> {"keys", "matrix" (stacked embeddings)}
+        self._next_key = 0
+        self._bytes = 0
+        self._index_version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, index_version):
+        """Drop everything if the index changed since entries were stored"""
+        if index_version != self._index_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+            self._index_version = index_version
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        bucket = self._buckets[entry["source_key"]]
+        bucket["keys"].remove(key)
+        bucket["matrix"] = None
+        if not bucket["keys"]:
+            del self._buckets[entry["source_key"]]
+
+    def get(self, embedding: Sequence[float], source_ids: Sequence[str],
+            index_version=None) -> Optional[Dict]:
+        """Return the cached {"response", "sources"} for a similar question, or None"""
+        query = self._normalize(embedding)
+        source_key = frozenset(source_ids)
+        now = time.monotonic()
+
+        with self._lock:
+            self._check_version(index_version)
+
+            best_key = None
+            bucket = self._buckets.get(source_key)
+            if bucket:
+                for key in [key for key in bucket["keys"] if now - self._entries[key]["created"] > self.ttl]:
+                    self._remove(key)
+            bucket = self._buckets.get(source_key)
+            if bucket:
+                if bucket["matrix"] is None:
+                    bucket["matrix"] = np.stack([self._entries[key]["embedding"] for key in bucket["keys"]])
+                scores = bucket["matrix"] @ query
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    best_key = bucket["keys"][best]
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            return {"response": entry["response"], "sources": entry["sources"]}
+
+    def put(self, embedding: Sequence[float], source_ids: Sequence[str], response: str,
+            sources: List[str], index_version=None):
+        """Store a response, evicting least recently used entries to stay in bounds"""
+        vector = self._normalize(embedding)
+        size = vector.nbytes + len(response.encode("utf-8")) + sum(len(s.encode("utf-8")) for s in sources)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version(index_version)
+
+            key = self._next_key
+            self._next_key += 1
+            source_key = frozenset(source_ids)
+            self._entries[key] = {
+                "embedding": vector,
+                "source_key": source_key,
+                "response": response,
+                "sources": list(sources),
+                "created": time.monotonic(),
+                "size": size,
+            }
+            self._bytes += size
+            bucket = self._buckets.setdefault(source_key, {"keys": [], "matrix": None})
+            bucket["keys"].append(key)
+            bucket["matrix"] = None
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Counters for /health"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
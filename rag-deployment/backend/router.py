@@ -0,0 +1,106 @@
+"""
+Message routing: curated Q&A answers, small talk, or full retrieval
+"""
+
+import re
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+from encoder import normalize_query
+from metrics import metrics
+
+ROUTES = ("qa", "smalltalk", "rag")
+
+# Whole-message greetings, thanks and farewells (optionally addressed to Jai)
+SMALL_TALK = re.compile(
+    r"(hi|hello|hey|hiya|yo|greetings|good (morning|afternoon|evening)|how are you( doing)?|"
+    r"what'?s up|sup|nice to meet you|thanks?( you)?( so much| a lot)?|thx|ty|cheers|"
+    r"ok(ay)?|cool|great|awesome|got it|bye|goodbye|see you|see ya|take care)"
+    r"( there| jai)?( (and )?(thanks|thank you))?"
+)
+
+
+def question_key(text: str) -> str:
+    """Exact-match key: normalize_query without trailing punctuation"""
+    return normalize_query(text).rstrip(" ?!.")
+
+
+class QueryRouter:
+    """
+    Decide how a message is answered.
+
+    - "smalltalk": greetings and thanks skip retrieval and go to the LLM
+      without context
+    - "qa": a curated Q&A pair whose question matches exactly (after
+      normalization) or within `threshold` cosine similarity is answered
+      directly, without retrieval or the LLM
+    - "rag": everything else
+
+    Q&A question embeddings are computed on the first semantic match, so
+    loading does not force the embedding model to load.
+    """
+
+    def __init__(self, threshold: float = ROUTER_QA_THRESHOLD, enabled: bool = ROUTER_ENABLED):
+        """Create a router with no Q&A pairs (see load)"""
+        self.threshold = threshold
+        self.enabled = enabled
+        self.counts = dict.fromkeys(ROUTES, 0)
+        self._pairs: List[Dict] = []
+        self._exact: Dict[str, int] = {}
+        self._embed_fn: Optional[Callable] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def load(self, qa_pairs: List[Dict], embed_fn: Callable):
+        """Index curated {"question", "answer"} pairs; `embed_fn` embeds a list of texts"""
+        pairs = [qa for qa in qa_pairs if qa.get("question") and qa.get("answer")]
+        with self._lock:
+            self._pairs = pairs
+            self._exact = {question_key(qa["question"]): i for i, qa in enumerate(pairs)}
+            self._embed_fn = embed_fn
+            self._matrix = None
+
+    def is_small_talk(self, text: str) -> bool:
+        words = re.sub(r"[^\w\s']", " ", normalize_query(text)).split()
+        return self.enabled and SMALL_TALK.fullmatch(" ".join(words)) is not None
+
+    def _question_matrix(self) -> np.ndarray:
+        with self._lock:
+            if self._matrix is None:
+                vectors = np.asarray(self._embed_fn([qa["question"] for qa in self._pairs]), dtype=np.float32)
+                self._matrix = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            return self._matrix
+
+    def match_qa(self, text: str, query_embedding: Optional[Sequence[float]] = None) -> Optional[Dict]:
+        """
+        The curated pair answering `text` ({"question", "answer", "similarity"}),
+        or None. Without `query_embedding` only exact matches are found.
+        """
+        if not self.enabled or not self._pairs:
+            return None
+        i = self._exact.get(question_key(text))
+        if i is not None:
+            return dict(self._pairs[i], similarity=1.0)
+        if query_embedding is None:
+            return None
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = self._question_matrix() @ (query / max(float(np.linalg.norm(query)), 1e-12))
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            return dict(self._pairs[best], similarity=round(float(scores[best]), 4))
+        return None
+
+    def record(self, route: str):
+        """Count one message answered by `route`"""
+        with self._lock:
+            self.counts[route] += 1
+        metrics.increment("routes", "route", route)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"enabled": self.enabled, "qa_pairs": len(self._pairs), "routes": dict(self.counts)}
@@ -0,0 +1,221 @@
+"""
+Server-side conversation sessions: a bounded ring buffer of turns per session ID
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import sys
+sys.path.append('../..')
+from config import *
+
+TURN_OVERHEAD_BYTES = 64  # rough per-turn bookkeeping on top of the text
+
+
+def new_session_id() -> str:
+    """Random, unguessable session ID"""
+    return uuid.uuid4().hex
+
+
+def turn_size(content: str) -> int:
+    return len(content.encode("utf-8")) + TURN_OVERHEAD_BYTES
+
+
+class SessionStore:
+    """
+    Conversation history keyed by session ID.
+
+    Each session keeps only its last `max_turns` messages. Whole sessions
+    are evicted least recently used first when there are more than
+    `max_sessions` or their turns exceed `max_bytes` in total.
+    """
+
+    def __init__(self, max_turns: int = SESSION_MAX_TURNS,
+                 max_sessions: int = SESSION_MAX_SESSIONS,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.evictions = 0
+
+    def get(self, session_id: str) -> List[Dict]:
+        """Turns of a session as [{"role", "content"}], oldest first (empty if unknown)"""
+        raise NotImplementedError
+
+    def append(self, session_id: str, turns: List[Dict]):
+        """Add turns to a session, creating it if needed"""
+        raise NotImplementedError
+
+    def clear(self, session_id: str) -> bool:
+        """Forget a session; returns whether it existed"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        """Counters for /health"""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in process memory (single worker)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # session_id -> deque of (role, content), least recently used first
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _drop(self, session_id: str):
+        turns = self._sessions.pop(session_id)
+        self._bytes -= sum(turn_size(content) for _, content in turns)
+
+    def get(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            turns = self._sessions.get(session_id)
+            if turns is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            return [{"role": role, "content": content} for role, content in turns]
+
+    def append(self, session_id: str, turns: List[Dict]):
+        with self._lock:
+            buffer = self._sessions.get(session_id)
+            if buffer is None:
+                buffer = self._sessions[session_id] = deque(maxlen=self.max_turns)
+            self._sessions.move_to_end(session_id)
+            for turn in turns:
+                if len(buffer) == buffer.maxlen:
+                    self._bytes -= turn_size(buffer[0][1])  # about to fall off the ring
+                buffer.append((turn["role"], turn["content"]))
+                self._bytes += turn_size(turn["content"])
+
+            while len(self._sessions) > self.max_sessions or (
+                    self._bytes > self.max_bytes and len(self._sessions) > 1):
+                self._drop(next(iter(self._sessions)))
+                self.evictions += 1
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._drop(session_id)
+            return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite database, shared by all workers on a host.
+
+    WAL mode lets readers proceed while another worker writes.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL,
+                    bytes INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used);
+                CREATE TABLE IF NOT EXISTS turns (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                ) WITHOUT ROWID;
+            """)
+
+    def _drop(self, session_id: str) -> bool:
+        self._conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+        return self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def get(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+            if rows:
+                self._conn.execute("UPDATE sessions SET last_used = ? WHERE session_id = ?",
+                                   (time.time(), session_id))
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def append(self, session_id: str, turns: List[Dict]):
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                next_seq = conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO turns (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    [(session_id, next_seq + i, turn["role"], turn["content"]) for i, turn in enumerate(turns)]
+                )
+                # Ring buffer: keep the newest max_turns
+                conn.execute("DELETE FROM turns WHERE session_id = ? AND seq < ?",
+                             (session_id, next_seq + len(turns) - self.max_turns))
+                size = conn.execute(
+                    "SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) + COUNT(*) * ? "
+                    "FROM turns WHERE session_id = ?", (TURN_OVERHEAD_BYTES, session_id)
+                ).fetchone()[0]
+                conn.execute(
+                    "INSERT INTO sessions (session_id, last_used, bytes) VALUES (?, ?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET last_used = excluded.last_used, bytes = excluded.bytes",
+                    (session_id, time.time(), size)
+                )
+
+                count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+                while count > self.max_sessions or (total > self.max_bytes and count > 1):
+                    oldest, oldest_bytes = conn.execute(
+                        "SELECT session_id, bytes FROM sessions ORDER BY last_used LIMIT 1"
+                    ).fetchone()
+                    self._drop(oldest)
+                    count, total = count - 1, total - oldest_bytes
+                    self.evictions += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def clear(self, session_id: str) -> bool:
+        with self._lock:
+            return self._drop(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions"
+            ).fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": total, "evictions": self.evictions}
+
+
+def create_session_store(backend: str = SESSION_STORE, path: Optional[str] = None) -> SessionStore:
+    """Session store for the configured backend ("memory" or "sqlite")"""
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore(path or str(Path("../..") / SESSION_DB_PATH))
+    raise ValueError(f"Unknown session store: {backend}")
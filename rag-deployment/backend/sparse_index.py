@@ -0,0 +1,121 @@
+"""
+BM25 keyword index over the RAG documents, with precomputed posting lists
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Keeps tech terms intact: "c++", "c#", "node.js", "gpt-2"
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.\-][a-z0-9+#]+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be been by can did do does for from had has have he her his how i in is it
+its me my of on or our she so that the their them they this to was we were what when where which
+who why will with you your about tell know any
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase keyword tokens, minus stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed document set.
+
+    BM25 weights depend only on the term, the document and corpus
+    statistics, so they are computed once at build time and stored per
+    posting. A query is then just a sum of the posting arrays of its terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """Create an empty index"""
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.postings: Dict[str, tuple] = {}  # term -> (doc positions int32, weights float32)
+
+    def build(self, ids: List[str], documents: List[str], metadatas: List[Dict]):
+        """(Re)build postings for the given documents"""
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+
+        term_counts = [Counter(tokenize(document)) for document in documents]
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        n_docs = len(documents)
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+
+        positions = defaultdict(list)
+        frequencies = defaultdict(list)
+        for position, counts in enumerate(term_counts):
+            for term, count in counts.items():
+                positions[term].append(position)
+                frequencies[term].append(count)
+
+        self.postings = {}
+        for term, docs in positions.items():
+            docs = np.array(docs, dtype=np.int32)
+            tf = np.array(frequencies[term], dtype=np.float32)
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / (avg_length or 1))
+            self.postings[term] = (docs, (idf * tf * (self.k1 + 1) / (tf + norm)).astype(np.float32))
+
+    def search(self, query_text: str, top_k: int = 3, where: Optional[Dict] = None) -> List[Dict]:
+        """Top-k documents by BM25 score ({"id", "text", "metadata", "distance": None, "score"})"""
+        terms = [term for term in set(tokenize(query_text)) if term in self.postings]
+        if not terms:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            docs, weights = self.postings[term]
+            scores[docs] += weights  # positions are unique within a posting list
+
+        matched = np.flatnonzero(scores)
+        if where:
+            matched = np.array([
+                i for i in matched
+                if all(self.metadatas[i].get(key) == value for key, value in where.items())
+            ], dtype=np.int64)
+        if matched.size == 0:
+            return []
+
+        k = min(top_k, matched.size)
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]] if k < matched.size else matched
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            {
+                "id": self.ids[i],
+                "text": self.documents[i],
+                "metadata": self.metadatas[i],
+                "distance": None,
+                "score": float(scores[i])
+            }
+            for i in top
+        ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], top_k: int, k: int = 60) -> List[Dict]:
+    """
+    Merge ranked result lists by reciprocal rank fusion: score = sum of 1 / (k + rank).
+
+    The first occurrence of a document supplies its fields (so dense
+    results keep their distance); "rrf_score" is added to each result.
+    """
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = defaultdict(float)
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            fused.setdefault(result["id"], result)
+            scores[result["id"]] += 1.0 / (k + rank)
+
+    ranked = sorted(fused, key=lambda doc_id: scores[doc_id], reverse=True)[:top_k]
+    return [dict(fused[doc_id], rrf_score=round(scores[doc_id], 6)) for doc_id in ranked]
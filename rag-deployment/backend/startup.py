@@ -0,0 +1,129 @@
+"""
+Background startup: run slow initialization phases while the server already accepts connections
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+class StartupTracker:
+    """
+    Runs named initialization phases in worker threads and records their
+    state ("pending", "running", "done", "failed", "skipped") and duration.
+
+    Request handlers can wait for a phase with a timeout instead of the
+    whole server being unavailable until every phase has finished. A
+    failed `optional` phase (e.g. a warm-up) does not hold back readiness;
+    the service is then ready but reported as degraded. A failed required
+    phase is reported as failed and can be re-run on demand with retry(),
+    at most once every `retry_interval` seconds.
+    """
+
+    def __init__(self, *phases: str, optional: Tuple[str, ...] = (), retry_interval: float = 30.0):
+        """Register the phases that make up startup"""
+        self.created = time.perf_counter()
+        self.started = False
+        self.phases: Dict[str, Dict] = {name: {"state": "pending"} for name in phases}
+        self.optional = set(optional)
+        self.retry_interval = retry_interval
+        self._events: Dict[str, asyncio.Event] = {}
+        self._calls: Dict[str, Tuple[Callable, Tuple]] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    def _event(self, name: str) -> asyncio.Event:
+        if name not in self._events:
+            self._events[name] = asyncio.Event()
+        return self._events[name]
+
+    def begin(self):
+        """Mark startup as under way: from now on, waiters block until phases finish"""
+        self.started = True
+
+    async def run_phase(self, name: str, fn: Callable, *args):
+        """Run `fn(*args)` in a thread as phase `name`; returns its result, or None if it failed"""
+        phase = self._mark_running(name, fn, args)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+            phase["state"] = "done"
+            return result
+        except Exception as e:
+            phase.update(state="failed", error=f"{type(e).__name__}: {e}")
+            phase["failures"] = phase.get("failures", 0) + 1
+            self._failed_at[name] = time.perf_counter()
+            return None
+        finally:
+            phase["seconds"] = round(time.perf_counter() - start, 3)
+            self._event(name).set()
+
+    def _mark_running(self, name: str, fn: Callable, args: Tuple) -> Dict:
+        phase = self.phases.setdefault(name, {})
+        phase.update(state="running", started_s=round(time.perf_counter() - self.created, 3))
+        phase.pop("error", None)
+        self._calls[name] = (fn, args)
+        self._event(name).clear()  # a re-run: waiters block until it finishes
+        return phase
+
+    def skip_phase(self, name: str):
+        """Mark a phase as not needed (counts as done)"""
+        self.phases.setdefault(name, {})["state"] = "skipped"
+        self._event(name).set()
+
+    def is_done(self, name: str) -> bool:
+        return self.phases.get(name, {}).get("state") in ("done", "skipped")
+
+    @property
+    def ready(self) -> bool:
+        """Every phase finished successfully (or was skipped), apart from failed optional ones"""
+        return all(self.is_done(name) or name in self.degraded for name in self.phases)
+
+    @property
+    def degraded(self) -> List[str]:
+        """Optional phases that failed"""
+        return [name for name in self.optional if self.phases.get(name, {}).get("state") == "failed"]
+
+    @property
+    def failed(self) -> List[str]:
+        """Required phases that failed"""
+        return [name for name, phase in self.phases.items()
+                if phase.get("state") == "failed" and name not in self.optional]
+
+    async def wait(self, name: str, timeout: float) -> Union[bool, str]:
+        """
+        Wait up to `timeout` seconds for a phase to finish: True if it
+        succeeded, "failed" if it failed, False if it is still running
+        """
+        if not self.started:
+            return True  # components were set up directly (tests, benchmarks)
+        try:
+            await asyncio.wait_for(self._event(name).wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True if self.is_done(name) else "failed"
+
+    async def retry(self, name: str, timeout: float) -> Union[bool, str]:
+        """
+        Re-run a failed phase with its original arguments and wait for it
+        like wait(). Within `retry_interval` of the last failure the phase
+        is not re-run and "failed" is returned at once.
+        """
+        phase = self.phases.get(name, {})
+        if phase.get("state") == "failed" and name in self._calls:
+            if time.perf_counter() - self._failed_at.get(name, 0.0) < self.retry_interval:
+                return "failed"
+            fn, args = self._calls[name]
+            self._mark_running(name, fn, args)  # concurrent callers wait for this re-run
+            # A task of its own: the waiting request going away must not abandon the re-run
+            asyncio.ensure_future(self.run_phase(name, fn, *args))
+        return await self.wait(name, timeout)
+
+    def snapshot(self, now: Optional[float] = None) -> Dict:
+        """Phase states for /health"""
+        return {
+            "ready": self.ready,
+            "degraded": self.degraded,
+            "failed": self.failed,
+            "uptime_s": round((now or time.perf_counter()) - self.created, 3),
+            "phases": {name: dict(phase) for name, phase in self.phases.items()},
+        }
@@ -0,0 +1,110 @@
+"""
+Token counting with the embedding model's tokenizer, shared by chunking (data/chunking.py) and prompt assembly
+
+Deliberately free of the `config` import so the data pipeline can use it
+without a deployment config.
+"""
+
+import json
+import re
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+APPROX_TOKEN = re.compile(r'\w+|[^\w\s]')
+
+# MiniLM truncates inputs at 256 word pieces, so longer chunks are never fully embedded
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (words + punctuation), close to subword counts for English prose"""
+    return len(APPROX_TOKEN.findall(text))
+
+
+class TokenCounter:
+    """
+    Count tokens with the embedding model's tokenizer, so indexed chunk
+    `tokens` and prompt budgets are in the same unit.
+
+    Uses the `tokenizers` library (no PyTorch), with tokenizer.json from a
+    local model directory, the exported ONNX model (`onnx_dir`) or the
+    Hugging Face Hub, loaded on first use. Without a tokenizer every count
+    is an estimate_tokens() estimate, and `exact` is False so callers can
+    re-estimate indexed counts instead of mixing the two units.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, onnx_dir: Optional[str] = None):
+        """Record where to look for the tokenizer"""
+        self.model_name = model_name
+        self.onnx_dir = Path(onnx_dir) if onnx_dir else None
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the tokenizer, or settle on estimates if there is none (idempotent)"""
+        with self._lock:
+            if self._loaded:
+                return self._tokenizer
+            try:
+                from tokenizers import Tokenizer
+
+                local = Path(self.model_name) / "tokenizer.json"
+                exported = self.onnx_dir / "tokenizer.json" if self.onnx_dir else None
+                if local.exists():
+                    tokenizer = Tokenizer.from_file(str(local))
+                elif exported and exported.exists() and self._exported_model() == self.model_name:
+                    tokenizer = Tokenizer.from_file(str(exported))
+                else:
+                    repo = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+                    tokenizer = Tokenizer.from_pretrained(repo)
+                tokenizer.no_truncation()
+                tokenizer.no_padding()
+                self._tokenizer = tokenizer
+            except Exception as e:
+                print(f"⚠️  Tokenizer for {self.model_name} unavailable ({type(e).__name__}), estimating token counts")
+            self._loaded = True
+            return self._tokenizer
+
+    def _exported_model(self) -> Optional[str]:
+        try:
+            with open(self.onnx_dir / "encoder_config.json", 'r', encoding='utf-8') as f:
+                return json.load(f).get("model_name")
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from the tokenizer (False: estimates)"""
+        return self.load() is not None
+
+    @property
+    def name(self) -> str:
+        """The tokenizer's model name, or "approximate" for estimates"""
+        return self.model_name if self.exact else "approximate"
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Token counts for several texts (one tokenizer call)"""
+        if not texts:
+            return []
+        tokenizer = self.load()
+        if tokenizer is None:
+            return [estimate_tokens(text) for text in texts]
+        return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest head of `text` that is at most `max_tokens` tokens"""
+        if max_tokens <= 0:
+            return ""
+        tokenizer = self.load()
+        if tokenizer is None:
+            spans = [match.end() for match in APPROX_TOKEN.finditer(text)]
+        else:
+            spans = [end for _, end in tokenizer.encode(text, add_special_tokens=False).offsets]
+        if len(spans) <= max_tokens:
+            return text
+        return text[:spans[max_tokens - 1]].rstrip()
@@ -0,0 +1,572 @@
+"""
+Vector store backends for ResumeRAG: ChromaDB and an in-process NumPy exact search
+"""
+
+import json
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import sys
+sys.path.append('../..')
+from config import *
+
+
+class VectorStore:
+    """
+    Interface shared by the vector store backends.
+
+    Stores documents with ids, metadata and embeddings, plus a small dict
+    of store-level metadata (used by ResumeRAG to tag index builds).
+    `where` filters are equality matches on metadata fields, e.g.
+    {"type": "qa_pair"}; several fields are combined with AND.
+    """
+
+    @property
+    def metadata(self) -> Dict:
+        raise NotImplementedError
+
+    def set_metadata(self, metadata: Dict):
+        raise NotImplementedError
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever documents are added, updated or deleted"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def get_metadatas(self) -> Dict[str, Dict]:
+        """Metadata of every stored document, by id"""
+        raise NotImplementedError
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        """Which of `ids` are stored"""
+        raise NotImplementedError
+
+    def get_documents(self) -> Tuple[List[str], List[str], List[Dict]]:
+        """All stored (ids, documents, metadatas)"""
+        raise NotImplementedError
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[Sequence] = None):
+        """Add documents, embedding them unless `embeddings` is given"""
+        raise NotImplementedError
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]):
+        raise NotImplementedError
+
+    def query(self, query_embeddings: Sequence, top_k: int, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """Top-k matches ({"id", "text", "metadata", "distance"}) for each query embedding"""
+        raise NotImplementedError
+
+    def reset(self):
+        """Remove all documents and store metadata"""
+        raise NotImplementedError
+
+    def begin_batch(self):
+        """Start grouping changes so they are written together by end_batch() (no-op by default)"""
+
+    def end_batch(self):
+        """Write the changes made since the matching begin_batch()"""
+
+    @contextmanager
+    def batch(self):
+        """Group changes into one write: `with store.batch(): ...`"""
+        self.begin_batch()
+        try:
+            yield
+        finally:
+            self.end_batch()
+
+
+class ChromaStore(VectorStore):
+    """
+    ChromaDB collection (in-memory, or on disk with `persist_dir`).
+    
+    Documents are embedded with `embedding_fn` before they reach Chroma;
+    the function is also registered with the collection only if it is one
+    of Chroma's own.
+    """
+
+    def __init__(self, name: str, embedding_fn: Callable, persist_dir: Optional[str] = None):
+        """Open or create the collection"""
+        import chromadb
+
+        if persist_dir:
+            self.client = chromadb.PersistentClient(path=str(persist_dir))
+        else:
+            self.client = chromadb.Client()
+        self.name = name
+        self.embedding_fn = embedding_fn
+        self.collection = self._get_collection()
+        self._version = 0
+
+    def _get_collection(self):
+        native = type(self.embedding_fn).__module__.startswith("chromadb")
+        return self.client.get_or_create_collection(
+            name=self.name,
+            embedding_function=self.embedding_fn if native else None
+        )
+
+    @staticmethod
+    def _where(where: Optional[Dict]) -> Optional[Dict]:
+        """Translate an equality filter into Chroma's where syntax"""
+        if not where or len(where) == 1:
+            return where or None
+        return {"$and": [{key: value} for key, value in where.items()]}
+
+    @property
+    def metadata(self) -> Dict:
+        return self.collection.metadata or {}
+
+    def set_metadata(self, metadata: Dict):
+        self.collection.modify(metadata=metadata)
+
+    @property
+    def version(self) -> int:
+        """Counts this process's changes only: another process writing the same persist_dir is not seen"""
+        return self._version
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get_metadatas(self) -> Dict[str, Dict]:
+        existing = self.collection.get(include=["metadatas"])
+        return dict(zip(existing["ids"], existing["metadatas"]))
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        return set(self.collection.get(ids=list(ids), include=[])["ids"]) if ids else set()
+
+    def get_documents(self) -> Tuple[List[str], List[str], List[Dict]]:
+        existing = self.collection.get(include=["documents", "metadatas"])
+        return existing["ids"], existing["documents"], existing["metadatas"]
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[Sequence] = None):
+        if embeddings is None:
+            embeddings = self.embedding_fn(documents)
+        self.collection.add(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=[np.asarray(e, dtype=np.float32) for e in embeddings]
+        )
+        self._version += 1
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+        self._version += 1
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+        self._version += 1
+
+    def query(self, query_embeddings: Sequence, top_k: int, where: Optional[Dict] = None) -> List[List[Dict]]:
+        results = self.collection.query(
+            query_embeddings=[np.asarray(e, dtype=np.float32) for e in query_embeddings],
+            n_results=top_k,
+            where=self._where(where)
+        )
+
+        # Format results
+        formatted_results = []
+        for q in range(len(results['ids'])):
+            matches = []
+            for i, doc in enumerate(results['documents'][q]):
+                matches.append({
+                    "id": results['ids'][q][i],
+                    "text": doc,
+                    "metadata": results['metadatas'][q][i],
+                    "distance": results['distances'][q][i] if results.get('distances') else None
+                })
+            formatted_results.append(matches)
+        return formatted_results
+
+    def reset(self):
+        self.client.delete_collection(self.name)
+        self.collection = self._get_collection()
+        self._version += 1
+
+
+class _Rows(NamedTuple):
+    """One consistent state of a NumpyStore; replaced whole, never modified, when documents change"""
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict]
+    embeddings: np.ndarray
+    positions: Dict[str, int]
+    columns: Dict[str, tuple]  # metadata field -> (codes, codes_by_value), filled lazily
+
+
+def _rows(ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: np.ndarray,
+          positions: Optional[Dict[str, int]] = None) -> _Rows:
+    if positions is None:
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+    return _Rows(ids, documents, metadatas, embeddings, positions, {})
+
+
+class NumpyStore(VectorStore):
+    """
+    Exact search over a contiguous float32 matrix of normalized embeddings.
+
+    Top-k is one matrix-vector product plus `argpartition`, which beats an
+    ANN index's per-query overhead for small and medium corpora. With
+    `persist_dir` the matrix is saved as .npy and, if `mmap` is set,
+    memory-mapped read-only on load so the OS page cache is shared between
+    processes. Distances are squared L2 between unit vectors (2 - 2 * cosine),
+    the same scale Chroma reports for normalized embeddings.
+
+    Documents live in one immutable `_Rows` snapshot that a change builds
+    in full and then swaps in, so a query running during ingestion reads
+    either the old or the new rows, never a mix of the two.
+
+    Processes sharing `persist_dir` (API workers) stay consistent: a change
+    takes an exclusive file lock, reloads whatever another process saved
+    since, applies the change and saves. Inside `batch()` the lock is held
+    and the save deferred until the batch ends, so a bulk ingest writes the
+    files once. Reads check the saved files' identity (one stat) and reload
+    under a shared lock when another process has saved, so every worker
+    sees new documents and a new `version`.
+    """
+
+    EMBED_BATCH_SIZE = 64
+
+    def __init__(self, name: str, embedding_fn: Callable, persist_dir: Optional[str] = None,
+                 mmap: bool = NUMPY_STORE_MMAP):
+        """Load the store from disk if it was persisted"""
+        self.name = name
+        self.embedding_fn = embedding_fn
+        self.directory = Path(persist_dir) / f"numpy_{name}" if persist_dir else None
+        self.mmap = mmap
+
+        self._rows = _rows([], [], [], np.zeros((0, 0), dtype=np.float32))
+        self._buffer = None  # backs the rows' embeddings (plus spare rows) once documents are added
+        self._metadata: Dict = {}
+        self._version = 0
+        self._generation = None  # identity of the records file last loaded or saved
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._held: Optional[ExitStack] = None  # file lock of the outermost batch
+        self._dirty = False  # changed since the last save
+
+        if self.directory:
+            with self._lock, self._file_lock(shared=True):
+                self._load()
+
+    # Persistence
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Lock the persisted files against other processes (shared for reads, exclusive for writes)"""
+        try:
+            import fcntl
+        except ImportError:  # Windows: no advisory locks, run one worker
+            yield
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _disk_generation(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the saved records file; every save replaces it"""
+        try:
+            stat = os.stat(self.directory / "records.json")
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        """Reload if another process has saved since we last loaded or saved"""
+        if not self.directory or self._disk_generation() == self._generation:
+            return
+        with self._lock:
+            if self._batch_depth:
+                # This thread's batch holds the exclusive lock: a second flock
+                # on a new descriptor would wait for it forever
+                if self._disk_generation() != self._generation:
+                    self._load()
+                return
+            with self._file_lock(shared=True):
+                if self._disk_generation() != self._generation:
+                    self._load()
+
+    @contextmanager
+    def _writing(self, content: bool = True):
+        """Apply a change on top of the latest saved state (`content`: bump the version); saved when the batch ends"""
+        with self.batch():
+            yield
+            if content:
+                self._version += 1
+            self._dirty = True
+
+    def _load(self):
+        records_path = self.directory / "records.json"
+        embeddings_path = self.directory / "embeddings.npy"
+        # Recorded even when the files are ignored, so reads don't retry the load
+        self._generation = self._disk_generation()
+        if not records_path.exists() or not embeddings_path.exists():
+            return
+
+        with open(records_path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        embeddings = np.load(embeddings_path, mmap_mode='r' if self.mmap else None)
+
+        # A crash between the two writes leaves them out of sync: start empty
+        if len(records["ids"]) != embeddings.shape[0]:
+            print(f"⚠️  {self.directory} is inconsistent, ignoring it")
+            return
+
+        self._rows = _rows(records["ids"], records["documents"], records["metadatas"], embeddings)
+        self._buffer = None
+        self._metadata = records["metadata"]
+        self._version = records.get("version", 0)
+
+    def _save(self):
+        """Write the files (holding the exclusive file lock)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        rows = self._rows
+
+        embeddings_tmp = self.directory / "embeddings.tmp.npy"
+        np.save(embeddings_tmp, np.ascontiguousarray(rows.embeddings))
+        os.replace(embeddings_tmp, self.directory / "embeddings.npy")
+
+        records_tmp = self.directory / "records.json.tmp"
+        with open(records_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                "ids": rows.ids,
+                "documents": rows.documents,
+                "metadatas": rows.metadatas,
+                "metadata": self._metadata,
+                "version": self._version,
+            }, f)
+        os.replace(records_tmp, self.directory / "records.json")
+        self._generation = self._disk_generation()
+
+    def _append(self, embeddings: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+        """
+        `embeddings` followed by `vectors`, growing a spare-capacity buffer
+        geometrically (amortized O(1)). New rows go past the end of every
+        published snapshot, so readers of older rows are unaffected.
+        """
+        n = embeddings.shape[0]
+        needed = n + vectors.shape[0]
+        if self._buffer is None or self._buffer.shape[0] < needed or self._buffer.shape[1] != vectors.shape[1]:
+            # Also taken when embeddings are a read-only memory map
+            buffer = np.empty((max(needed, 2 * n, 64), vectors.shape[1]), dtype=np.float32)
+            if n:
+                buffer[:n] = embeddings
+            self._buffer = buffer
+        self._buffer[n:needed] = vectors
+        return self._buffer[:needed]
+
+    # Helpers
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def _embed(self, documents: List[str]) -> np.ndarray:
+        batches = [
+            self.embedding_fn(documents[i:i + self.EMBED_BATCH_SIZE])
+            for i in range(0, len(documents), self.EMBED_BATCH_SIZE)
+        ]
+        return self._normalize([vector for batch in batches for vector in batch])
+
+    @staticmethod
+    def _column(rows: _Rows, key: str):
+        """Metadata field as integer codes, built once per key and snapshot and reused"""
+        if key not in rows.columns:
+            codes_by_value = {}
+            codes = np.fromiter(
+                (codes_by_value.setdefault(meta.get(key), len(codes_by_value)) for meta in rows.metadatas),
+                dtype=np.int32,
+                count=len(rows.metadatas)
+            )
+            rows.columns[key] = (codes, codes_by_value)
+        return rows.columns[key]
+
+    def _mask(self, rows: _Rows, where: Dict) -> np.ndarray:
+        mask = np.ones(len(rows.ids), dtype=bool)
+        for key, value in where.items():
+            codes, codes_by_value = self._column(rows, key)
+            if value not in codes_by_value:
+                return np.zeros(len(rows.ids), dtype=bool)
+            mask &= codes == codes_by_value[value]
+        return mask
+
+    # VectorStore interface
+
+    def begin_batch(self):
+        """
+        Hold the locks until the matching end_batch(), which saves once.
+        Batches nest; begin and end must run on the same thread.
+        """
+        self._lock.acquire()
+        if self._batch_depth == 0 and self.directory:
+            held = ExitStack()
+            try:
+                held.enter_context(self._file_lock())
+                if self._disk_generation() != self._generation:
+                    self._load()
+            except BaseException:
+                held.close()
+                self._lock.release()
+                raise
+            self._held = held
+        self._batch_depth += 1
+
+    def end_batch(self):
+        self._batch_depth -= 1
+        try:
+            if self._batch_depth == 0 and self.directory:
+                try:
+                    if self._dirty:
+                        self._save()
+                finally:
+                    self._dirty = False
+                    self._held.close()
+                    self._held = None
+        finally:
+            self._lock.release()
+
+    @property
+    def metadata(self) -> Dict:
+        self._refresh()
+        return dict(self._metadata)
+
+    def set_metadata(self, metadata: Dict):
+        with self._writing(content=False):
+            self._metadata = dict(metadata)
+
+    @property
+    def version(self) -> int:
+        self._refresh()
+        return self._version
+
+    def count(self) -> int:
+        self._refresh()
+        return len(self._rows.ids)
+
+    def get_metadatas(self) -> Dict[str, Dict]:
+        self._refresh()
+        rows = self._rows
+        return dict(zip(rows.ids, rows.metadatas))
+
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        self._refresh()
+        positions = self._rows.positions
+        return {doc_id for doc_id in ids if doc_id in positions}
+
+    def get_documents(self) -> Tuple[List[str], List[str], List[Dict]]:
+        self._refresh()
+        rows = self._rows
+        return list(rows.ids), list(rows.documents), list(rows.metadatas)
+
+    def add(self, ids: List[str], documents: List[str], metadatas: List[Dict],
+            embeddings: Optional[Sequence] = None):
+        if not ids:
+            return
+        vectors = self._embed(documents) if embeddings is None else self._normalize(embeddings)
+        with self._writing():
+            rows = self._rows
+            duplicates = [doc_id for doc_id in ids if doc_id in rows.positions]
+            if duplicates or len(set(ids)) != len(ids):
+                raise ValueError(f"Duplicate document ids: {duplicates[:5] or ids}")
+            positions = dict(rows.positions)
+            positions.update((doc_id, len(rows.ids) + i) for i, doc_id in enumerate(ids))
+            self._rows = _rows(rows.ids + list(ids), rows.documents + list(documents),
+                               rows.metadatas + list(metadatas), self._append(rows.embeddings, vectors), positions)
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        with self._writing():
+            rows = self._rows
+            updated = list(rows.metadatas)
+            for doc_id, metadata in zip(ids, metadatas):
+                updated[rows.positions[doc_id]] = metadata
+            self._rows = _rows(rows.ids, rows.documents, updated, rows.embeddings, rows.positions)
+
+    def delete(self, ids: List[str]):
+        self._refresh()
+        if not any(doc_id in self._rows.positions for doc_id in ids):
+            return
+        with self._writing():
+            rows = self._rows
+            drop = {rows.positions[doc_id] for doc_id in ids if doc_id in rows.positions}
+            keep = [i for i in range(len(rows.ids)) if i not in drop]
+            self._buffer = None
+            self._rows = _rows([rows.ids[i] for i in keep], [rows.documents[i] for i in keep],
+                               [rows.metadatas[i] for i in keep], np.ascontiguousarray(rows.embeddings[keep]))
+
+    def query(self, query_embeddings: Sequence, top_k: int, where: Optional[Dict] = None) -> List[List[Dict]]:
+        self._refresh()
+        rows = self._rows
+        queries = self._normalize(query_embeddings)
+        if len(rows.ids) == 0:
+            return [[] for _ in range(len(queries))]
+
+        # (n_docs, dim) @ (dim, n_queries): one BLAS call for all queries,
+        # restricted to the rows that pass the filter
+        candidates = None
+        if where:
+            candidates = np.flatnonzero(self._mask(rows, where))
+            scores = rows.embeddings[candidates] @ queries.T
+        else:
+            scores = rows.embeddings @ queries.T
+
+        formatted_results = []
+        for q in range(queries.shape[0]):
+            column = scores[:, q]
+            k = min(top_k, column.shape[0])
+            if k == 0:
+                formatted_results.append([])
+                continue
+            if k < column.shape[0]:
+                top = np.argpartition(-column, k - 1)[:k]
+            else:
+                top = np.arange(column.shape[0])
+            top = top[np.argsort(-column[top], kind="stable")]
+
+            matches = []
+            for i in top:
+                position = int(candidates[i]) if candidates is not None else int(i)
+                matches.append({
+                    "id": rows.ids[position],
+                    "text": rows.documents[position],
+                    "metadata": rows.metadatas[position],
+                    "distance": max(0.0, 2.0 - 2.0 * float(column[i]))
+                })
+            formatted_results.append(matches)
+        return formatted_results
+
+    def reset(self):
+        with self._writing():
+            self._rows = _rows([], [], [], np.zeros((0, 0), dtype=np.float32))
+            self._buffer = None
+            self._metadata = {}
+
+
+def create_vector_store(backend: str, name: str, embedding_fn: Callable,
+                        persist_dir: Optional[str] = None) -> VectorStore:
+    """Create the configured vector store backend"""
+    if backend == "chroma":
+        return ChromaStore(name, embedding_fn, persist_dir)
+    if backend == "numpy":
+        return NumpyStore(name, embedding_fn, persist_dir)
+    raise ValueError(f"Unknown vector store backend: {backend}")
@@ -0,0 +1,178 @@
+"""
+Measure /chat/batch throughput against the same questions sent as individual /chat requests
+
+Serves the app (real retrieval over a synthetic corpus, fake LLM) and,
+for each simulated candidate page, asks the screening questions:
+  - sequential:  one /chat request after another (one client, as today)
+  - concurrent:  all /chat requests at once
+  - batch:       one /chat/batch request, once per --batch-concurrency
+                 (answers generated at once, CHAT_BATCH_CONCURRENCY)
+Questions are suffixed with the candidate number so every page misses
+the query-embedding cache. The report gives the median wall time per page
+and questions per second. It also gives the retrieval time alone:
+per-question encodes and searches against one encoder pass and one
+multi-query search.
+
+Usage:
+    python rag-deployment/benchmarks/batch_chat.py [--questions 20] [--pages 5] [--docs 500]
+                                                   [--batch-concurrency 8 20]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Never touch the network; every question must reach retrieval and the LLM
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import synthetic_data_dir
+
+import uvicorn
+import app as backend
+
+SCREENING_QUESTIONS = [
+    "What are your main technical skills?",
+    "What programming languages do you know?",
+    "What is your educational background?",
+    "Tell me about your experience with AWS",
+    "Have you used PyTorch in production?",
+    "What projects have you worked on?",
+    "Do you have experience with Kubernetes?",
+    "How do you approach problem-solving?",
+    "What ML frameworks are you familiar with?",
+    "Have you built data pipelines?",
+    "What is your experience with Docker?",
+    "Have you worked with SQL databases?",
+    "Tell me about a scalable system you designed",
+    "Do you have NLP experience?",
+    "What cloud platforms have you used?",
+    "Have you deployed models to production?",
+    "What web frameworks do you know?",
+    "Have you led a team?",
+    "What interests you most in technology?",
+    "Why are you a good fit for an ML engineering role?",
+]
+
+
+def start_server() -> int:
+    """Run the API in a background thread and return its port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    # lifespan="off": the RAG system is installed directly
+    config = uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return port
+
+
+def post(port: int, path: str, payload: dict) -> dict:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request("POST", path, body=json.dumps(payload), headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    if response.status != 200:
+        raise RuntimeError(f"{path}: HTTP {response.status} {body[:200]!r}")
+    return json.loads(body)
+
+
+def sequential(port: int, questions):
+    for question in questions:
+        post(port, "/chat", {"message": question})
+
+
+def concurrent(port: int, questions):
+    with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+        list(pool.map(lambda question: post(port, "/chat", {"message": question}), questions))
+
+
+def batch(port: int, questions):
+    answers = post(port, "/chat/batch", {"questions": questions})["answers"]
+    assert [answer["question"] for answer in answers] == questions
+    assert not any(answer["error"] for answer in answers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=20, help="questions per page (at most 20)")
+    parser.add_argument("--pages", type=int, default=5, help="candidate pages per variant")
+    parser.add_argument("--docs", type=int, default=500, help="synthetic corpus size")
+    parser.add_argument("--model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--batch-concurrency", type=int, nargs="+", default=None,
+                        help="default: CHAT_BATCH_CONCURRENCY")
+    args = parser.parse_args()
+
+    from config import CHAT_BATCH_CONCURRENCY, EMBEDDING_MODEL, TOP_K_RESULTS
+    from embeddings import ResumeRAG
+
+    rag = ResumeRAG(data_dir=str(synthetic_data_dir(args.docs)), vector_store="numpy",
+                    embedding_model=args.model or EMBEDDING_MODEL)
+    rag.embed_query("warm up")
+    backend.rag_system = rag
+    port = start_server()
+    questions = SCREENING_QUESTIONS[:args.questions]
+    page = 0
+
+    def page_questions():
+        nonlocal page
+        page += 1
+        return [f"{question} (candidate {page})" for question in questions]
+
+    llm = backend.llm
+    print(f"{len(questions)} questions per page, {args.pages} pages, {rag.store.count()} documents, "
+          f"top-{TOP_K_RESULTS}; fake LLM first token {llm.first_token_delay * 1000:.0f} ms, "
+          f"{llm.token_delay * 1000:.0f} ms/token")
+
+    print(f"\n{'retrieval':<12} {'ms/page':>9}")
+    for name, run in (
+        ("per-question", lambda qs: [rag.query(q, top_k=TOP_K_RESULTS, query_embedding=rag.embed_query(q))
+                                     for q in qs]),
+        ("batched", lambda qs: rag.query_many(qs, top_k=TOP_K_RESULTS, query_embeddings=rag.embed_queries(qs))),
+    ):
+        seconds = []
+        for _ in range(args.pages):
+            qs = page_questions()
+            start = time.perf_counter()
+            run(qs)
+            seconds.append(time.perf_counter() - start)
+        print(f"{name:<12} {statistics.median(seconds) * 1000:>9.1f}")
+
+    print(f"\n{'requests':<14} {'s/page':>8} {'questions/s':>12} {'speedup':>8}")
+    baseline = None
+    variants = [("sequential", sequential), ("concurrent", concurrent)]
+    for limit in args.batch_concurrency or [CHAT_BATCH_CONCURRENCY]:
+        def run_batch(port, qs, limit=limit):
+            backend.CHAT_BATCH_CONCURRENCY = limit
+            batch(port, qs)
+        variants.append((f"batch (c={limit})", run_batch))
+    for name, run in variants:
+        seconds = []
+        for _ in range(args.pages):
+            qs = page_questions()
+            start = time.perf_counter()
+            run(port, qs)
+            seconds.append(time.perf_counter() - start)
+        median = statistics.median(seconds)
+        baseline = baseline or median
+        print(f"{name:<14} {median:>8.2f} {len(questions) / median:>12.1f} {baseline / median:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
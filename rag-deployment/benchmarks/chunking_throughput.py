@@ -0,0 +1,95 @@
+"""
+Measure chunking throughput of the word-window and token-budget chunkers
+
+Generates a multi-megabyte resume-like corpus (pages of lines and
+sentences), chunks it with the legacy 500/50 word window and with the
+token-aware chunker, and reports MB/s, chunks/s and the distribution of
+chunk lengths in embedding-model tokens.
+
+Usage:
+    python rag-deployment/benchmarks/chunking_throughput.py [--mb 8] [--chunk-tokens 256]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT_DIR / "data"))
+
+from chunking import DEFAULT_EMBEDDING_MODEL, TokenCounter, iter_segments, iter_token_chunks
+from process_data import clean_text, iter_chunks, iter_words
+
+HEADINGS = ["EXPERIENCE", "PROJECTS", "SKILLS", "EDUCATION", "PUBLICATIONS"]
+TERMS = (
+    "Python Java C++ JavaScript SQL PyTorch TensorFlow scikit-learn AWS GCP Docker Kubernetes React "
+    "Node.js FastAPI Spark Kafka Airflow Postgres Redis NLP transformers LLM RAG embeddings"
+).split()
+WORDS = ("built developed designed deployed led improved optimized scalable systems models services "
+         "data team pipeline latency throughput users production customers features platform").split()
+
+
+def synthetic_pages(rng: random.Random, target_bytes: int):
+    """Pages of headings, bullet lines and multi-sentence paragraphs, like extracted PDF text"""
+    pages, size = [], 0
+    while size < target_bytes:
+        lines = []
+        for _ in range(rng.randint(3, 6)):
+            lines.append(rng.choice(HEADINGS))
+            for _ in range(rng.randint(2, 6)):
+                sentences = [
+                    " ".join(rng.choice(TERMS) if rng.random() < 0.25 else rng.choice(WORDS)
+                             for _ in range(rng.randint(6, 30))).capitalize() + "."
+                    for _ in range(rng.randint(1, 4))
+                ]
+                lines.append("• " + " ".join(sentences))
+        page = "\n".join(lines)
+        pages.append(page)
+        size += len(page.encode("utf-8"))
+    return pages, size
+
+
+def report(name: str, chunks, seconds: float, corpus_bytes: int, counter: TokenCounter):
+    tokens = np.array(counter.count_many(chunks))
+    print(f"{name:<14}{corpus_bytes / 1e6 / seconds:>8.2f}{len(chunks) / seconds:>11.0f}{len(chunks):>8}"
+          f"{tokens.min():>6}{np.percentile(tokens, 50):>6.0f}{tokens.max():>6}{tokens.std():>7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mb", type=float, default=8.0, help="corpus size in megabytes")
+    parser.add_argument("--chunk-tokens", type=int, default=256)
+    parser.add_argument("--overlap-tokens", type=int, default=32)
+    parser.add_argument("--tokenizer", default=DEFAULT_EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    pages, corpus_bytes = synthetic_pages(random.Random(0), int(args.mb * 1e6))
+    counter = TokenCounter(args.tokenizer)
+    print(f"Corpus: {corpus_bytes / 1e6:.1f} MB, {len(pages)} pages; token counter: {counter.name}\n")
+    print(f"{'chunker':<14}{'MB/s':>8}{'chunks/s':>11}{'chunks':>8}{'min':>6}{'p50':>6}{'max':>6}{'std':>7}")
+
+    start = time.perf_counter()
+    cleaned = [page for page in map(clean_text, pages) if page]
+    word_chunks = list(iter_chunks(iter_words(cleaned), 500, 50))
+    report("words 500/50", word_chunks, time.perf_counter() - start, corpus_bytes, counter)
+
+    start = time.perf_counter()
+    token_chunks = list(iter_token_chunks(iter_segments(pages, clean_text), counter,
+                                          args.chunk_tokens, args.overlap_tokens))
+    elapsed = time.perf_counter() - start
+    report(f"tokens {args.chunk_tokens}/{args.overlap_tokens}", [text for text, _ in token_chunks],
+           elapsed, corpus_bytes, counter)
+
+    # Stored counts must match re-tokenizing the chunk text
+    stored = np.array([tokens for _, tokens in token_chunks])
+    recounted = np.array(counter.count_many([text for text, _ in token_chunks]))
+    print(f"\nStored token counts matching re-tokenization: {np.mean(stored == recounted):.1%}")
+    print(f"Chunks over budget: {int(np.sum(recounted > args.chunk_tokens))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark query encoding throughput
+
+1. Raw model throughput (texts/second) at batch sizes 1-64.
+2. QueryEncoder under concurrent callers: one-at-a-time encoding vs
+   micro-batching, with the embedding cache disabled so every call
+   reaches the model.
+
+Usage:
+    python rag-deployment/benchmarks/encoder_throughput.py [--model all-MiniLM-L6-v2] [--seconds 3]
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from chromadb.utils import embedding_functions
+from encoder import QueryEncoder
+
+QUESTIONS = [
+    "What are your main technical skills?",
+    "What programming languages do you know?",
+    "Tell me about your experience with AWS",
+    "Have you used PyTorch in production?",
+    "What projects have you worked on?",
+    "What is your educational background?",
+    "Do you have experience with computer vision?",
+    "How do you approach problem-solving?",
+]
+
+
+def unique_texts(n: int, offset: int = 0):
+    """Distinct query texts so nothing is served from a cache"""
+    return [f"{QUESTIONS[(offset + i) % len(QUESTIONS)]} ({offset + i})" for i in range(n)]
+
+
+def raw_throughput(embed_fn, batch_size: int, seconds: float) -> float:
+    """Texts per second when calling the model with fixed-size batches"""
+    done = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        embed_fn(unique_texts(batch_size, done))
+        done += batch_size
+    return done / (time.perf_counter() - start)
+
+
+def concurrent_throughput(encoder: QueryEncoder, clients: int, seconds: float, batched: bool) -> float:
+    """Queries per second with `clients` threads each encoding one query at a time"""
+    deadline = time.perf_counter() + seconds
+    
+    def client(client_id: int) -> int:
+        done = 0
+        while time.perf_counter() < deadline:
+            text = unique_texts(1, client_id * 1_000_000 + done)[0]
+            if batched:
+                encoder.encode(text)
+            else:
+                encoder.encode_many([text])
+            done += 1
+        return done
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        total = sum(pool.map(client, range(clients)))
+    return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each measurement")
+    args = parser.parse_args()
+    
+    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=args.model)
+    embed_fn(["warm up"])
+    
+    print("Raw model throughput")
+    print(f"{'batch':>6}{'texts/s':>10}")
+    for batch_size in [1, 2, 4, 8, 16, 32, 64]:
+        print(f"{batch_size:>6}{raw_throughput(embed_fn, batch_size, args.seconds):>10.1f}")
+    
+    encoder = QueryEncoder(embed_fn, cache_size=0)
+    print("\nConcurrent QueryEncoder throughput (cache disabled)")
+    print(f"{'clients':>8}{'unbatched q/s':>15}{'batched q/s':>13}")
+    for clients in [1, 4, 16, 64]:
+        unbatched = concurrent_throughput(encoder, clients, args.seconds, batched=False)
+        batched = concurrent_throughput(encoder, clients, args.seconds, batched=True)
+        print(f"{clients:>8}{unbatched:>15.1f}{batched:>13.1f}")
+    print(f"\nencoder stats: {encoder.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the Gemini REST API, with fault injection (no network)
+
+Serves generateContent and streamGenerateContent (?alt=sse) like
+generativelanguage.googleapis.com, so GeminiLLM and everything above it
+run unchanged with GEMINI_API_BASE pointed here. Answers depend only on
+the prompt and come back with fixed, configurable latency. Faults are
+drawn per request:
+  - error_rate:  share of requests answered with error_status (with a
+                 Retry-After header if retry_after is set)
+  - slow_rate:   share of requests delayed by slow_delay seconds first
+                 (a slow tail; a long delay acts as a hang)
+Faults can be changed while running: POST /stub/faults with any of the
+fields above; GET /stub/stats returns the settings and counters.
+
+Usage:
+    python rag-deployment/benchmarks/gemini_stub.py [--port 8090] [--error-rate 0.1] [--slow-rate 0.05]
+                                                   [--slow-delay 5]
+    GEMINI_API_BASE=http://127.0.0.1:8090 uvicorn app:app   # from rag-deployment/backend
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+WORDS = ("I have built production systems with Python, PyTorch and AWS, "
+         "and enjoy turning machine learning research into reliable products.").split()
+
+
+class StubState:
+    """Latency and fault settings plus counters, shared by all requests"""
+
+    def __init__(self, first_token_delay: float = 0.2, token_delay: float = 0.02, answer_words: int = 24,
+                 error_rate: float = 0.0, error_status: int = 503, retry_after: Optional[float] = None,
+                 slow_rate: float = 0.0, slow_delay: float = 5.0, seed: int = 0):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.answer_words = answer_words
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """Zero the counters"""
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+
+    def update(self, **settings):
+        """Change settings (latency or faults) by name"""
+        for name, value in settings.items():
+            if not hasattr(self, name) or name in ("rng", "calls", "errors", "slow"):
+                raise ValueError(f"Unknown stub setting: {name}")
+            setattr(self, name, value)
+
+    def snapshot(self) -> Dict:
+        return {name: value for name, value in vars(self).items() if name != "rng"}
+
+    def words(self, prompt: str, generation_config: Optional[Dict]) -> List[str]:
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        n_words = min(self.answer_words, (generation_config or {}).get("maxOutputTokens") or self.answer_words)
+        words = [WORDS[(seed + i) % len(WORDS)] for i in range(n_words)]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+
+def response_chunk(text: str, finished: bool) -> Dict:
+    candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+def create_app(state: StubState):
+    """The stub's FastAPI app"""
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Gemini API stub")
+
+    @app.post("/v1beta/models/{target}")
+    async def generate(target: str, request: Request):
+        model, _, method = target.partition(":")
+        if method not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"Unknown method: {method}")
+        body = await request.json()
+        prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                         for part in content.get("parts", []))
+        words = state.words(prompt, body.get("generationConfig"))
+
+        state.calls += 1
+        if state.slow_rate and state.rng.random() < state.slow_rate:
+            state.slow += 1
+            await asyncio.sleep(state.slow_delay)
+        if state.error_rate and state.rng.random() < state.error_rate:
+            state.errors += 1
+            headers = {"Retry-After": str(int(state.retry_after))} if state.retry_after is not None else None
+            return JSONResponse(
+                {"error": {"code": state.error_status, "message": "Injected fault", "status": "UNAVAILABLE"}},
+                status_code=state.error_status, headers=headers
+            )
+
+        await asyncio.sleep(state.first_token_delay)
+        if method == "generateContent":
+            await asyncio.sleep(state.token_delay * (len(words) - 1))
+            return response_chunk("".join(words), finished=True)
+
+        async def events():
+            for i, word in enumerate(words):
+                if i:
+                    await asyncio.sleep(state.token_delay)
+                yield f"data: {json.dumps(response_chunk(word, finished=i == len(words) - 1))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/stub/faults")
+    async def set_faults(settings: Dict):
+        try:
+            state.update(**settings)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return state.snapshot()
+
+    @app.get("/stub/stats")
+    async def stats():
+        return state.snapshot()
+
+    return app
+
+
+class StubServer:
+    """A stub running in a background thread: `url` for GEMINI_API_BASE, `state` to change faults"""
+
+    def __init__(self, state: StubState, port: int = 0):
+        import uvicorn
+
+        if not port:
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                port = sock.getsockname()[1]
+        self.state = state
+        self.url = f"http://127.0.0.1:{port}"
+        config = uvicorn.Config(create_app(state), host="127.0.0.1", port=port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        threading.Thread(target=self._server.run, daemon=True).start()
+        while not self._server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+
+
+def serve(port: int = 0, **settings) -> StubServer:
+    """Start a stub server in the background (settings: see StubState)"""
+    return StubServer(StubState(**settings), port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--first-token-ms", type=float, default=200)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None, help="seconds, sent with injected errors")
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-delay", type=float, default=5.0, help="seconds added to slow requests")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    state = StubState(args.first_token_ms / 1000, args.token_ms / 1000, error_rate=args.error_rate,
+                      error_status=args.error_status, retry_after=args.retry_after,
+                      slow_rate=args.slow_rate, slow_delay=args.slow_delay)
+    print(f"Gemini stub on http://127.0.0.1:{args.port}: {state.snapshot()}")
+    uvicorn.run(create_app(state), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
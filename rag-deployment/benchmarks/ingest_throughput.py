@@ -0,0 +1,124 @@
+"""
+Measure bulk document ingestion throughput against one-at-a-time adds
+
+Ingests the same synthetic documents into a fresh index with:
+  - one-by-one:  ResumeRAG.add_document per document (one model call and
+                 one store write each)
+  - batch=N:     ResumeRAG.add_documents with N documents per embedding call
+  - http:        POST /ingest with a JSON Lines body (INGEST_BATCH_SIZE)
+and reports documents per second, time spent embedding and writing, and
+the speedup over one-by-one. Each variant then re-sends its documents to
+check that none is stored twice.
+
+Usage:
+    python rag-deployment/benchmarks/ingest_throughput.py [--docs 1000] [--batch-sizes 16 64 128 256]
+                                                          [--store numpy] [--model all-MiniLM-L6-v2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import TERMS, WORDS, synthetic_data_dir
+
+API_KEY = "benchmark"
+
+
+def documents(n: int, seed: int = 1) -> List[Dict]:
+    """Resume-like documents (different from the indexed synthetic corpus)"""
+    rng = random.Random(seed)
+    return [
+        {"text": " ".join(rng.choice(TERMS) if rng.random() < 0.25 else rng.choice(WORDS)
+                          for _ in range(rng.randint(40, 160))),
+         "metadata": {"source": "bulk.jsonl", "line": i}}
+        for i in range(n)
+    ]
+
+
+def new_rag(data_dir: Path, store: str, model: str):
+    from embeddings import ResumeRAG
+
+    rag = ResumeRAG(data_dir=str(data_dir), persist_dir=tempfile.mkdtemp(prefix="rag-bench-ingest-"),
+                    vector_store=store, embedding_model=model)
+    rag.embedding_fn(["warm up"])
+    return rag
+
+
+def one_by_one(rag, docs: List[Dict]) -> Dict:
+    start = time.perf_counter()
+    added = sum(rag.add_document(doc["text"], doc["metadata"])["added"] for doc in docs)
+    elapsed = time.perf_counter() - start
+    return {"added": added, "total_s": elapsed, "docs_per_s": len(docs) / elapsed,
+            "embed_s": None, "write_s": None}
+
+
+def over_http(rag, docs: List[Dict]) -> Dict:
+    import httpx
+    import app as app_module
+
+    app_module.rag_system = rag
+    body = "".join(json.dumps(doc) + "\n" for doc in docs).encode()
+
+    async def post():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            response = await client.post("/ingest", content=body, headers={
+                "X-API-Key": API_KEY, "Content-Type": "application/x-ndjson"
+            })
+            response.raise_for_status()
+            return response.json()
+
+    return asyncio.run(post())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1000, help="documents to ingest")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 128, 256])
+    parser.add_argument("--store", default="numpy", choices=["numpy", "chroma"])
+    parser.add_argument("--model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--skip-one-by-one", action="store_true", help="it is slow for large --docs")
+    args = parser.parse_args()
+
+    # Read by config when app is imported
+    os.environ.setdefault("INGEST_API_KEY", API_KEY)
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    from config import EMBEDDING_MODEL, INGEST_BATCH_SIZE
+
+    model = args.model or EMBEDDING_MODEL
+    data_dir = synthetic_data_dir(50)
+    docs = documents(args.docs)
+
+    variants = {} if args.skip_one_by_one else {"one-by-one": lambda rag: one_by_one(rag, docs)}
+    for size in args.batch_sizes:
+        variants[f"batch={size}"] = lambda rag, size=size: rag.add_documents(docs, batch_size=size)
+    variants[f"http ({INGEST_BATCH_SIZE})"] = lambda rag: over_http(rag, docs)
+
+    print(f"{len(docs)} documents, {args.store} store, {model}")
+    print(f"{'variant':<16} {'docs/s':>8} {'total (s)':>10} {'embed (s)':>10} {'write (s)':>10} "
+          f"{'speedup':>8} {'re-sent dups':>13}")
+    baseline = None
+    for name, run in variants.items():
+        rag = new_rag(data_dir, args.store, model)
+        result = run(rag)
+        assert result["added"] == len(docs), result
+        again = rag.add_documents(docs)
+        baseline = baseline or result["docs_per_s"]
+        embed = "-" if result["embed_s"] is None else f"{result['embed_s']:.2f}"
+        write = "-" if result["write_s"] is None else f"{result['write_s']:.2f}"
+        print(f"{name:<16} {result['docs_per_s']:>8.1f} {result['total_s']:>10.2f} {embed:>10} {write:>10} "
+              f"{result['docs_per_s'] / baseline:>7.1f}x {again['duplicates']:>8}/{len(docs)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
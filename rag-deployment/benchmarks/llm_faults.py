@@ -0,0 +1,126 @@
+"""
+Measure /chat success rate and latency under injected Gemini API faults, with and without the resilience layer
+
+Runs the app in-process (stub retriever) with GeminiLLM pointed at a local
+fault-injecting stub of the Gemini API (gemini_stub.py), and replays the
+same requests through each fault scenario with two client policies:
+  - plain:      one attempt, no deadline, no hedging, no circuit breaker
+  - resilient:  ResilientLLM with the timeouts, retries, hedging and
+                breaker settings given on the command line
+The report gives the share of requests answered by the LLM, answered from
+context (degraded), and failed, the p50/p95/p99 latency, and the upstream
+calls made.
+
+Usage:
+    python rag-deployment/benchmarks/llm_faults.py [--requests 200] [--concurrency 8]
+                                                  [--scenarios healthy errors slow outage]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+# Measure the LLM path, not the response cache or request coalescing
+os.environ.setdefault("LLM_BACKEND", "gemini")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import StubRAG, latency_stats
+
+import httpx
+import app as backend
+import gemini_stub
+from llm import GeminiLLM
+from resilience import CircuitBreaker, ResilientLLM
+
+SCENARIOS = {
+    "healthy": {},
+    "errors": {"error_rate": 0.2},                       # 20% of calls fail with 503
+    "slow": {"slow_rate": 0.05, "slow_delay": 3.0},      # 5% of calls take 3 s longer
+    "outage": {"error_rate": 1.0},                       # every call fails
+}
+
+
+async def replay(n_requests: int, concurrency: int):
+    latencies, outcomes = [], {"llm": 0, "context": 0, "failed": 0}
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        queue = asyncio.Queue()
+        for i in range(n_requests):
+            queue.put_nowait(f"What did you build in project {i}?")
+
+        async def worker():
+            while not queue.empty():
+                message = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/chat", json={"message": message})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    outcomes["failed"] += 1
+                elif response.json()["metadata"].get("llm_fallback"):
+                    outcomes["context"] += 1
+                else:
+                    outcomes["llm"] += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and policy")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--first-token-ms", type=float, default=200, help="stub latency")
+    parser.add_argument("--token-ms", type=float, default=5, help="stub latency per word")
+    parser.add_argument("--timeout", type=float, default=2.0, help="resilient: seconds per attempt")
+    parser.add_argument("--deadline", type=float, default=5.0, help="resilient: seconds per call")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--backoff", type=float, default=0.1, help="resilient: first retry backoff (s)")
+    parser.add_argument("--hedge-min-delay", type=float, default=0.1, help="resilient: 0 disables hedging")
+    parser.add_argument("--breaker-failures", type=int, default=5)
+    parser.add_argument("--breaker-reset", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    stub = gemini_stub.serve(first_token_delay=args.first_token_ms / 1000, token_delay=args.token_ms / 1000)
+    backend.llm = GeminiLLM(base_url=stub.url)
+    backend.rag_system = StubRAG()
+    policies = {
+        "plain": lambda: ResilientLLM(backend.llm, timeout=3600, deadline=3600, retries=0, hedge=False,
+                                      breaker=CircuitBreaker(failure_threshold=10 ** 9)),
+        "resilient": lambda: ResilientLLM(backend.llm, timeout=args.timeout, deadline=args.deadline,
+                                          retries=args.retries, backoff=args.backoff,
+                                          hedge=args.hedge_min_delay > 0, hedge_min_delay=args.hedge_min_delay,
+                                          breaker=CircuitBreaker(args.breaker_failures, args.breaker_reset)),
+    }
+    print(f"{args.requests} requests per run at concurrency {args.concurrency}; stub first token "
+          f"{args.first_token_ms:.0f} ms + {args.token_ms:.0f} ms/word; resilient: {args.timeout}s/attempt, "
+          f"{args.deadline}s/call, {args.retries} retries, hedge after max({args.hedge_min_delay}s, p95), "
+          f"breaker {args.breaker_failures} failures / {args.breaker_reset}s\n")
+    print(f"{'scenario':<9} {'policy':<10} {'LLM':>6} {'context':>8} {'failed':>7} {'p50 (ms)':>9} "
+          f"{'p95 (ms)':>9} {'p99 (ms)':>9} {'upstream':>9}  client counters")
+    for scenario in args.scenarios:
+        for policy, make_client in policies.items():
+            backend.llm_client = client = make_client()
+            stub.state.update(error_rate=0.0, slow_rate=0.0, slow_delay=3.0)
+            stub.state.update(**SCENARIOS[scenario])
+            stub.state.reset()
+            latencies, outcomes = asyncio.run(replay(args.requests, args.concurrency))
+            stats = latency_stats(latencies)
+            counters = {name: client.counts[name] for name in ("retries", "timeouts", "hedges", "hedge_wins", "rejected")}
+            share = {name: count / args.requests for name, count in outcomes.items()}
+            print(f"{scenario:<9} {policy:<10} {share['llm']:>6.1%} {share['context']:>8.1%} {share['failed']:>7.1%} "
+                  f"{stats['p50_ms']:>9.0f} {stats['p95_ms']:>9.0f} {stats['p99_ms']:>9.0f} "
+                  f"{stub.state.calls:>9}  {counters}", flush=True)
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
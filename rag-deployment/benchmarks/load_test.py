@@ -0,0 +1,125 @@
+"""
+Load test /chat against the fake LLM and a stub retriever (no network)
+
+Reports requests-per-second at several client concurrency levels for a
+single uvicorn worker. Every client asks the same question; run with
+COALESCE_REQUESTS=true to measure the effect of single-flight coalescing.
+
+Usage:
+    python rag-deployment/benchmarks/load_test.py [--duration 5] [--concurrency 1 16 64]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Never touch the network: use the local fake LLM
+os.environ.setdefault("LLM_BACKEND", "fake")
+# Every client asks the same question; measure the full pipeline, not cache hits
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+import uvicorn
+import app as backend
+
+
+class StubRAG:
+    """Stands in for ResumeRAG: fixed latency per query, canned chunks"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.index_version = 0
+
+    def embed_query(self, query_text: str):
+        return [1.0, 0.0, 0.0]
+
+    def query(self, query_text: str, top_k: int = 3, query_embedding=None, **kwargs):
+        time.sleep(self.latency)
+        return [
+            {"id": f"stub_{i}", "text": f"Stub resume chunk {i} for: {query_text}",
+             "metadata": {"type": "stub"}, "distance": 0.1 * i}
+            for i in range(top_k)
+        ]
+
+    def embed_queries(self, query_texts):
+        return [self.embed_query(text) for text in query_texts]
+
+    def query_many(self, query_texts, top_k: int = 3, query_embeddings=None, **kwargs):
+        return [self.query(text, top_k) for text in query_texts]
+
+
+def start_server() -> int:
+    """Run the API in a background thread and return its port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    
+    # lifespan="off" skips the real RAG startup; the stub is installed instead
+    config = uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning",
+                            lifespan="off", backlog=4096)
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return port
+
+
+def client_loop(port: int, deadline: float) -> int:
+    """Send requests back to back until the deadline; return completed count"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = json.dumps({"message": "What are your main technical skills?"})
+    done = 0
+    while time.perf_counter() < deadline:
+        conn.request("POST", "/chat", body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status == 200:
+            done += 1
+    conn.close()
+    return done
+
+
+def run_level(port: int, concurrency: int, duration: float) -> float:
+    """Requests per second with `concurrency` clients for `duration` seconds"""
+    start = time.perf_counter()
+    deadline = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        counts = list(pool.map(lambda _: client_loop(port, deadline), range(concurrency)))
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--retrieval-latency", type=float, default=0.01, help="stub retrieval seconds")
+    args = parser.parse_args()
+    
+    backend.rag_system = StubRAG(args.retrieval_latency)
+    port = start_server()
+    
+    llm = backend.llm
+    print(f"fake LLM: first token {llm.first_token_delay * 1000:.0f} ms, "
+          f"{llm.token_delay * 1000:.0f} ms/token; stub retrieval {args.retrieval_latency * 1000:.0f} ms")
+    print(f"{'clients':>8}{'req/s':>10}")
+    for concurrency in args.concurrency:
+        rps = run_level(port, concurrency, args.duration)
+        print(f"{concurrency:>8}{rps:>10.1f}")
+    if backend.single_flight:
+        print(f"coalescing: {backend.single_flight.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure local GPT-2 + LoRA generation: KV cache on/off and dynamic batching of concurrent requests
+
+Loads the local backend (local_llm.py: adapter merged into the base model,
+CPU) and reports:
+  - decode speed of one request with the key/value cache and with the
+    whole sequence recomputed every step
+  - --requests concurrent requests at each --max-batch: time to first
+    token and total latency (p50/p95), and generated tokens per second
+    across all of them (max batch 1 = no batching)
+Sampling is greedy and every answer is cut at --new-tokens, so each
+configuration does the same work.
+
+Usage:
+    python rag-deployment/benchmarks/local_generation.py [--requests 16] [--new-tokens 64] [--max-batch 1 4 8]
+                                                        [--base-model gpt2] [--adapter models/gpt2-jai-resume-lora]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import QUESTIONS, ROOT_DIR, latency_stats
+
+
+async def timed_answer(llm, prompt: str, config):
+    start = time.perf_counter()
+    first = None
+    async for _ in llm.astream(prompt, config):
+        first = first or time.perf_counter()
+    end = time.perf_counter()
+    return (first or end) - start, end - start
+
+
+async def concurrent(llm, prompts, config):
+    return await asyncio.gather(*(timed_answer(llm, prompt, config) for prompt in prompts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=16, help="concurrent requests")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--base-model", default=None, help="default: LOCAL_LLM_BASE_MODEL")
+    parser.add_argument("--adapter", default=None, help="default: LOCAL_LLM_ADAPTER; '' for the base model only")
+    args = parser.parse_args()
+
+    from config import LOCAL_LLM_ADAPTER, LOCAL_LLM_BASE_MODEL
+    from local_llm import LocalLLM
+
+    adapter = LOCAL_LLM_ADAPTER if args.adapter is None else args.adapter
+    if adapter and not Path(adapter).is_absolute():
+        adapter = str(ROOT_DIR / adapter)
+    llm = LocalLLM(args.base_model or LOCAL_LLM_BASE_MODEL, adapter, max_new_tokens=args.new_tokens)
+    start = time.perf_counter()
+    llm.load()
+    print(f"{llm.model_name}: loaded (adapter merged) in {time.perf_counter() - start:.1f}s; "
+          f"{args.new_tokens} new tokens per answer, greedy")
+
+    config = {"temperature": 0.0, "max_output_tokens": args.new_tokens}
+    prompts = [f"Question: {QUESTIONS[i % len(QUESTIONS)]}\n\nAnswer:" for i in range(args.requests)]
+    llm.generate(prompts[0], config)  # warm up
+
+    print(f"\n{'one request':<14} {'total (ms)':>11} {'tokens/s':>9}")
+    for kv_cache in (True, False):
+        llm.kv_cache = kv_cache
+        start = time.perf_counter()
+        llm.generate(prompts[0], config)
+        seconds = time.perf_counter() - start
+        print(f"{'KV cache' if kv_cache else 'no KV cache':<14} {seconds * 1000:>11.0f} {args.new_tokens / seconds:>9.1f}")
+    llm.kv_cache = True
+
+    print(f"\n{args.requests} concurrent requests")
+    print(f"{'max batch':>9} {'batches':>8} {'TTFT p50':>9} {'p95 (ms)':>9} {'total p50':>10} {'p95 (ms)':>9} "
+          f"{'tokens/s':>9}")
+    for max_batch in args.max_batch:
+        llm.max_batch_size = max_batch
+        batches = llm.stats()["batches"]
+        start = time.perf_counter()
+        timings = asyncio.run(concurrent(llm, prompts, config))
+        elapsed = time.perf_counter() - start
+        first = latency_stats([ttft for ttft, _ in timings])
+        total = latency_stats([seconds for _, seconds in timings])
+        print(f"{max_batch:>9} {llm.stats()['batches'] - batches:>8} {first['p50_ms']:>9.0f} {first['p95_ms']:>9.0f} "
+              f"{total['p50_ms']:>10.0f} {total['p95_ms']:>9.0f} "
+              f"{args.requests * args.new_tokens / elapsed:>9.1f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Measure the overhead of per-stage timing instrumentation
+
+Reports the cost of one stage timer, and /chat latency through the
+in-process ASGI app (fake LLM and stub retriever with zero delay, so the
+instrumentation is as large a share of the request as it can be) with
+metrics enabled and disabled.
+
+Usage:
+    python rag-deployment/benchmarks/metrics_overhead.py [--requests 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("FAKE_LLM_FIRST_TOKEN_DELAY", "0")
+os.environ.setdefault("FAKE_LLM_TOKEN_DELAY", "0")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx
+import app as backend
+from metrics import metrics
+
+
+class StubRAG:
+    """Stands in for ResumeRAG: instrumented like it, but no real work"""
+
+    index_version = 0
+
+    def embed_query(self, query_text: str):
+        with metrics.timer("embed"):
+            return [1.0, 0.0, 0.0]
+
+    def query(self, query_text: str, top_k: int = 3, query_embedding=None, **kwargs):
+        with metrics.timer("dense_search"):
+            return [
+                {"id": f"stub_{i}", "text": f"Stub resume chunk {i}", "metadata": {"type": "stub"}, "distance": 0.1}
+                for i in range(top_k)
+            ]
+
+
+def timer_cost_ns(n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        with metrics.timer("bench"):
+            pass
+    return (time.perf_counter() - start) / n * 1e9
+
+
+async def chat_latencies(client: httpx.AsyncClient, n: int):
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"message": f"What are your skills? {i}"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(n_requests: int):
+    backend.rag_system = StubRAG()
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await chat_latencies(client, 200)  # warm up
+        results = {}
+        # Interleave rounds so drift affects both settings equally
+        for _ in range(5):
+            for enabled in (False, True):
+                metrics.enabled = enabled
+                results.setdefault(enabled, []).extend(await chat_latencies(client, n_requests // 5))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="requests per setting")
+    args = parser.parse_args()
+
+    metrics.enabled = True
+    print(f"stage timer: {timer_cost_ns(200_000):.0f} ns enabled, ", end="")
+    metrics.enabled = False
+    print(f"{timer_cost_ns(200_000):.0f} ns disabled")
+
+    results = asyncio.run(run(args.requests))
+    off = statistics.median(results[False]) * 1e6
+    on = statistics.median(results[True]) * 1e6
+    print(f"/chat p50: {off:.0f} us without metrics, {on:.0f} us with ({on - off:+.0f} us, {(on - off) / off:+.1%})")
+
+
+if __name__ == "__main__":
+    main()
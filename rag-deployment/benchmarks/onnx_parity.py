@@ -0,0 +1,191 @@
+"""
+Check that the ONNX encoder ranks the indexed corpus like the PyTorch encoder, and compare their cost
+
+Indexes the corpus once per encoder (PyTorch fp32, ONNX fp32, ONNX int8)
+and runs the same dense queries against each, reporting agreement with
+the PyTorch rankings (top-1 match, top-k overlap, identical order). Also
+reports per-query encode latency, time to import and load each backend in
+a fresh interpreter (with its peak RSS) and the installed size of each
+backend's packages.
+
+Exits non-zero if ONNX fp32 overlap@k is below --min-overlap or ONNX int8
+overlap@k is below --min-int8-overlap.
+
+Usage:
+    python rag-deployment/benchmarks/onnx_parity.py [--onnx-dir models/onnx] [--data-dir data]
+                                                     [--docs 500] [--queries 200] [--top-k 5]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import BACKEND_DIR, QUESTIONS, ROOT_DIR, synthetic_data_dir
+
+VARIANTS = {
+    "torch": {"embedding_backend": "torch", "quantize": False},
+    "onnx": {"embedding_backend": "onnx", "quantize": False},
+    "onnx-int8": {"embedding_backend": "onnx", "quantize": True},
+}
+
+# Distributions each backend needs at serve time (beyond the app itself)
+PACKAGES = {
+    "torch": ("torch", "triton", "nvidia-", "transformers", "sentence-transformers", "safetensors",
+              "tokenizers", "huggingface-hub"),
+    "onnx": ("onnxruntime", "tokenizers"),
+}
+
+# Peak RSS comes from VmHWM: ru_maxrss would include the parent's, as it survives fork + exec
+LOAD_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {root!r}); sys.path.insert(0, {backend!r})
+start = time.perf_counter()
+from encoder import create_embedder
+create_embedder({model!r}, {backend_name!r}, {quantize!r})(["What are your skills?"])
+load_s = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+print(json.dumps({{"load_s": load_s, "peak_rss_mb": peak_kb / 1024}}))
+"""
+
+
+def installed_mb(prefixes) -> float:
+    """Installed size of the distributions whose names start with any of `prefixes`"""
+    total = 0
+    for dist in metadata.distributions():
+        name = (dist.metadata["Name"] or "").lower()
+        if name.startswith(tuple(prefixes)):
+            total += sum(f.size or 0 for f in dist.files or [])
+    return total / 1e6
+
+
+def query_snippets(documents: List[str], n: int, seed: int = 0) -> List[str]:
+    """Short word windows taken from indexed documents, as stand-in questions"""
+    rng = random.Random(seed)
+    snippets = []
+    for _ in range(n):
+        words = rng.choice(documents).split()
+        length = rng.randint(4, 12)
+        start = rng.randint(0, max(0, len(words) - length))
+        snippets.append(" ".join(words[start:start + length]))
+    return snippets
+
+
+def rankings(rag, queries: List[str], top_k: int) -> List[List[str]]:
+    return [[match["id"] for match in rag.query(q, top_k=top_k, mode="dense")] for q in queries]
+
+
+def agreement(reference: List[List[str]], other: List[List[str]]) -> Dict[str, float]:
+    top_k = max(len(ids) for ids in reference)
+    return {
+        "top1": statistics.mean(a[:1] == b[:1] for a, b in zip(reference, other)),
+        "overlap_at_k": statistics.mean(len(set(a) & set(b)) / top_k for a, b in zip(reference, other)),
+        "same_order": statistics.mean(a == b for a, b in zip(reference, other)),
+    }
+
+
+def encode_latency_ms(embedding_fn, queries: List[str]) -> Dict[str, float]:
+    embedding_fn(["warm up"])
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        embedding_fn([q])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {"p50": statistics.median(latencies), "p95": latencies[int(0.95 * (len(latencies) - 1))]}
+
+
+def cold_load(model: str, backend_name: str, quantize: bool) -> Dict[str, float]:
+    script = LOAD_SCRIPT.format(root=str(ROOT_DIR), backend=str(BACKEND_DIR), model=model,
+                                backend_name=backend_name, quantize=quantize)
+    proc = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, capture_output=True,
+                          text=True, timeout=600)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--onnx-dir", default=os.getenv("ONNX_MODEL_DIR", "models/onnx"),
+                        help="exported model, relative to the repo root; exported there first if missing")
+    parser.add_argument("--data-dir", default=str(ROOT_DIR / "data"),
+                        help="corpus (processed_data.json); synthetic if it has none")
+    parser.add_argument("--docs", type=int, default=500, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-overlap", type=float, default=0.99, help="required ONNX fp32 overlap@k")
+    parser.add_argument("--min-int8-overlap", type=float, default=0.9, help="required ONNX int8 overlap@k")
+    args = parser.parse_args()
+
+    # Absolute, so config resolves it from any working directory (here and in subprocesses)
+    onnx_dir = ROOT_DIR / args.onnx_dir
+    os.environ["ONNX_MODEL_DIR"] = str(onnx_dir)
+    from config import EMBEDDING_MODEL
+    from embeddings import ResumeRAG
+    from onnx_encoder import CONFIG_FILE, export_onnx
+
+    args.model = args.model or EMBEDDING_MODEL
+    if not (onnx_dir / CONFIG_FILE).exists():
+        print(f"▶ exporting {args.model} to {onnx_dir}...", flush=True)
+        start = time.perf_counter()
+        export_onnx(args.model, str(onnx_dir))
+        print(f"  exported in {time.perf_counter() - start:.1f}s")
+
+    data_dir = Path(args.data_dir)
+    if not (data_dir / "processed_data.json").exists():
+        data_dir = synthetic_data_dir(args.docs)
+        print(f"▶ no processed_data.json, using {args.docs} synthetic documents")
+
+    results, ranked = {}, {}
+    queries = None
+    for name, variant in VARIANTS.items():
+        print(f"▶ {name}: indexing...", flush=True)
+        start = time.perf_counter()
+        rag = ResumeRAG(data_dir=str(data_dir), vector_store="numpy", embedding_model=args.model, **variant)
+        index_s = time.perf_counter() - start
+        if queries is None:
+            documents = rag.store.get_documents()[1]
+            queries = QUESTIONS + query_snippets(documents, max(0, args.queries - len(QUESTIONS)))
+        ranked[name] = rankings(rag, queries, args.top_k)
+        results[name] = {
+            "index_s": index_s,
+            "encode_ms": encode_latency_ms(rag.embedding_fn, queries),
+            "cold": cold_load(args.model, variant["embedding_backend"], variant["quantize"]),
+        }
+
+    print(f"\n{len(queries)} queries, top-{args.top_k}, {len(documents)} documents")
+    print(f"{'encoder':<10} {'top-1':>6} {'overlap@k':>10} {'same order':>11} {'encode p50':>11} "
+          f"{'p95 (ms)':>9} {'import+load':>12} {'peak RSS':>9} {'index':>7}")
+    failed = False
+    for name in VARIANTS:
+        match = agreement(ranked["torch"], ranked[name])
+        result = results[name]
+        print(f"{name:<10} {match['top1']:>6.1%} {match['overlap_at_k']:>10.1%} {match['same_order']:>11.1%} "
+              f"{result['encode_ms']['p50']:>11.2f} {result['encode_ms']['p95']:>9.2f} "
+              f"{result['cold']['load_s']:>11.2f}s {result['cold']['peak_rss_mb']:>7.0f}MB "
+              f"{result['index_s']:>6.1f}s")
+        required = {"onnx": args.min_overlap, "onnx-int8": args.min_int8_overlap}.get(name)
+        if required is not None and match["overlap_at_k"] < required:
+            print(f"  ❌ {name} overlap@k {match['overlap_at_k']:.1%} is below {required:.1%}")
+            failed = True
+
+    print(f"\ninstalled packages: torch backend {installed_mb(PACKAGES['torch']):.0f} MB, "
+          f"onnx backend {installed_mb(PACKAGES['onnx']):.0f} MB")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Evaluate retrieval quality and latency across chunking, top-k and retrieval-mode settings
+
+Each labelled question lists evidence terms that a useful context should
+contain. For every chunking setting (chunk tokens x overlap tokens) the
+resume is re-chunked exactly as data/process_data.py does and indexed;
+settings are built and scored in parallel, sharing one loaded embedding
+model. Every question is then retrieved once per mode at the largest k,
+and for each k the table reports:
+  - recall@k:   share of the question's evidence terms found in the top-k chunks
+  - hit@k:      share of questions with at least one evidence term in the top k
+  - MRR:        mean reciprocal rank of the first chunk holding an evidence term
+  - ctx tokens: mean tokens of the top-k chunks (what the prompt has to carry)
+  - search p50/p95: retrieval latency, measured one setting at a time
+Finally, it names the setting with the fewest context tokens whose recall is
+within --tolerance of the best.
+
+With --rerank every mode is also run through the cross-encoder rerank stage
+(reranker.py: --rerank-candidates retrieved, reordered down to k). Quality
+is scored without a latency budget; the latency passes use
+--rerank-budget-ms and report how often it fell back to the retriever's
+order. A second table gives the recall gain and added p50 latency of
+reranking for each setting.
+
+The corpus is the resume PDFs in data/. If there are none, it uses
+synthetic resume pages with the create_qa_pairs() answers planted in
+them. The labels come from --labels (JSON: [{"question", "evidence":
+[...]}]). If that file is missing, they are seeded from create_qa_pairs():
+the proper nouns and technical terms of each answer, or its long words.
+--write-labels saves that seed so it can be edited by hand.
+
+Usage:
+    python rag-deployment/benchmarks/retrieval_eval.py [--chunk-tokens 128 256 384] [--overlap-tokens 0 32]
+                                                       [--top-k 1 3 5 8] [--modes dense hybrid]
+                                                       [--labels data/retrieval_eval.json] [--output eval.json]
+                                                       [--rerank] [--rerank-candidates 20] [--rerank-budget-ms 250]
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import ROOT_DIR, latency_stats
+
+sys.path.insert(0, str(ROOT_DIR / "data"))
+
+from chunking import DEFAULT_EMBEDDING_MODEL, TokenCounter, iter_segments, iter_token_chunks
+from chunking_throughput import synthetic_pages
+from process_data import clean_text, create_qa_pairs, iter_pdf_pages
+
+COMMON_WORDS = {"I", "I'm", "I've", "Yes", "No"}
+
+
+def normalize(text: str) -> str:
+    """The form chunks are indexed in (clean_text), lowercased"""
+    return clean_text(text).lower()
+
+
+def seed_labels(qa_pairs: List[Dict]) -> List[Dict]:
+    """Evidence terms per question: capitalized/technical words of the answer, else its long words"""
+    labels = []
+    for qa in qa_pairs:
+        words = [word.strip(".,;:()") for word in qa["answer"].split()[1:]]
+        evidence = [word for word in words if word not in COMMON_WORDS and any(c.isupper() for c in word)]
+        if not evidence:
+            evidence = [word for word in words if len(word) >= 9]
+        # Terms that clean_text reduces to a single character (C++ -> C) match almost anything
+        evidence = [term for term in dict.fromkeys(evidence) if len(normalize(term)) > 1]
+        labels.append({"question": qa["question"], "evidence": evidence})
+    return labels
+
+
+def load_labels(path: Path) -> List[Dict]:
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return seed_labels(create_qa_pairs())
+
+
+def load_pages(data_dir: Path, seed: int = 0) -> Tuple[Dict[str, List[str]], str]:
+    """Raw page text per source: the resume PDFs, or synthetic pages with the Q&A answers planted"""
+    pdf_files = sorted(data_dir.glob("*.pdf"))
+    if pdf_files:
+        return {pdf.name: list(iter_pdf_pages(str(pdf))) for pdf in pdf_files}, f"{len(pdf_files)} PDFs"
+
+    rng = random.Random(seed)
+    pages, _ = synthetic_pages(rng, 60_000)
+    for qa in create_qa_pairs():
+        page = rng.randrange(len(pages))
+        lines = pages[page].split("\n")
+        lines.insert(rng.randint(1, len(lines)), "• " + qa["answer"])
+        pages[page] = "\n".join(lines)
+    return {"synthetic.pdf": pages}, f"synthetic, {len(pages)} pages"
+
+
+def chunk_pages(pages: Dict[str, List[str]], counter: TokenCounter,
+                chunk_tokens: int, overlap_tokens: int) -> List[Dict]:
+    """resume_chunks as process_data.py would write them for these settings"""
+    return [
+        {"text": text, "tokens": tokens, "source": source}
+        for source, source_pages in pages.items()
+        for text, tokens in iter_token_chunks(iter_segments(source_pages, clean_text), counter,
+                                              chunk_tokens, overlap_tokens)
+    ]
+
+
+def build_index(chunks: List[Dict], embedding_fn, store: str = "numpy", reranker=None):
+    """A ResumeRAG over just these chunks"""
+    from embeddings import ResumeRAG
+
+    data_dir = Path(tempfile.mkdtemp(prefix="rag-eval-"))
+    with open(data_dir / "processed_data.json", 'w', encoding='utf-8') as f:
+        json.dump({"resume_chunks": chunks, "qa_pairs": []}, f)
+    return ResumeRAG(data_dir=str(data_dir), vector_store=store, embedding_fn=embedding_fn, reranker=reranker)
+
+
+def matched(evidence: List[str], text: str) -> set:
+    """Evidence terms (normalized) occurring as whole words in `text`"""
+    text = normalize(text)
+    return {term for term in evidence if re.search(rf"(?<!\w){re.escape(term)}(?!\w)", text)}
+
+
+def score(rankings: List[List[Dict]], labels: List[Dict], ks: List[int]) -> Dict[int, Dict[str, float]]:
+    """recall@k, hit@k, MRR@k and context tokens@k over all questions"""
+    results = {}
+    for k in ks:
+        recall, hits, reciprocal_ranks, tokens = [], [], [], []
+        for ranking, label in zip(rankings, labels):
+            evidence = [normalize(term) for term in label["evidence"]]
+            found = [matched(evidence, chunk["text"]) for chunk in ranking[:k]]
+            covered = set().union(*found) if found else set()
+            recall.append(len(covered) / len(evidence) if evidence else 1.0)
+            hits.append(bool(covered))
+            first = next((rank for rank, terms in enumerate(found, 1) if terms), None)
+            reciprocal_ranks.append(1 / first if first else 0.0)
+            tokens.append(sum((chunk.get("metadata") or {}).get("tokens", 0) for chunk in ranking[:k]))
+        results[k] = {
+            "recall": statistics.mean(recall),
+            "hit": statistics.mean(hits),
+            "mrr": statistics.mean(reciprocal_ranks),
+            "context_tokens": statistics.mean(tokens),
+        }
+    return results
+
+
+def retrieve(rag, labels: List[Dict], top_k: int, mode: str, rerank: bool = False) -> List[List[Dict]]:
+    return [rag.query(label["question"], top_k=top_k, mode=mode, where={"type": "resume_chunk"}, rerank=rerank)
+            for label in labels]
+
+
+def search_latency(rag, labels: List[Dict], top_k: int, mode: str, repeats: int,
+                   rerank: bool = False) -> Dict[str, float]:
+    """Per-query retrieval time with query embeddings precomputed (encoding is the same for every setting)"""
+    embeddings = [rag.embed_query(label["question"]) for label in labels]
+    seconds = []
+    for _ in range(repeats):
+        for label, embedding in zip(labels, embeddings):
+            start = time.perf_counter()
+            rag.query(label["question"], top_k=top_k, query_embedding=embedding, mode=mode,
+                      where={"type": "resume_chunk"}, rerank=rerank)
+            seconds.append(time.perf_counter() - start)
+    return latency_stats(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-tokens", type=int, nargs="+", default=[128, 256, 384])
+    parser.add_argument("--overlap-tokens", type=int, nargs="+", default=[0, 32])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 3, 5, 8])
+    parser.add_argument("--modes", nargs="+", default=None, choices=["dense", "sparse", "hybrid"],
+                        help="default: RETRIEVAL_MODE")
+    parser.add_argument("--labels", default=str(ROOT_DIR / "data" / "retrieval_eval.json"))
+    parser.add_argument("--write-labels", action="store_true", help="save the seeded labels to --labels and exit")
+    parser.add_argument("--data-dir", default=str(ROOT_DIR / "data"), help="directory with the resume PDFs")
+    parser.add_argument("--model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--tokenizer", default=DEFAULT_EMBEDDING_MODEL, help="tokenizer that sizes the chunks")
+    parser.add_argument("--workers", type=int, default=2, help="chunking settings built and scored in parallel")
+    parser.add_argument("--repeats", type=int, default=20, help="latency passes over the questions")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="recall drop accepted for a smaller setting")
+    parser.add_argument("--output", default=None, help="also write the results as JSON")
+    parser.add_argument("--rerank", action="store_true", help="also evaluate the cross-encoder rerank stage")
+    parser.add_argument("--rerank-model", default=None, help="default: RERANK_MODEL")
+    parser.add_argument("--rerank-candidates", type=int, default=None, help="default: RERANK_CANDIDATES")
+    parser.add_argument("--rerank-budget-ms", type=float, default=None,
+                        help="budget for the latency passes (default: RERANK_BUDGET_MS; 0: none)")
+    args = parser.parse_args()
+
+    labels_path = Path(args.labels)
+    if args.write_labels:
+        labels_path.write_text(json.dumps(seed_labels(create_qa_pairs()), indent=2) + "\n", encoding="utf-8")
+        print(f"✅ Wrote seeded labels to {labels_path}")
+        return
+
+    from config import EMBEDDING_MODEL, RERANK_BUDGET_MS, RERANK_CANDIDATES, RERANK_MODEL, RETRIEVAL_MODE
+    from encoder import create_embedder
+    from reranker import CrossEncoderReranker
+
+    labels = load_labels(labels_path)
+    modes = args.modes or [RETRIEVAL_MODE]
+    ks = sorted(set(args.top_k))
+    pages, corpus = load_pages(Path(args.data_dir))
+    counter = TokenCounter(args.tokenizer)
+    embedding_fn = create_embedder(args.model or EMBEDDING_MODEL)
+    embedding_fn(["warm up"])
+    settings = [(c, o) for c, o in product(sorted(args.chunk_tokens), sorted(args.overlap_tokens)) if o < c]
+    print(f"{len(labels)} questions, corpus: {corpus}, {len(settings)} chunking settings x {len(modes)} modes")
+
+    reranker = None
+    variants = [(mode, False) for mode in modes]
+    if args.rerank:
+        # No budget while scoring quality; the latency passes apply it
+        reranker = CrossEncoderReranker(args.rerank_model or RERANK_MODEL,
+                                        candidates=args.rerank_candidates or RERANK_CANDIDATES, budget_ms=0)
+        reranker.load()
+        reranker.rerank_many(["warm up"], [[{"text": "warm up"}]], 1)
+        variants += [(mode, True) for mode in modes]
+        print(f"rerank: {reranker.model_name}, {reranker.candidates} candidates, batches of {reranker.batch_size}")
+
+    def evaluate(setting):
+        start = time.perf_counter()
+        rag = build_index(chunk_pages(pages, counter, *setting), embedding_fn, reranker=reranker)
+        index_s = time.perf_counter() - start
+        quality = {(mode, rerank): score(retrieve(rag, labels, max(ks), mode, rerank), labels, ks)
+                   for mode, rerank in variants}
+        return rag, index_s, quality
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        evaluated = dict(zip(settings, pool.map(evaluate, settings)))
+
+    if reranker:
+        reranker.budget_ms = RERANK_BUDGET_MS if args.rerank_budget_ms is None else args.rerank_budget_ms
+
+    rows = []
+    for (chunk_tokens, overlap), (rag, index_s, quality) in evaluated.items():
+        for (mode, rerank), k in product(variants, ks):
+            before = dict(reranker.counts) if reranker else None
+            search = search_latency(rag, labels, k, mode, args.repeats, rerank)
+            row = dict(
+                chunk_tokens=chunk_tokens, overlap_tokens=overlap, mode=mode, rerank=rerank, top_k=k,
+                chunks=rag.store.count(), index_s=round(index_s, 2), **quality[(mode, rerank)][k], search=search
+            )
+            if rerank:
+                queries = reranker.counts["queries"] - before["queries"]
+                row["fallback_rate"] = (reranker.counts["fallbacks"] - before["fallbacks"]) / queries
+            rows.append(row)
+
+    print(f"\n{'chunk':>6} {'overlap':>7} {'chunks':>6} {'mode':<7} {'rerank':<6} {'k':>3} {'recall@k':>9} "
+          f"{'hit@k':>6} {'MRR':>6} {'ctx tokens':>10} {'search p50':>11} {'p95 (ms)':>9}")
+    for row in rows:
+        print(f"{row['chunk_tokens']:>6} {row['overlap_tokens']:>7} {row['chunks']:>6} {row['mode']:<7} "
+              f"{'yes' if row['rerank'] else 'no':<6} {row['top_k']:>3} {row['recall']:>9.1%} {row['hit']:>6.1%} "
+              f"{row['mrr']:>6.3f} {row['context_tokens']:>10.0f} {row['search']['p50_ms']:>11.2f} "
+              f"{row['search']['p95_ms']:>9.2f}")
+
+    if reranker:
+        baseline = {(r["chunk_tokens"], r["overlap_tokens"], r["mode"], r["top_k"]): r for r in rows if not r["rerank"]}
+        print(f"\nRerank vs retriever order ({reranker.candidates} candidates, budget {reranker.budget_ms:.0f} ms):")
+        print(f"{'chunk':>6} {'overlap':>7} {'mode':<7} {'k':>3} {'recall gain':>12} {'MRR gain':>9} "
+              f"{'added p50 (ms)':>15} {'fallbacks':>10}")
+        for row in rows:
+            if not row["rerank"]:
+                continue
+            base = baseline[(row["chunk_tokens"], row["overlap_tokens"], row["mode"], row["top_k"])]
+            print(f"{row['chunk_tokens']:>6} {row['overlap_tokens']:>7} {row['mode']:<7} {row['top_k']:>3} "
+                  f"{(row['recall'] - base['recall']) * 100:>+11.1f}pp {row['mrr'] - base['mrr']:>+9.3f} "
+                  f"{row['search']['p50_ms'] - base['search']['p50_ms']:>15.1f} {row['fallback_rate']:>10.1%}")
+
+    best = max(row["recall"] for row in rows)
+    pick = min((row for row in rows if row["recall"] >= best - args.tolerance),
+               key=lambda row: (row["context_tokens"], row["search"]["p50_ms"]))
+    print(f"\nBest recall {best:.1%}. Fewest context tokens within {args.tolerance:.0%}: "
+          f"chunk {pick['chunk_tokens']}, overlap {pick['overlap_tokens']}, {pick['mode']}"
+          f"{' + rerank' if pick['rerank'] else ''}, "
+          f"k={pick['top_k']} (recall {pick['recall']:.1%}, {pick['context_tokens']:.0f} tokens)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"corpus": corpus, "questions": len(labels), "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
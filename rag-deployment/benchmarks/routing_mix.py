@@ -0,0 +1,146 @@
+"""
+Measure LLM calls and latency saved by routing small talk and curated Q&A questions
+
+Replays a chat-traffic mix through /chat (in-process, fake LLM, response
+cache off) with routing on and off. The mix has greetings and thanks,
+curated questions from create_qa_pairs() (retyped with different case and
+punctuation, plus paraphrases), and other questions. The report gives the
+LLM calls, the retrieval (vector search) calls, the mean and p95 latency,
+and the per-route counters and latency.
+
+Usage:
+    python rag-deployment/benchmarks/routing_mix.py [--messages 300] [--docs 500] [--threshold 0.92]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Never touch the network; measure routing, not the response cache
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import QUESTIONS, ROOT_DIR, latency_stats, synthetic_data_dir
+
+sys.path.insert(0, str(ROOT_DIR / "data"))
+
+import httpx
+import app as backend
+from process_data import create_qa_pairs
+
+SMALL_TALK = ["hi", "Hello!", "hey there", "Thanks!", "thank you so much", "ok, thanks", "bye", "Good morning"]
+PARAPHRASES = [
+    "who are you", "Tell me who you are", "Which programming languages do you know",
+    "What cloud platforms have you used?", "which ML frameworks do you know?",
+]
+
+# Share of each kind of message in the mix
+MIX = {"smalltalk": 0.2, "curated": 0.25, "paraphrase": 0.1, "other": 0.45}
+
+
+def message_mix(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    curated = [qa["question"] for qa in create_qa_pairs()]
+    pools = {
+        "smalltalk": SMALL_TALK,
+        "curated": [variant for q in curated for variant in (q, q.lower(), q.rstrip("?!.") + " ?")],
+        "paraphrase": PARAPHRASES,
+        "other": QUESTIONS,
+    }
+    kinds = rng.choices(list(MIX), weights=list(MIX.values()), k=n)
+    return [(kind, rng.choice(pools[kind])) for kind in kinds]
+
+
+class Counting:
+    """Wraps a callable and counts calls"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.fn(*args, **kwargs)
+
+
+async def replay(messages, routing: bool):
+    backend.router.enabled = routing
+    backend.router.counts = dict.fromkeys(backend.router.counts, 0)
+    generate = backend.llm.agenerate
+    backend.llm.agenerate = llm_calls = Counting(generate)
+    query_many = backend.rag_system.query_many
+    backend.rag_system.query_many = searches = Counting(query_many)
+
+    latencies, by_route = [], defaultdict(list)
+    transport = httpx.ASGITransport(app=backend.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for _, message in messages:
+                start = time.perf_counter()
+                response = await client.post("/chat", json={"message": message})
+                response.raise_for_status()
+                seconds = time.perf_counter() - start
+                latencies.append(seconds)
+                by_route[response.json()["metadata"]["route"]].append(seconds)
+    finally:
+        backend.llm.agenerate = generate
+        backend.rag_system.query_many = query_many
+    return {
+        "llm_calls": llm_calls.calls,
+        "searches": searches.calls,
+        "latency": latency_stats(latencies),
+        "routes": {route: latency_stats(seconds) for route, seconds in sorted(by_route.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--docs", type=int, default=500, help="synthetic corpus size")
+    parser.add_argument("--model", default=None, help="default: EMBEDDING_MODEL")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="Q&A similarity threshold (default: ROUTER_QA_THRESHOLD; above 1: exact matches only)")
+    args = parser.parse_args()
+
+    from config import EMBEDDING_MODEL, ROUTER_QA_THRESHOLD
+    from embeddings import ResumeRAG
+
+    data_dir = synthetic_data_dir(args.docs)
+    with open(data_dir / "processed_data.json", 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    data["qa_pairs"] = create_qa_pairs()
+    with open(data_dir / "processed_data.json", 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+    rag = ResumeRAG(data_dir=str(data_dir), vector_store="numpy", embedding_model=args.model or EMBEDDING_MODEL)
+    rag.embed_query("warm up")
+    backend.rag_system = rag
+    backend.router.load(rag.qa_pairs, rag.embedding_fn)
+    backend.router.threshold = args.threshold or ROUTER_QA_THRESHOLD
+
+    messages = message_mix(args.messages)
+    kinds = {kind: sum(k == kind for k, _ in messages) for kind in MIX}
+    llm = backend.llm
+    print(f"{len(messages)} messages {kinds}; {rag.store.count()} documents; Q&A threshold {backend.router.threshold}; "
+          f"fake LLM first token {llm.first_token_delay * 1000:.0f} ms, {llm.token_delay * 1000:.0f} ms/token\n")
+    print(f"{'routing':<8} {'LLM calls':>10} {'searches':>9} {'mean (ms)':>10} {'p95 (ms)':>9}   per route: count, p50 ms")
+    for routing in (False, True):
+        result = asyncio.run(replay(messages, routing))
+        routes = ", ".join(f"{route} {stats['n']} @ {stats['p50_ms']:.1f}" for route, stats in result["routes"].items())
+        print(f"{'on' if routing else 'off':<8} {result['llm_calls']:>10} {result['searches']:>9} "
+              f"{result['latency']['mean_ms']:>10.1f} {result['latency']['p95_ms']:>9.1f}   {routes}", flush=True)
+    print(f"\nrouter counters: {backend.router.stats()['routes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure BM25 keyword search latency (the sparse side of hybrid retrieval)
+
+Builds the index over synthetic resume-like documents at several corpus
+sizes and reports build time and p50/p99 search latency.
+
+Usage:
+    python rag-deployment/benchmarks/sparse_latency.py [--sizes 100 10000 100000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from sparse_index import BM25Index
+
+TERMS = (
+    "python java c++ javascript typescript sql pytorch tensorflow keras scikit-learn aws gcp azure docker "
+    "kubernetes react node.js fastapi flask django spark kafka airflow postgres redis mongodb linux git "
+    "nlp computer vision transformers llm rag embeddings pipelines microservices api testing ci/cd"
+).split()
+FILLER = "built developed designed deployed led improved optimized scalable systems models services data team".split()
+
+QUERIES = [
+    "Do you know PyTorch?",
+    "Experience with AWS and Docker",
+    "What C++ projects have you done?",
+    "kubernetes microservices",
+    "React and Node.js web apps",
+    "NLP transformers llm",
+]
+
+
+def synthetic_documents(rng: random.Random, n: int):
+    return [
+        " ".join(rng.choice(TERMS) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(rng.randint(40, 120)))
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+    
+    rng = random.Random(0)
+    print(f"{'docs':>8}{'build ms':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for size in args.sizes:
+        documents = synthetic_documents(rng, size)
+        index = BM25Index()
+        start = time.perf_counter()
+        index.build([f"doc_{i}" for i in range(size)], documents, [{"type": "resume_chunk"}] * size)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        samples = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            index.search(QUERIES[i % len(QUERIES)], args.top_k)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{size:>8}{build_ms:>10.1f}{np.percentile(samples, 50):>9.3f}{np.percentile(samples, 99):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measure server startup: time to first accepted connection, healthy and ready
+
+Starts `uvicorn app:app` in a fresh process for each STARTUP_MODE and polls
+it, recording seconds from process launch until:
+  - connect:    a TCP connection is accepted
+  - health:     GET /health returns 200
+  - chat:       the first POST /chat succeeds (waits or degrades as configured)
+  - ready:      /health reports every startup phase done
+
+Usage:
+    python rag-deployment/benchmarks/startup_time.py [--runs 3] [--port 8765]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+
+MILESTONES = ("connect", "health", "chat", "ready")
+
+
+def accepts_connections(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.05):
+            return True
+    except OSError:
+        return False
+
+
+def measure(mode: str, port: int, timeout: float) -> dict:
+    """Launch one server and time its startup milestones"""
+    env = dict(os.environ, STARTUP_MODE=mode)
+    env.setdefault("LLM_BACKEND", "fake")
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    times = {}
+    degraded = None
+    try:
+        while not accepts_connections(port):
+            if proc.poll() is not None or time.perf_counter() - start > timeout:
+                raise RuntimeError(f"server ({mode}) did not start")
+            time.sleep(0.01)
+        times["connect"] = time.perf_counter() - start
+
+        base_url = f"http://127.0.0.1:{port}"
+        chat_result = {}
+
+        def first_chat():
+            # Sent as soon as connections are accepted; retried while the server answers 503
+            with httpx.Client(base_url=base_url, timeout=timeout) as client:
+                while time.perf_counter() - start < timeout:
+                    chat = client.post("/chat", json={"message": "What are your skills?"})
+                    if chat.status_code == 200:
+                        chat_result.update(seconds=time.perf_counter() - start,
+                                           degraded=chat.json()["metadata"].get("degraded", False))
+                        return
+                    time.sleep(0.05)
+
+        chat_thread = threading.Thread(target=first_chat)
+        chat_thread.start()
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            while "ready" not in times:
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"server ({mode}) not ready after {timeout:.0f}s")
+                health = client.get("/health")
+                if health.status_code == 200:
+                    times.setdefault("health", time.perf_counter() - start)
+                    if health.json().get("status") == "failed":
+                        raise RuntimeError(f"server ({mode}) failed to start: {health.json()['startup']['phases']}")
+                    if health.json().get("ready"):
+                        times["ready"] = time.perf_counter() - start
+                time.sleep(0.1)
+        chat_thread.join()
+        if "seconds" not in chat_result:
+            raise RuntimeError(f"no successful /chat from server ({mode})")
+        times["chat"] = chat_result["seconds"]
+        degraded = chat_result["degraded"]
+    finally:
+        proc.terminate()
+        proc.wait()
+    return dict(times, degraded_first_chat=degraded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="server launches per mode")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0, help="seconds before giving up on a launch")
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}" + "".join(f"{name + ' (s)':>12}" for name in MILESTONES) + "  first chat")
+    for mode in ("blocking", "background"):
+        runs = [measure(mode, args.port, args.timeout) for _ in range(args.runs)]
+        medians = [statistics.median(run[name] for run in runs) for name in MILESTONES]
+        degraded = sum(bool(run["degraded_first_chat"]) for run in runs)
+        print(f"{mode:<12}" + "".join(f"{value:>12.2f}" for value in medians)
+              + f"  {degraded}/{len(runs)} degraded")
+
+
+if __name__ == "__main__":
+    main()
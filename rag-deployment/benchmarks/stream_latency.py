@@ -0,0 +1,83 @@
+"""
+Measure time-to-first-byte of /chat vs /chat/stream against the fake LLM backend
+
+Usage:
+    python rag-deployment/benchmarks/stream_latency.py [--requests 5]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Never touch the network: use the local fake LLM
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+import uvicorn
+from app import app
+
+
+def start_server() -> int:
+    """Run the API in a background thread and return its port"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    
+    # lifespan="off" skips RAG startup so only the LLM path is measured
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return port
+
+
+def time_request(port: int, path: str, first_marker: bytes) -> tuple:
+    """Return (time to first marker, total time) in ms for one POST"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    body = json.dumps({"message": "What are your main technical skills?"})
+    start = time.perf_counter()
+    conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+    response = conn.getresponse()
+    
+    first = None
+    buffer = b""
+    while True:
+        data = response.read1(4096)
+        if not data:
+            break
+        buffer += data
+        if first is None and first_marker in buffer:
+            first = time.perf_counter()
+    end = time.perf_counter()
+    conn.close()
+    return ((first or end) - start) * 1000, (end - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+    
+    port = start_server()
+    
+    print(f"{'endpoint':<14}{'first token (ms)':>18}{'total (ms)':>12}")
+    for path, marker in [("/chat", b"}"), ("/chat/stream", b"event: token")]:
+        samples = [time_request(port, path, marker) for _ in range(args.requests)]
+        first = sum(s[0] for s in samples) / len(samples)
+        total = sum(s[1] for s in samples) / len(samples)
+        print(f"{path:<14}{first:>18.1f}{total:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Benchmark suite: index build, query latency, /chat throughput, memory and cold start
+
+Writes a JSON report (schema below) that can be compared across commits
+with --compare; metrics that got worse by more than --tolerance are
+flagged and make the run exit non-zero.
+
+The chat benchmark drives the real FastAPI app in-process (httpx ASGI
+transport) with GeminiLLM talking to a deterministic local stub of the
+Gemini API (gemini_stub.py), so only our own code is measured. If the embedding
+model cannot be loaded, retrieval-dependent sections record an "error"
+and /chat falls back to a stub retriever (noted in the report).
+
+Report: {"schema": 1, "environment": {...}, "results": {section: {...}}}.
+Numeric leaves ending in _ms, _s or _mb are lower-is-better; _per_s is
+higher-is-better. Changes smaller than a noise floor (1 ms, 0.05 s, 10 MB)
+are never flagged.
+
+Usage:
+    python rag-deployment/benchmarks/suite.py [--output report.json] [--compare baseline.json]
+                                             [--docs 500] [--concurrency 1 8 32] [--requests 200]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# No network, no caches that would turn the load test into a cache benchmark
+os.environ.setdefault("LLM_BACKEND", "gemini")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("COALESCE_REQUESTS", "false")
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import gemini_stub
+
+SCHEMA_VERSION = 1
+
+TERMS = ("Python Java C++ JavaScript SQL PyTorch TensorFlow scikit-learn AWS GCP Docker Kubernetes "
+         "React Node.js FastAPI Spark Kafka Airflow Postgres Redis NLP transformers LLM RAG").split()
+WORDS = ("built developed designed deployed led improved optimized scalable systems models services "
+         "data team pipeline latency throughput users production features platform").split()
+QUESTIONS = [
+    "What are your main technical skills?",
+    "What programming languages do you know?",
+    "Tell me about your experience with AWS",
+    "Have you used PyTorch in production?",
+    "What projects have you worked on?",
+    "Do you have experience with Kubernetes?",
+    "What is your educational background?",
+    "How do you approach problem-solving?",
+]
+
+
+# --- helpers -----------------------------------------------------------------
+
+def rss_mb() -> Dict[str, float]:
+    """Current and peak resident memory of this process"""
+    status = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    status[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    return {"rss_mb": round(status.get("VmRSS", peak_mb), 1), "peak_rss_mb": round(status.get("VmHWM", peak_mb), 1)}
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"n": len(ordered), "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+            "p50_ms": pct(0.5), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+
+def git_revision() -> Dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                                  timeout=30).stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def synthetic_data_dir(n_docs: int, seed: int = 0) -> Path:
+    """A data dir whose processed_data.json holds `n_docs` resume-like chunks"""
+    rng = random.Random(seed)
+    chunks = [
+        {"text": " ".join(rng.choice(TERMS) if rng.random() < 0.25 else rng.choice(WORDS)
+                          for _ in range(rng.randint(60, 180))),
+         "source": "synthetic.pdf"}
+        for _ in range(n_docs)
+    ]
+    data_dir = Path(tempfile.mkdtemp(prefix="rag-bench-data-"))
+    with open(data_dir / "processed_data.json", "w", encoding="utf-8") as f:
+        json.dump({"resume_chunks": chunks, "qa_pairs": []}, f)
+    return data_dir
+
+
+class StubRAG:
+    """Retriever stand-in used when the embedding model is unavailable"""
+
+    index_version = 0
+    reranker = None
+
+    def embed_query(self, query_text: str):
+        return [1.0, 0.0, 0.0]
+
+    def query(self, query_text: str, top_k: int = 3, query_embedding=None, **kwargs):
+        return [{"id": f"stub_{i}", "text": f"Stub resume chunk {i}", "metadata": {"type": "stub"},
+                 "distance": 0.1 * i} for i in range(top_k)]
+
+    def embed_queries(self, query_texts):
+        return [self.embed_query(text) for text in query_texts]
+
+    def query_many(self, query_texts, top_k: int = 3, query_embeddings=None, **kwargs):
+        return [self.query(text, top_k) for text in query_texts]
+
+
+# --- sections ----------------------------------------------------------------
+
+def bench_index_build(data_dir: Path, n_docs: int) -> Tuple[object, Dict]:
+    """Fresh build, no-op resync and persisted reopen of the index"""
+    from embeddings import ResumeRAG
+
+    persist_dir = tempfile.mkdtemp(prefix="rag-bench-index-")
+    before = rss_mb()
+    start = time.perf_counter()
+    rag = ResumeRAG(data_dir=str(data_dir), persist_dir=persist_dir)
+    build_s = time.perf_counter() - start
+    after = rss_mb()
+
+    start = time.perf_counter()
+    rag.sync_index(*rag._read_documents())
+    resync_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ResumeRAG(data_dir=str(data_dir), persist_dir=persist_dir)
+    reopen_s = time.perf_counter() - start
+
+    return rag, {
+        "documents": rag.store.count(),
+        "build_s": round(build_s, 3),
+        "docs_per_s": round(n_docs / build_s, 1),
+        "resync_noop_s": round(resync_s, 3),
+        "reopen_persisted_s": round(reopen_s, 3),
+        "rss_growth_mb": round(after["rss_mb"] - before["rss_mb"], 1),
+    }
+
+
+def bench_query_latency(rag, n_queries: int) -> Dict:
+    """Per-mode retrieval latency for distinct (uncached) and repeated queries"""
+    results = {}
+    rag.embed_query("warm up")
+    for mode in ("dense", "sparse", "hybrid"):
+        cold, warm = [], []
+        for i in range(n_queries):
+            question = f"{QUESTIONS[i % len(QUESTIONS)]} #{mode}{i}"
+            start = time.perf_counter()
+            rag.query(question, top_k=3, mode=mode)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            rag.query(question, top_k=3, mode=mode)
+            warm.append(time.perf_counter() - start)
+        results[mode] = {"uncached": latency_stats(cold), "cached_embedding": latency_stats(warm)}
+    return results
+
+
+async def _chat_level(client, concurrency: int, n_requests: int) -> Dict:
+    latencies = []
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"message": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return dict(latency_stats(latencies), requests_per_s=round(len(latencies) / elapsed, 2))
+
+
+def bench_chat(rag, concurrency_levels: List[int], n_requests: int, first_token_delay: float,
+               token_delay: float) -> Dict:
+    """/chat throughput and latency through the in-process ASGI app"""
+    import httpx
+    import app as backend
+    from llm import GeminiLLM
+    from resilience import ResilientLLM
+
+    stub = gemini_stub.serve(first_token_delay=first_token_delay, token_delay=token_delay)
+    backend.llm = GeminiLLM(base_url=stub.url)
+    backend.llm_client = ResilientLLM(backend.llm)
+    backend.rag_system = rag or StubRAG()
+
+    async def run():
+        transport = httpx.ASGITransport(app=backend.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            await _chat_level(client, 1, 5)  # warm up
+            return {f"c{c}": await _chat_level(client, c, n_requests) for c in concurrency_levels}
+
+    results = asyncio.run(run())
+    results["retrieval"] = "real" if rag else "stub"
+    results["llm_stub"] = {"first_token_delay": first_token_delay, "token_delay": token_delay,
+                           "calls": stub.state.calls}
+    stub.stop()
+    return results
+
+
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r}); sys.path.insert(0, {backend!r})
+import app
+imported = time.perf_counter()
+from embeddings import ResumeRAG
+rag = ResumeRAG(data_dir={data_dir!r}, persist_dir={persist_dir!r})
+ready = time.perf_counter()
+rag.query("What are your skills?", top_k=3)
+first_query = time.perf_counter()
+print(json.dumps({{"import_s": imported - start, "rag_init_s": ready - imported,
+                   "first_query_s": first_query - ready}}))
+"""
+
+
+def bench_cold_start(data_dir: Path) -> Dict:
+    """Fresh interpreter: import the app, build (then reopen) the index, first query"""
+    persist_dir = tempfile.mkdtemp(prefix="rag-bench-cold-")
+    results = {}
+    for run in ("empty_index", "persisted_index"):
+        script = COLD_START_SCRIPT.format(root=str(ROOT_DIR), backend=str(BACKEND_DIR),
+                                          data_dir=str(data_dir), persist_dir=persist_dir)
+        env = dict(os.environ, LLM_BACKEND="fake")
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+                              capture_output=True, text=True, timeout=900)
+        wall = time.perf_counter() - start
+        if proc.returncode:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "cold start failed")
+        timings = json.loads(proc.stdout.strip().splitlines()[-1])
+        results[run] = dict({key: round(value, 3) for key, value in timings.items()}, total_s=round(wall, 3))
+    return results
+
+
+def run_section(report: Dict, name: str, fn, *args):
+    print(f"▶ {name}...", flush=True)
+    try:
+        report["results"][name] = fn(*args)
+    except Exception as e:
+        print(f"  ⚠️  {name} failed: {type(e).__name__}: {e}")
+        report["results"][name] = {"error": f"{type(e).__name__}: {e}"}
+
+
+# --- comparison ----------------------------------------------------------------
+
+def flatten(tree: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in tree.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+# Absolute changes below these are noise, whatever the relative change
+NOISE_FLOOR = {"_ms": 1.0, "_s": 0.05, "_mb": 10.0}
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> int:
+    """Print changes against a baseline report; returns the number of regressions"""
+    current, previous = flatten(report["results"]), flatten(baseline["results"])
+    print(f"\nvs {baseline['environment'].get('commit', '?')[:10]} (tolerance {tolerance:.0%}):")
+    regressions = 0
+    for key in sorted(current.keys() & previous.keys()):
+        lower_better = key.endswith(("_ms", "_s", "_mb"))
+        higher_better = key.endswith("_per_s")
+        if not (lower_better or higher_better) or not previous[key]:
+            continue
+        change = (current[key] - previous[key]) / abs(previous[key])
+        if higher_better:
+            worse = change < -tolerance
+        else:
+            floor = next(value for suffix, value in NOISE_FLOOR.items() if key.endswith(suffix))
+            worse = change > tolerance and current[key] - previous[key] > floor
+        regressions += worse
+        flag = "  ❌ regression" if worse else ""
+        print(f"  {key:<55}{previous[key]:>12g} → {current[key]:<12g}{change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="allowed relative slowdown")
+    parser.add_argument("--docs", type=int, default=500, help="synthetic documents to index")
+    parser.add_argument("--queries", type=int, default=200, help="queries per retrieval mode")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="/chat requests per concurrency level")
+    parser.add_argument("--llm-first-token-ms", type=float, default=200)
+    parser.add_argument("--llm-token-ms", type=float, default=5)
+    parser.add_argument("--skip", nargs="*", default=[],
+                        choices=["index_build", "query_latency", "chat", "cold_start"])
+    args = parser.parse_args()
+
+    from config import EMBEDDING_MODEL, RETRIEVAL_MODE, VECTOR_STORE
+
+    report = {
+        "schema": SCHEMA_VERSION,
+        "environment": dict(
+            git_revision(),
+            timestamp=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            cpus=os.cpu_count(),
+            embedding_model=EMBEDDING_MODEL,
+            vector_store=VECTOR_STORE,
+            retrieval_mode=RETRIEVAL_MODE,
+            parameters=vars(args),
+        ),
+        "results": {"memory": {"start": rss_mb()}},
+    }
+
+    data_dir = synthetic_data_dir(args.docs)
+    rag = None
+    if "index_build" not in args.skip:
+        print("▶ index_build...", flush=True)
+        try:
+            rag, report["results"]["index_build"] = bench_index_build(data_dir, args.docs)
+        except Exception as e:
+            print(f"  ⚠️  index_build failed: {type(e).__name__}: {e}")
+            report["results"]["index_build"] = {"error": f"{type(e).__name__}: {e}"}
+    report["results"]["memory"]["after_index"] = rss_mb()
+
+    if "query_latency" not in args.skip:
+        if rag:
+            run_section(report, "query_latency", bench_query_latency, rag, args.queries)
+        else:
+            report["results"]["query_latency"] = {"error": "index unavailable"}
+    if "chat" not in args.skip:
+        run_section(report, "chat", bench_chat, rag, args.concurrency, args.requests,
+                    args.llm_first_token_ms / 1000, args.llm_token_ms / 1000)
+    report["results"]["memory"]["end"] = rss_mb()
+    if "cold_start" not in args.skip:
+        run_section(report, "cold_start", bench_cold_start, data_dir)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+        print(f"✅ Report written to {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare query latency of the Chroma and NumPy vector store backends
+
+Random unit vectors (MiniLM dimension) are indexed at each corpus size and
+queried with and without a metadata filter ({"type": "qa_pair"}, ~10% of
+documents). Reports p50/p99 latency per query.
+
+Usage:
+    python rag-deployment/benchmarks/vector_store_latency.py [--sizes 100 10000 1000000] [--backends chroma numpy]
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT_DIR = Path(__file__).resolve().parents[2]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(BACKEND_DIR))
+
+from vector_store import create_vector_store
+
+DIM = 384
+ADD_BATCH_SIZE = 5000  # below Chroma's max batch size
+
+
+def random_unit_vectors(rng, n: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def build_store(backend: str, size: int, rng, persist_dir: str):
+    """Index `size` random documents; returns (store, seconds)"""
+    # Embeddings are supplied directly, so no embedding function is needed
+    store = create_vector_store(backend, f"bench_{backend}_{size}", None, persist_dir)
+    start = time.perf_counter()
+    for offset in range(0, size, ADD_BATCH_SIZE):
+        n = min(ADD_BATCH_SIZE, size - offset)
+        store.add(
+            ids=[f"doc_{offset + i}" for i in range(n)],
+            documents=[f"document {offset + i}" for i in range(n)],
+            metadatas=[{"type": "qa_pair" if (offset + i) % 10 == 0 else "resume_chunk"} for i in range(n)],
+            embeddings=random_unit_vectors(rng, n)
+        )
+    return store, time.perf_counter() - start
+
+
+def latencies_ms(store, queries: np.ndarray, top_k: int, where=None) -> np.ndarray:
+    store.query([queries[0]], top_k, where=where)  # warm up
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query([query], top_k, where=where)
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.array(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["chroma", "numpy"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    queries = random_unit_vectors(rng, args.queries)
+    
+    print(f"{'backend':<8}{'vectors':>10}{'build s':>9}{'p50 ms':>9}{'p99 ms':>9}{'filtered p50':>14}{'filtered p99':>14}")
+    for size in args.sizes:
+        for backend in args.backends:
+            # NumPy runs in memory; Chroma uses a scratch on-disk client so
+            # collections from different sizes don't share state
+            persist_dir = tempfile.mkdtemp(prefix="vector_bench_") if backend == "chroma" else None
+            try:
+                store, build_seconds = build_store(backend, size, rng, persist_dir)
+                plain = latencies_ms(store, queries, args.top_k)
+                filtered = latencies_ms(store, queries, args.top_k, where={"type": "qa_pair"})
+                print(
+                    f"{backend:<8}{size:>10}{build_seconds:>9.1f}"
+                    f"{np.percentile(plain, 50):>9.3f}{np.percentile(plain, 99):>9.3f}"
+                    f"{np.percentile(filtered, 50):>14.3f}{np.percentile(filtered, 99):>14.3f}"
+                )
+                del store
+            finally:
+                if persist_dir:
+                    shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
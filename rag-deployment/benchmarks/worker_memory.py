@@ -0,0 +1,148 @@
+"""
+Measure per-worker memory of a multi-worker deployment
+
+Runs `uvicorn app:app --workers N` against a synthetic corpus for each
+deployment mode and reports, per worker, RSS and PSS (proportional set
+size: shared pages such as a memory-mapped index or shared libraries are
+split between the processes mapping them, so PSS sums to real usage):
+  - per-worker:   every worker embeds the corpus into its own in-memory
+                  Chroma collection (VECTOR_STORE=chroma, PERSIST_INDEX=false)
+  - shared:       the index is built once and memory-mapped read-only by all
+                  workers; the encoder loads on each worker's first query
+                  (VECTOR_STORE=numpy, EMBEDDING_LAZY_LOAD=true)
+  - shared-int8:  shared, with the encoder's linear layers quantized to int8
+  - shared-onnx:  shared, with the encoder on ONNX Runtime instead of PyTorch
+                  (EMBEDDING_BACKEND=onnx; export it first, see onnx_encoder.py)
+
+Memory is read from /proc (Linux) once every worker is ready ("idle") and
+again after some /chat traffic ("served").
+
+Usage:
+    python rag-deployment/benchmarks/worker_memory.py [--workers 1 4 8] [--docs 1000]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+from suite import BACKEND_DIR, QUESTIONS, synthetic_data_dir
+
+MODES = {
+    "per-worker": {"VECTOR_STORE": "chroma", "PERSIST_INDEX": "false"},
+    "shared": {"VECTOR_STORE": "numpy", "PERSIST_INDEX": "true", "NUMPY_STORE_MMAP": "true",
+               "EMBEDDING_LAZY_LOAD": "true"},
+    "shared-int8": {"VECTOR_STORE": "numpy", "PERSIST_INDEX": "true", "NUMPY_STORE_MMAP": "true",
+                    "EMBEDDING_LAZY_LOAD": "true", "EMBEDDING_QUANTIZE": "true"},
+    "shared-onnx": {"VECTOR_STORE": "numpy", "PERSIST_INDEX": "true", "NUMPY_STORE_MMAP": "true",
+                    "EMBEDDING_LAZY_LOAD": "true", "EMBEDDING_BACKEND": "onnx"},
+}
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """Rss, Pss and private memory of a process, from /proc/<pid>/smaps_rollup"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                values[key] = int(value.split()[0]) / 1024
+    return {"rss": values["Rss"], "pss": values["Pss"],
+            "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def ready_workers(base_url: str, n_workers: int, timeout: float) -> List[int]:
+    """Poll /health over fresh connections until `n_workers` distinct workers report ready"""
+    ready = set()
+    deadline = time.perf_counter() + timeout
+    while len(ready) < n_workers:
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"only {len(ready)}/{n_workers} workers ready after {timeout:.0f}s")
+        try:
+            health = httpx.get(f"{base_url}/health", timeout=5).json()
+            if health["ready"]:
+                ready.add(health["worker_pid"])
+        except (httpx.HTTPError, KeyError, ValueError):
+            pass
+        time.sleep(0.05)
+    return sorted(ready)
+
+
+def summarize(pids: List[int]) -> Dict[str, float]:
+    """Median per worker (the worker that built a shared index is the max), and the total"""
+    samples = [memory_mb(pid) for pid in pids]
+    return {
+        "rss_mb": statistics.median(s["rss"] for s in samples),
+        "pss_mb": statistics.median(s["pss"] for s in samples),
+        "private_mb": statistics.median(s["private"] for s in samples),
+        "max_rss_mb": max(s["rss"] for s in samples),
+        "total_pss_mb": sum(s["pss"] for s in samples),
+    }
+
+
+def measure(mode: str, n_workers: int, data_dir: Path, port: int, requests_per_worker: int,
+            timeout: float) -> Dict[str, Dict[str, float]]:
+    """Start one deployment, sample its workers' memory idle and after traffic"""
+    env = dict(os.environ, **MODES[mode])
+    env.update(
+        LLM_BACKEND="fake",
+        FAKE_LLM_FIRST_TOKEN_DELAY="0",
+        FAKE_LLM_TOKEN_DELAY="0",
+        RESPONSE_CACHE_ENABLED="false",
+        DATA_DIR=str(data_dir),
+        CHROMA_DB_DIR=tempfile.mkdtemp(prefix="rag-bench-workers-"),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--workers", str(n_workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        pids = ready_workers(base_url, n_workers, timeout)
+        idle = summarize(pids)
+        for i in range(requests_per_worker * n_workers):
+            # New connection per request, so the kernel spreads them over workers
+            httpx.post(f"{base_url}/chat", json={"message": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"},
+                       timeout=timeout).raise_for_status()
+        served = summarize(pids)
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {"idle": idle, "served": served}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--docs", type=int, default=1000, help="synthetic corpus size")
+    parser.add_argument("--requests", type=int, default=10, help="/chat requests per worker")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=900.0, help="seconds to wait for workers")
+    args = parser.parse_args()
+
+    data_dir = synthetic_data_dir(args.docs)
+    print(f"{'mode':<12} {'workers':>7} {'state':<7} {'RSS/worker':>11} {'PSS/worker':>11} "
+          f"{'private':>9} {'max RSS':>9} {'total PSS':>10}  (MB, per-worker medians)")
+    for mode in args.modes:
+        for n_workers in args.workers:
+            result = measure(mode, n_workers, data_dir, args.port, args.requests, args.timeout)
+            for state, values in result.items():
+                print(f"{mode:<12} {n_workers:>7} {state:<7} {values['rss_mb']:>11.0f} {values['pss_mb']:>11.0f} "
+                      f"{values['private_mb']:>9.0f} {values['max_rss_mb']:>9.0f} "
+                      f"{values['total_pss_mb']:>10.0f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 // Chat functionality for Jai LLM Chatbot
 
 const API_URL = 'http://localhost:8000';
-let conversationHistory = [];
+// History is kept server-side; we only hold the session ID it is stored under
+let sessionId = sessionStorage.getItem('sessionId');
 
 // DOM elements
 const messagesContainer = document.getElementById('messages');
@@ -47,7 +48,7 @@ async function sendMessage() {
             },
             body: JSON.stringify({
                 message: message,
-                conversation_history: conversationHistory
+                session_id: sessionId
             })
         });
         
@@ -63,11 +64,9 @@ async function sendMessage() {
         // Add bot response
         addMessage(data.response, 'bot');
         
-        // Update conversation history
-        conversationHistory.push(
-            { role: 'user', content: message },
-            { role: 'assistant', content: data.response }
-        );
+        // Remember the session the server recorded this exchange in
+        sessionId = data.session_id;
+        sessionStorage.setItem('sessionId', sessionId);
         
     } catch (error) {
         console.error('Error:', error);
@@ -155,7 +154,17 @@ function askQuestion(question) {
 
 // Reset conversation
 function resetConversation() {
-    conversationHistory = [];
+    if (sessionId) {
+        fetch(`${API_URL}/reset`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ session_id: sessionId })
+        }).catch(error => console.error('Error:', error));
+    }
+    sessionId = null;
+    sessionStorage.removeItem('sessionId');
     messagesContainer.innerHTML = `
         <div class="message bot-message">
             <div class="message-content">
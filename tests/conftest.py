@@ -0,0 +1,145 @@
+"""
+Shared test setup: backend modules importable, settings from config.example.py,
+network-free stand-ins for the embedding model and the LLM, and an API client over them
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+BACKEND_DIR = ROOT_DIR / "rag-deployment" / "backend"
+
+# Settings are read when config is imported, so fix them first
+os.environ.update({
+    "LLM_BACKEND": "fake",
+    "FAKE_LLM_FIRST_TOKEN_DELAY": "0",
+    "FAKE_LLM_TOKEN_DELAY": "0",
+    "RERANK_ENABLED": "false",
+    "HF_HUB_OFFLINE": "1",
+})
+
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "data"))
+sys.path.insert(0, str(BACKEND_DIR))
+
+# config.py is written per deployment (and never committed); without one,
+# run on the example settings
+if not (ROOT_DIR / "config.py").exists():
+    spec = importlib.util.spec_from_file_location("config", ROOT_DIR / "config.example.py")
+    config = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(config)
+    sys.modules["config"] = config
+
+from prompt_builder import TokenCounter  # noqa: E402  (needs config)
+
+
+class FakeEmbedder:
+    """
+    Deterministic bag-of-words embedding function (list of texts -> list of
+    unit vectors): texts sharing words are close, no model is loaded.
+    `calls` counts the texts embedded.
+    """
+
+    id = "fake-embedder"
+    dim = 64
+
+    def __init__(self):
+        self.calls = 0
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode("utf-8")).hexdigest(), 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __call__(self, texts):
+        self.calls += len(texts)
+        return [self.embed(text) for text in texts]
+
+
+@pytest.fixture
+def fake_embedder():
+    return FakeEmbedder()
+
+
+class EstimatingCounter(TokenCounter):
+    """TokenCounter without a tokenizer: every count is an estimate (nothing is downloaded)"""
+
+    def load(self):
+        return None
+
+
+RESUME_CHUNKS = [
+    "Jai builds machine learning systems in Python and PyTorch.",
+    "Jai deployed retrieval augmented generation services on AWS.",
+    "Jai studied computer science with a focus on natural language processing.",
+]
+
+QA_PAIRS = [
+    {"question": "What programming languages do you know?", "answer": "Python, Java and C++."},
+    {"question": "Where are you based?", "answer": "In the United States."},
+]
+
+
+def write_processed_data(data_dir: Path, chunks=RESUME_CHUNKS, qa_pairs=QA_PAIRS) -> Path:
+    """Write the processed_data.json that ResumeRAG indexes"""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    with open(data_dir / "processed_data.json", "w", encoding="utf-8") as f:
+        json.dump({"resume_chunks": list(chunks), "qa_pairs": list(qa_pairs)}, f)
+    return data_dir
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    return write_processed_data(tmp_path / "data")
+
+
+@pytest.fixture
+def rag(fake_embedder, data_dir):
+    """ResumeRAG over the test resume data, in an in-memory NumPy index"""
+    from embeddings import ResumeRAG
+
+    return ResumeRAG(data_dir=str(data_dir), vector_store="numpy", embedding_fn=fake_embedder)
+
+
+@pytest.fixture
+def llm():
+    """The LLM backend behind the API client; test modules override it with their own FakeLLM"""
+    from llm import FakeLLM
+
+    return FakeLLM(first_token_delay=0, token_delay=0)
+
+
+@pytest.fixture
+def client(monkeypatch, llm, rag):
+    """
+    TestClient for the API, without running startup: the app's components
+    are set here instead (`llm` without retries or hedging, `rag`, fresh
+    sessions and coalescing, no response cache, estimated token counts)
+    """
+    from fastapi.testclient import TestClient
+
+    import app
+    from coalescing import SingleFlight
+    from prompt_builder import PromptBuilder
+    from resilience import ResilientLLM
+    from router import QueryRouter
+    from session_store import MemorySessionStore
+
+    monkeypatch.setattr(app, "llm_client", ResilientLLM(llm, retries=0, hedge=False))
+    monkeypatch.setattr(app, "rag_system", rag)
+    monkeypatch.setattr(app, "router", QueryRouter())
+    monkeypatch.setattr(app, "response_cache", None)
+    monkeypatch.setattr(app, "session_store", MemorySessionStore())
+    monkeypatch.setattr(app, "single_flight", SingleFlight())
+    monkeypatch.setattr(app, "prompt_builder", PromptBuilder(app.SYSTEM_PROMPT, counter=EstimatingCounter()))
+    return TestClient(app.app)
@@ -0,0 +1,57 @@
+"""
+/chat/batch: repeated questions answered once, answers in question order, per-question errors
+"""
+
+import pytest
+
+import app
+from llm import FakeLLM
+
+
+class CountingLLM(FakeLLM):
+    """FakeLLM recording its prompts; a question containing "explode" raises a bug-like error"""
+
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.prompts = []
+
+    async def agenerate(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        if "explode" in prompt:
+            raise RuntimeError("boom")
+        return await super().agenerate(prompt, generation_config)
+
+
+@pytest.fixture
+def llm():
+    return CountingLLM()
+
+
+def test_repeated_questions_are_answered_once(llm, client):
+    questions = ["What did Jai deploy on AWS?", "Where did Jai study?", "  what did jai   deploy on AWS?"]
+    response = client.post("/chat/batch", json={"questions": questions})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [answer["question"] for answer in body["answers"]] == [question.strip() for question in questions]
+    assert body["metadata"]["questions"] == 3
+    assert body["metadata"]["unique_questions"] == 2
+    assert len(llm.prompts) == 2
+    first, second, repeat = body["answers"]
+    assert repeat["response"] == first["response"] != second["response"]
+    assert first["sources"] and not first["error"]
+
+
+def test_failed_question_does_not_fail_the_batch(llm, client):
+    response = client.post("/chat/batch", json={"questions": ["Please explode", "Where did Jai study?"]})
+    assert response.status_code == 200
+    failed, answered = response.json()["answers"]
+    assert failed["error"] == "boom" and failed["response"] is None
+    assert answered["response"] and answered["error"] is None
+    assert response.json()["metadata"]["failed"] == 1
+
+
+@pytest.mark.parametrize("questions", [[], ["ok", " "], ["question"] * (app.CHAT_BATCH_MAX_QUESTIONS + 1)])
+def test_invalid_batches_are_rejected(llm, client, questions):
+    assert client.post("/chat/batch", json={"questions": questions}).status_code == 400
+    assert not llm.prompts
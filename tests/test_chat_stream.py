@@ -0,0 +1,86 @@
+"""
+POST /chat/stream: server-sent event order, errors after the first token, and the streamed turn saved to the session
+"""
+
+import json
+
+import pytest
+
+import app
+from llm import FakeLLM, LLMError
+
+
+class BreakingLLM(FakeLLM):
+    """FakeLLM whose stream raises after `fail_after` tokens (None: never)"""
+
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.fail_after = None
+
+    async def astream(self, prompt, generation_config=None):
+        sent = 0
+        async for token in super().astream(prompt, generation_config):
+            if sent == self.fail_after:
+                raise LLMError("connection reset by the LLM API")
+            yield token
+            sent += 1
+
+
+@pytest.fixture
+def llm():
+    return BreakingLLM()
+
+
+def stream(client, **request):
+    """(event, data) pairs of a streamed chat response"""
+    response = client.post("/chat/stream", json=request)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_events_arrive_in_order_and_the_turn_is_saved(client):
+    events = stream(client, message="What did Jai deploy on AWS?")
+    names = [event for event, _ in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 3
+
+    sources, done = events[0][1], events[-1][1]
+    assert sources["sources"] and sources["session_id"] == done["session_id"]
+    assert done["response"] == "".join(data["text"] for event, data in events if event == "token")
+    assert done["tokens"] == len(names) - 2
+    assert not done["coalesced"] and done["time_to_first_token_ms"] <= done["total_ms"]
+    assert app.session_store.get(done["session_id"]) == [
+        {"role": "user", "content": "What did Jai deploy on AWS?"},
+        {"role": "assistant", "content": done["response"]},
+    ]
+
+    # The next message continues the session
+    follow_up = stream(client, message="And on which cloud?", session_id=done["session_id"])
+    assert follow_up[-1][1]["history_turns"] == 2
+    assert len(app.session_store.get(done["session_id"])) == 4
+
+
+def test_failure_after_the_first_token_ends_with_an_error_event(llm, client):
+    llm.fail_after = 1
+    events = stream(client, message="What did Jai deploy on AWS?")
+    assert [event for event, _ in events] == ["sources", "token", "error"]
+    assert "connection reset" in events[-1][1]["detail"]
+    assert app.session_store.get(events[0][1]["session_id"]) == []  # no answer, nothing saved
+
+
+def test_failure_before_the_first_token_streams_the_context_answer(llm, client):
+    llm.fail_after = 0
+    events = stream(client, message="What did Jai deploy on AWS?")
+    assert [event for event, _ in events] == ["sources", "token", "done"]
+    done = events[-1][1]
+    assert done["llm_fallback"] and done["response"] == events[1][1]["text"]
+    assert "most relevant part of my resume" in done["response"]
+
+
+def test_empty_message_is_rejected(client):
+    assert client.post("/chat/stream", json={"message": "  "}).status_code == 400
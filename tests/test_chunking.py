@@ -0,0 +1,58 @@
+"""
+Token-budget chunking: segment boundaries, budgets, overlap and streaming input
+"""
+
+import itertools
+
+import chunking
+import prompt_builder
+from chunking import iter_segments, iter_token_chunks
+from conftest import EstimatingCounter
+
+PAGES = [
+    "EXPERIENCE\nBuilt a retrieval service in Python. Cut p95 latency by 40%.\n\n"
+    "Led a team of four engineers; shipped weekly.",
+    "SKILLS\nPython, PyTorch, AWS",
+]
+
+
+def test_one_token_counter_for_chunking_and_prompts():
+    assert chunking.TokenCounter is prompt_builder.TokenCounter
+
+
+def test_segments_break_at_lines_and_sentences():
+    assert list(iter_segments(PAGES, str.strip)) == [
+        "EXPERIENCE", "Built a retrieval service in Python.", "Cut p95 latency by 40%.",
+        "Led a team of four engineers; shipped weekly.",  # no capital after ";": not a boundary
+        "SKILLS", "Python, PyTorch, AWS",
+    ]
+
+
+def sentences(n):
+    return (f"Sentence number {i} describes one more project." for i in range(n))
+
+
+def test_chunks_fit_the_budget_and_overlap():
+    counter = EstimatingCounter()
+    chunks = list(iter_token_chunks(sentences(40), counter, max_tokens=40, overlap_tokens=10))
+
+    assert len(chunks) > 5
+    for (text, tokens), (next_text, _) in zip(chunks, chunks[1:]):
+        assert tokens <= 40 and tokens == counter.count(text)
+        # The next chunk starts with the last sentence of this one (8 tokens of overlap)
+        assert next_text.startswith(text[text.rindex("Sentence"):])
+    covered = " ".join(text for text, _ in chunks)
+    assert all(sentence in covered for sentence in sentences(40))
+
+
+def test_oversized_segments_are_split_by_words():
+    counter = EstimatingCounter()
+    chunks = list(iter_token_chunks([" ".join(["word"] * 100)], counter, max_tokens=30, overlap_tokens=0))
+    assert all(tokens <= 30 for _, tokens in chunks)
+    assert sum(tokens for _, tokens in chunks) == 100
+
+
+def test_chunks_stream_from_unbounded_input():
+    endless = (f"Fact {i} about the resume." for i in itertools.count())
+    first = next(iter_token_chunks(endless, EstimatingCounter(), max_tokens=20, overlap_tokens=0))
+    assert first[0].startswith("Fact 0") and first[1] <= 20
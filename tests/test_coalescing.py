@@ -0,0 +1,102 @@
+"""
+Single-flight coalescing: shared results and shared token streams for identical concurrent requests
+"""
+
+import asyncio
+
+import pytest
+
+from coalescing import SharedStream, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.call("q", work) for _ in range(3)))
+        later = await flight.call("q", work)  # key released once the work finished
+        return flight, results, later
+
+    flight, results, later = asyncio.run(run())
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert later == ("answer", False)
+    assert len(calls) == 2
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "coalesced": 2}
+
+
+def test_errors_reach_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("LLM down")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.call("q", work), flight.call("q", work), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(run())] == ["LLM down", "LLM down"]
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def run():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.call("q", work))
+        follower = asyncio.ensure_future(flight.call("q", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == ("answer", True)
+
+
+async def tokens(gate=None, fail=False):
+    for token in ["Jai ", "knows ", "Python"]:
+        if gate:
+            await gate.wait()
+        yield token
+    if fail:
+        raise RuntimeError("stream broke")
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_late_subscribers_replay_then_follow():
+    async def run():
+        gate = asyncio.Event()
+        flight = SingleFlight()
+        first, first_coalesced = flight.stream("q", lambda: tokens(gate))
+        first_task = asyncio.ensure_future(collect(first))
+        gate.set()
+        while not flight._streams["q"].items:  # the second subscriber joins mid-stream
+            await asyncio.sleep(0)
+        second, second_coalesced = flight.stream("q", lambda: tokens(gate))
+        results = await asyncio.gather(first_task, collect(second))
+        return flight, results, first_coalesced, second_coalesced
+
+    flight, results, first_coalesced, second_coalesced = asyncio.run(run())
+    assert results == [["Jai ", "knows ", "Python"]] * 2
+    assert (first_coalesced, second_coalesced) == (False, True)
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 1}
+
+
+def test_stream_errors_are_raised_after_the_buffered_items():
+    async def run():
+        shared = SharedStream(tokens(fail=True))
+        received = []
+        with pytest.raises(RuntimeError, match="stream broke"):
+            async for item in shared.subscribe():
+                received.append(item)
+        return received
+
+    assert asyncio.run(run()) == ["Jai ", "knows ", "Python"]
@@ -0,0 +1,25 @@
+"""
+API concurrency limits: created per event loop, so they work under any server or test client loop
+"""
+
+import asyncio
+
+import app
+
+
+def test_llm_semaphore_works_in_successive_event_loops(monkeypatch):
+    monkeypatch.setattr(app, "LLM_MAX_CONCURRENCY", 1)
+    in_flight = []
+
+    async def call():
+        async with app.llm_semaphore():
+            in_flight.append(app.llm_semaphore()._value)
+            await asyncio.sleep(0.01)
+
+    async def contend():
+        assert app.llm_semaphore() is app.llm_semaphore()
+        await asyncio.gather(call(), call(), call())
+
+    for _ in range(2):  # a primitive bound to the first loop would fail in the second
+        asyncio.run(contend())
+    assert in_flight == [0] * 6
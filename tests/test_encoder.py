@@ -0,0 +1,94 @@
+"""
+Query encoder: LRU embedding cache, case handling and micro-batching of concurrent queries
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import FakeEmbedder
+from encoder import QueryEncoder, normalize_query
+
+
+class RecordingEmbedder(FakeEmbedder):
+    """FakeEmbedder recording each batch it is called with"""
+
+    def __init__(self, do_lower_case=False, error=None):
+        super().__init__()
+        self.do_lower_case = do_lower_case
+        self.error = error
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        if self.error:
+            raise self.error
+        return super().__call__(texts)
+
+
+def test_lru_cache_keeps_recent_queries():
+    embedder = RecordingEmbedder()
+    encoder = QueryEncoder(embedder, cache_size=2, batch_window_ms=0)
+    first = encoder.encode("Python skills")
+    encoder.encode("AWS experience")
+    assert encoder.encode("  Python   skills ") is first  # whitespace-insensitive hit
+    encoder.encode("Education")  # evicts "AWS experience", the least recently used
+
+    encoder.encode("Python skills")
+    encoder.encode("AWS experience")
+    assert embedder.batches == [["Python skills"], ["AWS experience"], ["Education"], ["AWS experience"]]
+    stats = encoder.stats()
+    assert (stats["cache_hits"], stats["cache_misses"], stats["cache_entries"]) == (2, 4, 2)
+    assert not first.flags.writeable  # shared through the cache
+
+
+@pytest.mark.parametrize("uncased, encoded", [(True, "what is rag?"), (False, "What is RAG?")])
+def test_queries_are_lowercased_only_for_uncased_models(uncased, encoded):
+    embedder = RecordingEmbedder(do_lower_case=uncased)
+    QueryEncoder(embedder, batch_window_ms=0).encode("What is  RAG?")
+    assert embedder.batches == [[encoded]]
+
+
+def test_concurrent_queries_share_one_forward_pass():
+    embedder = RecordingEmbedder()
+    encoder = QueryEncoder(embedder, batch_window_ms=200, max_batch_size=8)
+    queries = ["Python", "AWS", "Python", "Docker"]
+    results = [None] * len(queries)
+    barrier = threading.Barrier(len(queries))
+
+    def encode(i):
+        barrier.wait()
+        results[i] = encoder.encode(queries[i])
+
+    threads = [threading.Thread(target=encode, args=(i,)) for i in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(embedder.batches) == 1
+    assert sorted(embedder.batches[0]) == ["AWS", "Docker", "Python"]  # repeats encoded once
+    assert results[0] is results[2]
+    for query, vector in zip(queries, results):
+        assert np.allclose(vector, embedder.embed(query))
+
+
+def test_encode_many_encodes_misses_in_one_pass():
+    embedder = RecordingEmbedder()
+    encoder = QueryEncoder(embedder, batch_window_ms=0)
+    encoder.encode("Python")
+    vectors = encoder.encode_many(["Python", "AWS", "aws ", "AWS"])
+    assert embedder.batches == [["Python"], ["AWS", "aws"]]
+    assert vectors[1] is vectors[3]
+
+
+def test_encoding_errors_reach_every_waiter():
+    encoder = QueryEncoder(RecordingEmbedder(error=RuntimeError("model crashed")), batch_window_ms=0)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        encoder.encode("Python")
+    assert encoder.stats()["cache_entries"] == 0
+
+
+def test_normalize_query():
+    assert normalize_query("  What   did\tJai BUILD? ") == "what did jai build?"
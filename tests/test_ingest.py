@@ -0,0 +1,65 @@
+"""
+POST /ingest: API key, JSON Lines and JSON bodies, batching, invalid documents and duplicates
+"""
+
+import json
+
+import pytest
+
+import app
+from conftest import RESUME_CHUNKS
+
+HEADERS = {"X-API-Key": "secret"}
+JSONL = dict(HEADERS, **{"Content-Type": "application/x-ndjson"})
+DOCUMENTS = [
+    {"text": "Jai wrote a blog post about vector databases.", "metadata": {"source": "blog"}},
+    {"text": "Jai gave a talk on retrieval evaluation.", "id": "talk-1"},
+    {"text": "Jai maintains an open source chatbot."},
+]
+
+
+@pytest.fixture(autouse=True)
+def ingest_settings(monkeypatch):
+    monkeypatch.setattr(app, "INGEST_API_KEY", "secret")
+    monkeypatch.setattr(app, "INGEST_BATCH_SIZE", 2)
+
+
+def jsonl(*lines) -> str:
+    return "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+
+def test_ingest_requires_the_api_key(rag, client, monkeypatch):
+    body = jsonl(*DOCUMENTS)
+    assert client.post("/ingest", content=body, headers=dict(JSONL, **{"X-API-Key": "wrong"})).status_code == 403
+    monkeypatch.setattr(app, "INGEST_API_KEY", "")
+    assert client.post("/ingest", content=body, headers=dict(JSONL, **{"X-API-Key": ""})).status_code == 403
+    assert rag.store.count() == len(RESUME_CHUNKS) + 2  # resume chunks and Q&A pairs only
+
+
+def test_json_lines_are_ingested_in_batches(rag, client, fake_embedder):
+    before, version = rag.store.count(), rag.index_version
+    body = jsonl(DOCUMENTS[0], "{not json", DOCUMENTS[1], {"text": ""}, DOCUMENTS[2])
+    response = client.post("/ingest", content=body, headers=JSONL)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["added"], report["duplicates"], report["batches"]) == (3, 3, 0, 2)
+    assert [error["line"] for error in report["errors"]] == [2, 4]
+    assert rag.store.count() == before + 3
+    assert report["index_version"] == rag.index_version != version
+
+    top = rag.query("What did Jai write about vector databases?", top_k=1)[0]
+    assert top["text"] == DOCUMENTS[0]["text"]
+    assert top["metadata"] == {"source": "blog", "type": "custom"}
+
+
+def test_resending_documents_reports_duplicates(rag, client):
+    first = client.post("/ingest", json={"documents": DOCUMENTS}, headers=HEADERS).json()
+    again = client.post("/ingest", json=DOCUMENTS, headers=HEADERS).json()
+    assert (first["added"], first["duplicates"]) == (3, 0)
+    assert (again["added"], again["duplicates"]) == (0, 3)
+
+
+def test_malformed_json_bodies_are_rejected(rag, client):
+    json_headers = dict(HEADERS, **{"Content-Type": "application/json"})
+    assert client.post("/ingest", content="{oops", headers=json_headers).status_code == 400
+    assert client.post("/ingest", json={"docs": []}, headers=HEADERS).status_code == 400
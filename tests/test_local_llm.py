@@ -0,0 +1,132 @@
+"""
+Local generation backend: a tiny random GPT-2 decoded alone and in left-padded, KV-cached batches
+"""
+
+import asyncio
+
+import pytest
+
+from llm import LLMError
+from local_llm import LocalLLM, STOP_STRINGS, _DONE, _Request, held_back
+from resilience import ResilientLLM
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+WORDS = "question answer jai python aws deployed built models where what did you study on in".split()
+PROMPTS = ["What did Jai deploy on AWS?", "Where did you study?", "What models did Jai build in Python?"]
+
+
+@pytest.fixture(scope="module")
+def base_model(tmp_path_factory):
+    """A 2-layer GPT-2 with random weights and a word-level tokenizer, saved like a hub model"""
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers
+
+    path = tmp_path_factory.mktemp("tiny-gpt2")
+    vocab = {word: i for i, word in enumerate(["<unk>", "<eos>", ":", "?"] + WORDS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.normalizer = normalizers.Lowercase()
+    tokenizer.pre_tokenizer = pre_tokenizers.Sequence([pre_tokenizers.WhitespaceSplit(), pre_tokenizers.Punctuation()])
+    transformers.PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>",
+                                         eos_token="<eos>").save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = transformers.GPT2Config(vocab_size=len(vocab), n_positions=32, n_embd=32, n_layer=2, n_head=2,
+                                     bos_token_id=1, eos_token_id=1)
+    transformers.GPT2LMHeadModel(config).save_pretrained(path)
+    return str(path)
+
+
+def make_llm(base_model, **kwargs):
+    settings = dict(base_model=base_model, adapter_path="", max_new_tokens=8, batch_window_ms=0)
+    llm = LocalLLM(**dict(settings, **kwargs))
+    llm.load()
+    return llm
+
+
+def decode_together(llm, prompts, max_new_tokens=8):
+    """Decode `prompts` greedily as one batch, bypassing the batching thread"""
+    outputs = [[] for _ in prompts]
+    requests = [
+        _Request(llm._prompt_ids(prompt, max_new_tokens), max_new_tokens, 0.0, 1.0,
+                 lambda item, out=out: out.append(item))
+        for prompt, out in zip(prompts, outputs)
+    ]
+    llm._decode(requests)
+    assert all(out[-1] is _DONE for out in outputs)
+    return ["".join(out[:-1]) for out in outputs]
+
+
+def test_batched_decoding_matches_unbatched_greedy(base_model):
+    llm = make_llm(base_model)
+    alone = [llm.generate(prompt, {"temperature": 0}) for prompt in PROMPTS]
+    assert any(alone)
+    assert decode_together(llm, PROMPTS) == alone
+    assert decode_together(make_llm(base_model, kv_cache=False), PROMPTS) == alone
+
+
+def test_concurrent_requests_share_a_batch(base_model):
+    llm = make_llm(base_model, batch_window_ms=200)
+
+    async def ask_all():
+        return await asyncio.gather(*(llm.agenerate(prompt, {"temperature": 0}) for prompt in PROMPTS))
+
+    answers = asyncio.run(ask_all())
+    assert answers == [llm.generate(prompt, {"temperature": 0}) for prompt in PROMPTS]
+    assert llm.stats()["batches"] == 1 + len(PROMPTS)
+
+
+def test_long_answers_are_clamped_to_the_position_table(base_model):
+    llm = make_llm(base_model, max_new_tokens=100)
+    assert len(llm._prompt_ids(" ".join(WORDS * 3), 31)) == 1
+    assert len(llm._prompt_ids(" ".join(WORDS * 3), 20)) == 12
+    llm.generate(" ".join(WORDS * 3), {"temperature": 0})  # would overflow the 32 positions unclamped
+
+
+def test_merged_adapter_changes_the_model(base_model, tmp_path):
+    peft = pytest.importorskip("peft")
+
+    base = transformers.AutoModelForCausalLM.from_pretrained(base_model)
+    lora = peft.get_peft_model(base, peft.LoraConfig(r=4, target_modules=["c_attn"], fan_in_fan_out=True,
+                                                     init_lora_weights=False))
+    lora.save_pretrained(tmp_path / "adapter")
+
+    tuned = make_llm(base_model, adapter_path=str(tmp_path / "adapter"))
+    assert type(tuned._model).__name__ == "GPT2LMHeadModel"  # merged: no adapter layers left
+    assert tuned.model_name.endswith("+adapter")
+    ids = torch.tensor([tuned._prompt_ids(PROMPTS[0], 8)])
+    with torch.inference_mode():
+        assert not torch.allclose(tuned._model(ids).logits, make_llm(base_model)._model(ids).logits)
+
+
+def test_load_failures_are_llm_errors(base_model, tmp_path):
+    llm = LocalLLM(base_model=base_model, adapter_path=str(tmp_path / "missing"))
+    with pytest.raises(LLMError, match="LoRA adapter not found"):
+        llm.load()
+    with pytest.raises(LLMError, match="Could not load the local model"):
+        LocalLLM(base_model=str(tmp_path / "no-model"), adapter_path="").load()
+
+    # The API falls back to a context answer on LLMError
+    client = ResilientLLM(llm, retries=0, hedge=False)
+    with pytest.raises(LLMError):
+        asyncio.run(client.agenerate(PROMPTS[0]))
+
+
+def test_sampling_is_greedy_at_zero_temperature_and_respects_top_p():
+    llm = LocalLLM.__new__(LocalLLM)
+    logits = torch.tensor([[0.0, 5.0, 1.0], [0.0, 5.0, 1.0], [3.0, 0.0, 2.9]])
+    temperatures = torch.tensor([0.0, 1.0, 1.0])
+    top_ps = torch.tensor([1.0, 0.01, 0.01])  # top_p this small keeps only the most likely token
+    for _ in range(20):
+        assert llm._sample(logits, temperatures, top_ps).tolist() == [1, 1, 0]
+
+
+@pytest.mark.parametrize("text, held", [
+    ("I build models", 0),
+    ("I build models\n", 1),
+    ("I build models\nQuest", 6),
+    ("I build models\nQuestion", 9),
+])
+def test_held_back_withholds_a_possible_stop_string(text, held):
+    assert held_back(text) == held
+    assert held < len(STOP_STRINGS[0])
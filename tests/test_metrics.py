@@ -0,0 +1,99 @@
+"""
+Stage metrics: histogram quantiles, Prometheus export and the Server-Timing middleware
+"""
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import metrics as metrics_module
+from metrics import Histogram, Metrics, TimingMiddleware, server_timing_header
+
+
+def test_histogram_quantiles_interpolate_within_the_observed_range():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    assert histogram.quantile(0.5) is None
+    histogram.observe(0.05)
+    assert histogram.quantile(0.99) == pytest.approx(0.05)  # a single sample is exact
+    for seconds in (0.02, 0.03, 0.04, 0.5):
+        histogram.observe(seconds)
+    assert 0.02 <= histogram.quantile(0.5) <= 0.1
+    assert histogram.quantile(1.0) == pytest.approx(0.5)
+    histogram.observe(5.0)  # +Inf bucket, capped at the maximum
+    assert histogram.quantile(1.0) == pytest.approx(5.0)
+
+
+def test_prometheus_export_has_cumulative_buckets_and_counters():
+    registry = Metrics(enabled=True)
+    registry.observe_stage("retrieval", 0.004)
+    registry.observe_stage("retrieval", 0.04)
+    registry.increment("llm", "event", "retry")
+    text = registry.render_prometheus()
+    assert 'rag_stage_duration_seconds_bucket{stage="retrieval",le="0.005"} 1' in text
+    assert 'rag_stage_duration_seconds_bucket{stage="retrieval",le="+Inf"} 2' in text
+    assert 'rag_stage_duration_seconds_count{stage="retrieval"} 2' in text
+    assert 'rag_llm_total{event="retry"} 1' in text
+    assert registry.summary()["retrieval"]["count"] == 2
+
+
+def test_disabled_metrics_record_nothing():
+    registry = Metrics(enabled=False)
+    with registry.timer("llm"):
+        pass
+    registry.increment("llm", "event", "retry")
+    assert registry.summary() == {}
+
+
+@pytest.fixture
+def timed_client(monkeypatch):
+    registry = Metrics(enabled=True)
+    monkeypatch.setattr(metrics_module, "metrics", registry)
+
+    async def chat(request):
+        with registry.timer("retrieval"):
+            await asyncio.sleep(0.01)
+        registry.observe_stage("llm", 0.02)
+        registry.observe_stage("llm", 0.01)  # repeated stages add up
+        return PlainTextResponse("ok")
+
+    routes = [Route("/chat", chat), Route("/health", chat)]
+    app = TimingMiddleware(Starlette(routes=routes), paths=("/chat",))
+    return TestClient(app), registry
+
+
+def parse_server_timing(header):
+    entries = dict(entry.split(";dur=") for entry in header.split(", "))
+    return {stage: float(ms) for stage, ms in entries.items()}
+
+
+def test_server_timing_header_lists_request_stages(timed_client):
+    client, registry = timed_client
+    timings = parse_server_timing(client.get("/chat").headers["server-timing"])
+    assert list(timings) == ["retrieval", "llm", "total"]
+    assert timings["llm"] == pytest.approx(30.0)
+    assert timings["total"] >= timings["retrieval"] >= 10.0
+    assert registry.summary()["request /chat"]["count"] == 1
+
+
+def test_untracked_paths_get_no_header(timed_client):
+    client, registry = timed_client
+    response = client.get("/health")
+    assert "server-timing" not in response.headers
+    assert "request /health" not in registry.summary()
+    assert registry.summary()["retrieval"]["count"] == 1  # stage histograms still record it
+
+
+def test_chat_reports_its_pipeline_stages(client):
+    response = client.post("/chat", json={"message": "What did Jai deploy on AWS?"})
+    assert response.status_code == 200
+    stages = parse_server_timing(response.headers["server-timing"])
+    assert {"prompt", "llm", "total"} <= set(stages)
+    assert stages["total"] >= stages["llm"]
+
+
+def test_server_timing_header_format():
+    assert server_timing_header({"retrieval": 1.234, "total": 10}) == "retrieval;dur=1.23, total;dur=10.00"
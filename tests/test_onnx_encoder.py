@@ -0,0 +1,80 @@
+"""
+ONNX embedding backend: exported model parity with sentence-transformers, and export checks at load time
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from onnx_encoder import CONFIG_FILE, OnnxEmbedder, export_onnx
+
+pytest.importorskip("onnxruntime")
+
+TEXTS = ["Jai deployed models on AWS", "python", "Where did Jai study computer science and machine learning?"]
+WORDS = "jai deployed models on aws python where did study computer science and machine learning ?".split()
+
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    """A 2-layer random BERT saved as a SentenceTransformer (mean pooling, normalized) and exported to ONNX"""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    pytest.importorskip("onnx")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+
+    base = tmp_path_factory.mktemp("tiny-bert")
+    vocab = base / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n", encoding="utf-8")
+    transformers.BertTokenizerFast(vocab_file=str(vocab), do_lower_case=True).save_pretrained(base)
+    torch.manual_seed(0)
+    config = transformers.BertConfig(vocab_size=len(WORDS) + 5, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64, max_position_embeddings=64)
+    transformers.BertModel(config).save_pretrained(base)
+
+    modules = sentence_transformers.models
+    transformer = modules.Transformer(str(base), max_seq_length=32)
+    model = sentence_transformers.SentenceTransformer(modules=[
+        transformer, modules.Pooling(transformer.get_word_embedding_dimension(), pooling_mode="mean"),
+        modules.Normalize(),
+    ], device="cpu")
+    model_dir = str(tmp_path_factory.mktemp("tiny-st"))
+    model.save(model_dir)
+
+    output = str(tmp_path_factory.mktemp("onnx"))
+    return model_dir, output, export_onnx(model_dir, output), model
+
+
+def test_export_records_the_pipeline_settings(exported):
+    model_dir, _, config, _ = exported
+    assert config["model_name"] == model_dir
+    assert (config["pooling"], config["normalize"], config["do_lower_case"]) == ("mean", True, True)
+    assert config["max_seq_length"] == 32 and config["dimension"] == 32
+
+
+def test_onnx_vectors_match_sentence_transformers(exported):
+    model_dir, output, _, model = exported
+    expected = model.encode(TEXTS, convert_to_numpy=True)
+
+    fp32 = OnnxEmbedder(model_dir, output, quantize=False)
+    assert fp32.id == model_dir  # shares the PyTorch model's persisted index
+    assert np.allclose(np.stack(fp32(TEXTS)), expected, atol=1e-5)
+    assert fp32.do_lower_case
+
+    int8 = OnnxEmbedder(model_dir, output, quantize=True)
+    assert int8.id == f"{model_dir}+onnx-int8"
+    similarities = np.sum(np.stack(int8(TEXTS)) * expected, axis=1)
+    assert np.all(similarities > 0.95)
+
+
+def test_missing_export_is_reported(tmp_path):
+    embedder = OnnxEmbedder("all-MiniLM-L6-v2", str(tmp_path))
+    assert not embedder.loaded and not embedder.do_lower_case
+    with pytest.raises(FileNotFoundError, match="onnx_encoder.py"):
+        embedder(["python"])
+
+
+def test_export_of_another_model_is_rejected(tmp_path):
+    (tmp_path / CONFIG_FILE).write_text(json.dumps({"model_name": "all-mpnet-base-v2"}), encoding="utf-8")
+    with pytest.raises(ValueError, match="all-mpnet-base-v2"):
+        OnnxEmbedder("all-MiniLM-L6-v2", str(tmp_path)).load()
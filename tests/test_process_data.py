@@ -0,0 +1,103 @@
+"""
+PDF processing cache: keyed by content, chunking parameters and token counting mode
+"""
+
+import json
+
+import pytest
+
+from conftest import EstimatingCounter
+
+pytest.importorskip("PyPDF2")
+import process_data  # noqa: E402
+
+PAGES = ["EXPERIENCE\nBuilt a retrieval service in Python. Deployed it on AWS.", "SKILLS\nPython, PyTorch"]
+
+
+class ExactCounter(EstimatingCounter):
+    """Counts like the estimate, but reports itself as the model's tokenizer"""
+
+    @property
+    def exact(self) -> bool:
+        return True
+
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    monkeypatch.setattr(process_data, "iter_pdf_pages", lambda path: iter(PAGES))
+    path = tmp_path / "resume.pdf"
+    path.write_bytes(b"%PDF-1.4 resume")
+    return path
+
+
+def process(pdf, counter, monkeypatch, **kwargs):
+    monkeypatch.setattr(process_data, "get_token_counter", lambda name: counter)
+    result = process_data.process_pdf(pdf, pdf.parent, **kwargs)
+    with open(result["cache_path"], encoding="utf-8") as f:
+        return result, json.load(f)
+
+
+def test_unchanged_pdf_is_served_from_the_cache(pdf, monkeypatch):
+    first, doc = process(pdf, ExactCounter("test-model"), monkeypatch)
+    again, _ = process(pdf, ExactCounter("test-model"), monkeypatch)
+    assert not first["cached"] and again["cached"]
+    assert again["cache_path"] == first["cache_path"]
+    assert doc["tokenizer"] == "test-model"
+    assert all(chunk["tokens"] for chunk in doc["resume_chunks"])
+
+    other, _ = process(pdf, ExactCounter("test-model"), monkeypatch, chunk_tokens=64)
+    assert not other["cached"] and other["cache_path"] != first["cache_path"]
+
+
+def test_estimated_counts_are_cached_apart_and_not_stored(pdf, monkeypatch):
+    estimated, doc = process(pdf, EstimatingCounter("test-model"), monkeypatch)
+    exact, _ = process(pdf, ExactCounter("test-model"), monkeypatch)
+
+    # A tokenizer that becomes available later does not reuse the estimates
+    assert not exact["cached"] and exact["cache_path"] != estimated["cache_path"]
+    assert doc["tokenizer"] == "approximate"
+    assert doc["resume_chunks"] and all(chunk["tokens"] is None for chunk in doc["resume_chunks"])
+
+
+def test_pages_are_read_once_and_streamed_into_the_cache(pdf, monkeypatch):
+    reads = []
+
+    def pages(path):
+        for page in PAGES:
+            reads.append(page)
+            yield page
+
+    monkeypatch.setattr(process_data, "iter_pdf_pages", pages)
+    _, doc = process(pdf, ExactCounter("test-model"), monkeypatch)
+    assert reads == PAGES
+    assert doc["source"] == "resume.pdf"
+    assert doc["text"] == " ".join(map(process_data.clean_text, PAGES))
+    assert doc["training_chunks"] == [doc["text"]]  # shorter than one training chunk
+    assert [chunk["text"] for chunk in doc["resume_chunks"]] == [
+        "EXPERIENCE Built a retrieval service in Python. Deployed it on AWS. SKILLS Python, PyTorch"
+    ]
+
+
+def test_unreadable_pdf_is_not_cached(pdf, monkeypatch):
+    def pages(path):
+        yield PAGES[0]
+        raise ValueError("cryptography is required for AES encrypted PDFs")
+
+    monkeypatch.setattr(process_data, "get_token_counter", lambda name: ExactCounter("test-model"))
+    monkeypatch.setattr(process_data, "iter_pdf_pages", pages)
+    failed = process_data.process_pdf(pdf, pdf.parent)
+    assert failed["cache_path"] is None and "cryptography" in failed["error"]
+    assert list(pdf.parent.glob("*.json")) == list(pdf.parent.glob("*.tmp")) == []
+
+    # Read again once the cause is fixed
+    monkeypatch.setattr(process_data, "iter_pdf_pages", lambda path: iter(PAGES))
+    fixed, doc = process(pdf, ExactCounter("test-model"), monkeypatch)
+    assert not fixed["cached"] and fixed["error"] is None
+    assert doc["text"] == " ".join(map(process_data.clean_text, PAGES))
+
+
+def test_word_windows_overlap():
+    words = [f"w{i}" for i in range(10)]
+    chunks = list(process_data.iter_chunks(iter(words), chunk_size=4, overlap=1))
+    assert chunks[:3] == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+    assert all(len(chunk.split()) <= 4 for chunk in chunks)
@@ -0,0 +1,101 @@
+"""
+Prompt assembly under the token budget
+"""
+
+import pytest
+
+from conftest import EstimatingCounter
+from prompt_builder import PromptBuilder, TokenCounter, dedupe_chunks
+
+
+def words(prefix: str, n: int) -> str:
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def chunk(text: str, tokens=None) -> dict:
+    return {"id": text[:8], "text": text, "metadata": {"tokens": tokens} if tokens else {}}
+
+
+@pytest.fixture
+def counter():
+    return EstimatingCounter()
+
+
+def builder(counter, token_budget=200, history_budget=60):
+    return PromptBuilder("You are a helpful assistant.", token_budget=token_budget,
+                         history_budget=history_budget, counter=counter)
+
+
+def test_prompt_tokens_count_the_whole_prompt(counter):
+    built = builder(counter).build(
+        "What languages do you know?",
+        [chunk(words("a", 20)), chunk(words("b", 20))],
+        [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "Hello!"}]
+    )
+    assert built["prompt_tokens"] == counter.count(built["prompt"])
+    assert (built["context_chunks"], built["history_turns"]) == (2, 2)
+    assert built["prompt"].endswith("Question: What languages do you know?\n\nAnswer:")
+
+
+def test_lowest_ranked_chunks_are_dropped_first(counter):
+    chunks = [chunk(words("a", 60)), chunk(words("b", 60)), chunk(words("c", 60)), chunk(words("d", 60))]
+    built = builder(counter).build("Question?", chunks)
+
+    assert built["prompt_tokens"] <= 200
+    assert built["prompt_tokens"] == counter.count(built["prompt"])
+    assert "a59" in built["prompt"] and "b59" in built["prompt"]
+    assert "d0" not in built["prompt"]
+    assert built["dropped_chunks"] == len(chunks) - built["context_chunks"] >= 1
+
+
+def test_long_question_is_cut_to_the_budget(counter):
+    built = builder(counter).build(words("q", 1000), [chunk(words("a", 50))])
+
+    assert built["question_truncated"]
+    assert built["prompt_tokens"] <= 200
+    assert built["prompt_tokens"] == counter.count(built["prompt"])
+    assert "q0 q1" in built["prompt"] and "q999" not in built["prompt"]
+    assert built["prompt"].endswith("\n\nAnswer:")
+
+
+def test_newest_history_turns_are_kept(counter):
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "content": words(f"t{i}_", 15)} for i in range(10)]
+    built = builder(counter, history_budget=40).build("Question?", [], history)
+
+    assert built["history_turns"] == 2
+    assert "t9_0" in built["prompt"] and "t8_0" in built["prompt"] and "t7_0" not in built["prompt"]
+    assert built["prompt_tokens"] == counter.count(built["prompt"])
+
+
+def test_indexed_counts_are_recounted_when_estimating(counter):
+    # Indexed counts come from the embedding tokenizer; an estimating counter must not trust them
+    built = builder(counter).build("Question?", [chunk(words("a", 300), tokens=10)])
+    assert built["prompt_tokens"] <= 200
+    assert built["prompt_tokens"] == counter.count(built["prompt"])
+
+
+def test_indexed_counts_are_used_with_the_tokenizer(tmp_path):
+    tokenizers = pytest.importorskip("tokenizers")
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel({"[UNK]": 0}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer.save(str(model_dir / "tokenizer.json"))
+
+    counter = TokenCounter(model_name=str(model_dir))
+    assert counter.exact
+    text = words("a", 40)
+    assert counter.count(text) == 40
+    built = builder(counter).build("Question?", [chunk(text, tokens=25)])
+    # Same unit, so the indexed count (25) is taken as is instead of recounting (40)
+    assert built["prompt_tokens"] == counter.count(built["prompt"]) - 15
+
+
+def test_overlapping_chunks_are_deduplicated():
+    first = words("w", 30)
+    second = words("w", 40)[len(words("w", 20)) + 1:]  # w20..w39: overlaps first by 10 words
+    entries = dedupe_chunks([chunk(first, tokens=30), chunk(second, tokens=20), chunk(words("w", 5))])
+
+    assert len(entries) == 2  # the third is contained in the first
+    assert entries[1]["text"] == words("w", 40)[len(words("w", 30)) + 1:]
+    assert entries[1]["tokens"] == 10
@@ -0,0 +1,102 @@
+"""
+Cross-encoder rerank stage: reordering, the per-request scoring budget and fallbacks to the retriever's order
+"""
+
+import numpy as np
+import pytest
+
+import reranker as reranker_module
+from embeddings import ResumeRAG
+from reranker import CrossEncoderReranker
+
+PAIR_MS = 10  # simulated scoring time per (query, candidate) pair
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCrossEncoder:
+    """Scores a pair by the number of query words in the candidate, taking PAIR_MS per pair on `clock`"""
+
+    def __init__(self, clock, error=None):
+        self.clock = clock
+        self.error = error
+        self.scored = []
+
+    def predict(self, pairs, batch_size, convert_to_numpy, show_progress_bar):
+        if self.error:
+            raise self.error
+        self.scored.extend(pairs)
+        self.clock.now += len(pairs) * PAIR_MS / 1000
+        return np.array([len(set(query.lower().split()) & set(text.lower().split())) for query, text in pairs],
+                        dtype=np.float32)
+
+
+@pytest.fixture
+def make_reranker(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(reranker_module.time, "perf_counter", clock)
+
+    def make_reranker(**settings):
+        reranker = CrossEncoderReranker(**dict(dict(candidates=3, budget_ms=0, batch_size=2), **settings))
+        reranker._model = FakeCrossEncoder(clock)
+        return reranker
+    return make_reranker
+
+
+def candidates(*texts):
+    return [{"id": f"doc{i}", "text": text, "distance": 0.1 * i} for i, text in enumerate(texts)]
+
+
+QUERIES = ["python aws", "where study"]
+CANDIDATES = [
+    candidates("studied at a university", "python on aws", "python notebooks"),
+    candidates("python on aws", "where did Jai study", "study groups"),
+]
+
+
+def test_candidates_are_reordered_by_score(make_reranker):
+    reranker = make_reranker()
+    first, second = reranker.rerank_many(QUERIES, CANDIDATES, top_k=2)
+    assert [result["text"] for result in first] == ["python on aws", "python notebooks"]
+    assert [result["rerank_score"] for result in first] == [2.0, 1.0]
+    assert [result["id"] for result in second] == ["doc1", "doc2"]
+    stats = reranker.stats()
+    assert (stats["queries"], stats["reranked"], stats["fallbacks"]) == (2, 2, 0)
+    assert stats["ms_per_pair"] == pytest.approx(PAIR_MS)
+
+
+def test_budget_only_scores_queries_that_fit(make_reranker):
+    reranker = make_reranker(budget_ms=50)
+    reranker._pair_s = PAIR_MS / 1000  # measured on an earlier request
+    first, second = reranker.rerank_many(QUERIES, CANDIDATES, top_k=2)
+    assert len(reranker._model.scored) == 3  # five pairs fit: only the first query's three
+    assert first[0]["text"] == "python on aws"
+    assert second == CANDIDATES[1][:2]  # retriever's order, unscored
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_first_call_is_planned_from_a_calibration_pass(make_reranker):
+    reranker = make_reranker(budget_ms=35)
+    first, second = reranker.rerank_many(QUERIES, CANDIDATES, top_k=2)
+    # Two untimed and two timed pairs at the maximum length seed 10 ms per pair: three more fit
+    calibration, scored = reranker._model.scored[:4], reranker._model.scored[4:]
+    assert all(len(text.split()) == 2 * reranker.max_length for _, text in calibration)
+    assert len(scored) == 3
+    assert first[0]["text"] == "python on aws" and second == CANDIDATES[1][:2]
+    assert reranker.stats()["fallbacks"] == 1
+
+
+def test_query_keeps_retrieval_order_when_reranking_fails(make_reranker, fake_embedder, data_dir):
+    reranker = make_reranker()
+    reranker._model.error = RuntimeError("model crashed")
+    rag = ResumeRAG(data_dir=str(data_dir), vector_store="numpy", embedding_fn=fake_embedder, reranker=reranker)
+    question = "What did Jai deploy on AWS?"
+    assert rag.query(question, top_k=2) == rag.query(question, top_k=2, rerank=False)
+    stats = reranker.stats()
+    assert (stats["errors"], stats["fallbacks"]) == (1, 1)
@@ -0,0 +1,170 @@
+"""
+LLM circuit breaker and retry wrapper, and closing the Gemini client's connections
+"""
+
+import asyncio
+
+import pytest
+
+import resilience
+from llm import FakeLLM, GeminiLLM, LLMError
+from resilience import CircuitBreaker, LLMUnavailable, ResilientLLM
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_success()  # resets the streak
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.times_opened == 1
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # the trial is in flight
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 29
+    assert not breaker.allow()
+    clock[0] += 1
+    assert breaker.allow()
+
+
+def test_released_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+class FlakyLLM(FakeLLM):
+    """FakeLLM whose first `failures` calls raise `error`"""
+
+    def __init__(self, failures: int, error: Exception):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    async def agenerate(self, prompt, generation_config=None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return await super().agenerate(prompt, generation_config)
+
+
+def resilient(backend, **kwargs):
+    settings = dict(timeout=5, deadline=10, retries=2, backoff=0, hedge=False)
+    settings.update(kwargs)
+    return ResilientLLM(backend, **settings)
+
+
+def test_transient_failures_are_retried():
+    backend = FlakyLLM(failures=2, error=LLMError("503", retryable=True))
+    llm = resilient(backend)
+    assert asyncio.run(llm.agenerate("Question: hi\n\nAnswer:"))
+    assert backend.calls == 3
+    assert llm.counts["retries"] == 2
+    assert llm.breaker.state == "closed"
+
+
+def test_permanent_failure_is_raised_without_tripping_the_breaker():
+    backend = FlakyLLM(failures=1, error=LLMError("400 bad request"))
+    llm = resilient(backend, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(LLMError) as raised:
+        asyncio.run(llm.agenerate("prompt"))
+    assert not isinstance(raised.value, LLMUnavailable)
+    assert backend.calls == 1
+    assert llm.breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast():
+    backend = FlakyLLM(failures=100, error=LLMError("503", retryable=True))
+    llm = resilient(backend, retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            asyncio.run(llm.agenerate("prompt"))
+    assert llm.breaker.state == "open"
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(llm.agenerate("prompt"))
+    assert backend.calls == 2
+    assert llm.counts["rejected"] == 1
+
+
+class SlowFirstLLM(FakeLLM):
+    """FakeLLM whose first call hangs, so a hedge answers"""
+
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.calls = 0
+
+    async def agenerate(self, prompt, generation_config=None):
+        self.calls += 1
+        if self.calls == 1:
+            await asyncio.sleep(5)
+        return await super().agenerate(prompt, generation_config)
+
+
+def test_hedged_request_counts_as_an_upstream_attempt():
+    backend = SlowFirstLLM()
+    llm = resilient(backend, hedge=True, hedge_min_delay=0.01)
+    llm._latencies.extend([0.001] * 20)  # enough history to hedge
+    assert asyncio.run(llm.agenerate("Question: hi\n\nAnswer:"))
+    assert backend.calls == 2
+    assert (llm.counts["attempts"], llm.counts["hedges"], llm.counts["hedge_wins"]) == (2, 1, 1)
+
+
+def test_gemini_aclose_closes_every_client():
+    pytest.importorskip("httpx")
+    llm = GeminiLLM(api_key="test", base_url="http://127.0.0.1:9")
+    llm.warm()
+    sync_client = llm._client
+
+    async def open_and_close():
+        async_client = llm._async_client()
+        await ResilientLLM(llm).aclose()
+        return async_client
+
+    async_client = asyncio.run(open_and_close())
+    assert sync_client.is_closed and async_client.is_closed
+    assert llm._client is None and not llm._async_clients
+
+
+def test_gemini_candidate_without_content_is_an_error():
+    blocked = {"candidates": [{"finishReason": "SAFETY", "index": 0}]}
+    with pytest.raises(LLMError, match="SAFETY") as error:
+        GeminiLLM._text(blocked)
+    assert not error.value.retryable
+    assert GeminiLLM._text(blocked, partial=True) == ""  # a stream's closing chunk
+    assert GeminiLLM._text({"candidates": [{"content": {"parts": [{"text": "Hi"}]}}]}) == "Hi"
@@ -0,0 +1,106 @@
+"""
+Semantic response cache: lookup key, eviction and invalidation
+"""
+
+import numpy as np
+import pytest
+
+import response_cache
+from response_cache import SemanticCache
+
+
+def unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+QUESTION = unit(1.0, 0.0, 0.0)
+PARAPHRASE = unit(1.0, 0.1, 0.0)  # cosine ~0.995
+OTHER_QUESTION = unit(0.0, 1.0, 0.0)
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(threshold=0.95, max_entries=10, ttl=60, max_bytes=1 << 20)
+
+
+def test_similar_question_with_same_sources_hits(cache):
+    cache.put(QUESTION, ["a", "b"], "answer", ["source"], index_version=1)
+
+    assert cache.get(PARAPHRASE, ["b", "a"], index_version=1) == {"response": "answer", "sources": ["source"]}
+    assert cache.get(OTHER_QUESTION, ["a", "b"], index_version=1) is None
+    assert cache.get(QUESTION, ["a", "c"], index_version=1) is None  # other context, other prompt
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_index_change_invalidates(cache):
+    cache.put(QUESTION, ["a"], "answer", [], index_version=1)
+
+    assert cache.get(QUESTION, ["a"], index_version=2) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.invalidations == 1
+
+
+def test_entries_expire(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache.put(QUESTION, ["a"], "answer", [])
+
+    now[0] += 59
+    assert cache.get(QUESTION, ["a"]) is not None
+    now[0] += 2
+    assert cache.get(QUESTION, ["a"]) is None
+
+
+def test_least_recently_used_is_evicted(cache):
+    cache.max_entries = 2
+    cache.put(QUESTION, ["a"], "first", [])
+    cache.put(OTHER_QUESTION, ["b"], "second", [])
+    cache.get(QUESTION, ["a"])  # now the most recently used
+    cache.put(unit(0.0, 0.0, 1.0), ["c"], "third", [])
+
+    assert cache.get(QUESTION, ["a"])["response"] == "first"
+    assert cache.get(OTHER_QUESTION, ["b"]) is None
+    assert cache.evictions == 1
+
+
+def test_best_match_within_the_source_bucket(cache):
+    cache.put(OTHER_QUESTION, ["a"], "other", [])
+    cache.put(PARAPHRASE, ["a"], "paraphrase", [])
+    cache.put(QUESTION, ["b"], "exact, other sources", [])
+    cache.put(QUESTION, ["a"], "exact", [])
+    cache.max_entries = 3
+    cache.put(OTHER_QUESTION, ["c"], "evicts the two oldest", [])
+
+    assert cache.get(QUESTION, ["a"])["response"] == "exact"
+    assert cache.get(OTHER_QUESTION, ["a"]) is None  # evicted, from its bucket too
+    assert sorted(len(bucket["keys"]) for bucket in cache._buckets.values()) == [1, 1, 1]
+
+
+def test_byte_budget(cache):
+    cache.max_bytes = 200
+    cache.put(QUESTION, ["a"], "x" * 500, [])  # larger than the whole cache: not stored
+    assert cache.stats()["entries"] == 0
+
+    cache.put(QUESTION, ["a"], "x" * 100, [])
+    cache.put(OTHER_QUESTION, ["b"], "y" * 100, [])
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] <= 200
+
+
+def test_app_cache_key(monkeypatch):
+    import app
+
+    class Rag:
+        index_version = 7
+
+    monkeypatch.setattr(app, "rag_system", Rag())
+    monkeypatch.setattr(app, "response_cache", SemanticCache())
+    chunks = [{"id": "chunk_1"}, {"id": "chunk_2"}]
+
+    key = app.cache_key([], QUESTION, chunks)
+    assert key["source_ids"] == ["chunk_1", "chunk_2"]
+    assert key["index_version"] == 7
+    # Follow-ups depend on the conversation; without an embedding there is nothing to match
+    assert app.cache_key([{"role": "user", "content": "hi"}], QUESTION, chunks) is None
+    assert app.cache_key([], None, chunks) is None
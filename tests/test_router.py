@@ -0,0 +1,68 @@
+"""
+Message routing: small talk, curated Q&A matches and retrieval
+"""
+
+import pytest
+
+from conftest import QA_PAIRS
+from embeddings import ResumeRAG
+from router import QueryRouter
+
+
+@pytest.fixture
+def router(fake_embedder):
+    router = QueryRouter(threshold=0.8)
+    router.load(QA_PAIRS + [{"question": "No answer", "answer": ""}], fake_embedder)
+    return router
+
+
+@pytest.mark.parametrize("message", ["hi", "Hello there!", "thanks jai", "Good morning", "Bye!"])
+def test_small_talk(router, message):
+    assert router.is_small_talk(message)
+
+
+@pytest.mark.parametrize("message", ["hi, what languages do you know?", "Where are you based?", "thanks for the Python tips"])
+def test_questions_are_not_small_talk(router, message):
+    assert not router.is_small_talk(message)
+
+
+def test_exact_question_matches_without_embedding(router, fake_embedder):
+    match = router.match_qa("  what programming LANGUAGES do you know ")
+    assert match["answer"] == QA_PAIRS[0]["answer"]
+    assert match["similarity"] == 1.0
+    assert fake_embedder.calls == 0  # loading and exact matches embed nothing
+    assert router.stats()["qa_pairs"] == 2  # pairs without an answer are skipped
+
+
+def test_semantic_match_uses_the_threshold(router, fake_embedder):
+    paraphrase = "Which programming languages do you know?"
+    match = router.match_qa(paraphrase, fake_embedder.embed(paraphrase))
+    assert match["question"] == QA_PAIRS[0]["question"]
+    assert 0.8 <= match["similarity"] < 1.0
+
+    assert router.match_qa("Tell me about your hobbies", fake_embedder.embed("Tell me about your hobbies")) is None
+    assert router.match_qa(paraphrase) is None  # no embedding: exact matches only
+    assert fake_embedder.calls == len(QA_PAIRS)  # questions embedded once, on the first semantic match
+
+
+def test_disabled_router_routes_everything_to_retrieval(fake_embedder):
+    router = QueryRouter(enabled=False)
+    router.load(QA_PAIRS, fake_embedder)
+    assert not router.is_small_talk("hi")
+    assert router.match_qa(QA_PAIRS[0]["question"]) is None
+
+
+def test_app_routes_each_message(monkeypatch, fake_embedder, data_dir):
+    import app
+
+    rag = ResumeRAG(data_dir=str(data_dir), vector_store="numpy", embedding_fn=fake_embedder)
+    router = QueryRouter()
+    router.load(rag.qa_pairs, rag.embedding_fn)
+    monkeypatch.setattr(app, "rag_system", rag)
+    monkeypatch.setattr(app, "router", router)
+
+    plans = app.route_messages(["Hello!", "Where are you based?", "What did Jai deploy on AWS?"])
+    assert [plan["route"] for plan in plans] == ["smalltalk", "qa", "rag"]
+    assert plans[1]["qa"]["answer"] == QA_PAIRS[1]["answer"]
+    assert plans[2]["chunks"] and plans[2]["embedding"] is not None
+    assert not plans[0]["chunks"] and not plans[1]["chunks"]
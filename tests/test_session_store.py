@@ -0,0 +1,86 @@
+"""
+Session stores: per-session ring buffer and least recently used eviction, in memory and in SQLite
+"""
+
+import itertools
+
+import pytest
+
+import session_store
+from session_store import MemorySessionStore, SQLiteSessionStore, create_session_store, turn_size
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path, monkeypatch):
+    # Distinct, increasing timestamps so SQLite's last_used order is deterministic
+    clock = itertools.count(1)
+    monkeypatch.setattr(session_store.time, "time", lambda: float(next(clock)))
+
+    def make_store(**limits):
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions" / "sessions.db"), **limits)
+        return MemorySessionStore(**limits)
+    return make_store
+
+
+def turns(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": content} for i, content in enumerate(contents)]
+
+
+def test_sessions_keep_their_newest_turns(make_store):
+    store = make_store(max_turns=3)
+    assert store.get("a") == []
+    store.append("a", turns("q1", "a1"))
+    store.append("a", turns("q2", "a2"))
+    assert store.get("a") == [
+        {"role": "assistant", "content": "a1"},
+        {"role": "user", "content": "q2"},
+        {"role": "assistant", "content": "a2"},
+    ]
+    assert store.stats()["bytes"] == turn_size("a1") + turn_size("q2") + turn_size("a2")
+
+
+def test_least_recently_used_session_is_evicted(make_store):
+    store = make_store(max_sessions=2)
+    store.append("a", turns("qa"))
+    store.append("b", turns("qb"))
+    store.get("a")  # "b" is now the least recently used
+    store.append("c", turns("qc"))
+    assert store.get("b") == []
+    assert [turn["content"] for turn in store.get("a") + store.get("c")] == ["qa", "qc"]
+    stats = store.stats()
+    assert (stats["sessions"], stats["evictions"]) == (2, 1)
+
+
+def test_byte_limit_evicts_oldest_but_keeps_the_current_session(make_store):
+    store = make_store(max_bytes=2 * turn_size("x" * 100))
+    store.append("a", turns("x" * 100))
+    store.append("b", turns("y" * 100))
+    store.append("c", turns("z" * 100))
+    assert store.get("a") == []
+    assert store.stats()["sessions"] == 2
+
+    store.append("big", turns("w" * 1000))  # over the limit alone: kept, everything else evicted
+    assert store.stats()["sessions"] == 1
+    assert store.get("big")
+
+
+def test_clear(make_store):
+    store = make_store()
+    store.append("a", turns("q1"))
+    assert store.clear("a") is True
+    assert store.clear("a") is False
+    assert store.get("a") == []
+    assert store.stats()["bytes"] == 0
+
+
+def test_sqlite_sessions_are_shared_between_connections(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SQLiteSessionStore(path).append("a", turns("q1", "a1"))
+    assert len(SQLiteSessionStore(path).get("a")) == 2
+
+
+def test_create_session_store_rejects_unknown_backends():
+    assert isinstance(create_session_store("memory"), MemorySessionStore)
+    with pytest.raises(ValueError):
+        create_session_store("redis")
@@ -0,0 +1,67 @@
+"""
+BM25 keyword index and reciprocal rank fusion
+"""
+
+import math
+
+import pytest
+
+from sparse_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = {
+    "python": ("Built data pipelines in Python and pandas at Acme.", {"type": "experience"}),
+    "node": ("Wrote Node.js services; some C++ for the GPT-2 demo.", {"type": "project"}),
+    "cloud": ("Deployed Python services to AWS with Docker, Python everywhere.", {"type": "experience"}),
+    "school": ("Studied computer science at the university.", {"type": "education"}),
+}
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.build(list(DOCUMENTS), [text for text, _ in DOCUMENTS.values()], [meta for _, meta in DOCUMENTS.values()])
+    return index
+
+
+def test_tokenize_keeps_tech_terms_and_drops_stopwords():
+    assert tokenize("What does Jai know about Node.js, C++ and GPT-2?") == ["jai", "node.js", "c++", "gpt-2"]
+
+
+def test_search_ranks_by_bm25(index):
+    results = index.search("python experience", top_k=3)
+    assert [result["id"] for result in results] == ["cloud", "python"]  # higher term frequency wins
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert results[0]["distance"] is None and results[0]["metadata"] == {"type": "experience"}
+
+
+def test_scores_match_okapi_formula(index):
+    k1, b = index.k1, index.b
+    lengths = [len(tokenize(text)) for text, _ in DOCUMENTS.values()]
+    avg_length = sum(lengths) / len(lengths)
+    idf = math.log(1 + (4 - 1 + 0.5) / (1 + 0.5))  # "aws" appears in one document
+    expected = idf * 1 * (k1 + 1) / (1 + k1 * (1 - b + b * lengths[2] / avg_length))
+    assert index.search("AWS")[0]["score"] == pytest.approx(expected, rel=1e-5)
+
+
+def test_search_filters_and_limits(index):
+    assert [r["id"] for r in index.search("python services", top_k=1)] == ["cloud"]
+    assert [r["id"] for r in index.search("services", where={"type": "project"})] == ["node"]
+    assert index.search("services", where={"type": "education"}) == []
+    assert index.search("the and of") == []
+    assert index.search("kubernetes") == []
+
+
+def test_empty_index():
+    index = BM25Index()
+    index.build([], [], [])
+    assert index.search("python") == []
+
+
+def test_reciprocal_rank_fusion():
+    dense = [{"id": "a", "distance": 0.1}, {"id": "b", "distance": 0.2}, {"id": "c", "distance": 0.3}]
+    sparse = [{"id": "b", "distance": None, "score": 4.0}, {"id": "c", "distance": None, "score": 2.0}]
+    fused = reciprocal_rank_fusion([dense, sparse], top_k=2, k=60)
+    assert [result["id"] for result in fused] == ["b", "c"]  # found by both retrievers
+    assert fused[0]["distance"] == 0.2  # fields come from the first list
+    assert fused[0]["rrf_score"] == round(1 / 62 + 1 / 61, 6)
+    assert "rrf_score" not in dense[1]
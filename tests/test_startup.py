@@ -0,0 +1,139 @@
+"""
+Startup phases: readiness, degraded warm-up, and a failed LLM load seen by /health and /chat
+"""
+
+import asyncio
+
+import pytest
+
+import app
+from llm import FakeLLM
+from startup import StartupTracker
+
+
+def fail(message):
+    raise OSError(message)
+
+
+def test_phases_report_readiness():
+    async def run():
+        tracker = StartupTracker("llm", "rag", "warmup", optional=("warmup",))
+        tracker.begin()
+        assert await tracker.wait("llm", 0.01) is False  # not started yet
+        assert await tracker.run_phase("llm", lambda: "client") == "client"
+        await tracker.run_phase("rag", fail, "no index")
+        tracker.skip_phase("warmup")
+        return tracker
+
+    tracker = asyncio.run(run())
+    assert not tracker.ready
+    assert tracker.failed == ["rag"] and not tracker.degraded
+    snapshot = tracker.snapshot()
+    assert snapshot["phases"]["llm"]["state"] == "done"
+    assert snapshot["phases"]["rag"]["error"] == "OSError: no index"
+    assert snapshot["phases"]["warmup"]["state"] == "skipped"
+
+
+def test_failed_optional_phase_leaves_the_service_ready_but_degraded():
+    async def run():
+        tracker = StartupTracker("llm", "warmup", optional=("warmup",))
+        tracker.begin()
+        await tracker.run_phase("llm", lambda: None)
+        await tracker.run_phase("warmup", fail, "cold")
+        return tracker, await tracker.wait("llm", 1), await tracker.wait("warmup", 1)
+
+    tracker, llm_ready, warmup_ready = asyncio.run(run())
+    assert tracker.ready and tracker.degraded == ["warmup"] and not tracker.failed
+    assert llm_ready is True and warmup_ready == "failed"
+
+
+def test_waiting_before_startup_begins_succeeds_immediately():
+    assert asyncio.run(StartupTracker("llm").wait("llm", 0)) is True
+
+
+def test_retry_reruns_a_failed_phase_at_most_once_per_interval():
+    attempts = []
+
+    def load():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise OSError("download failed")
+
+    async def run():
+        tracker = StartupTracker("llm", retry_interval=0)
+        tracker.begin()
+        await tracker.run_phase("llm", load)
+        first = await tracker.retry("llm", 1)
+        tracker.retry_interval = 60
+        throttled = await tracker.retry("llm", 1)
+        tracker.retry_interval = 0
+        return tracker, first, throttled, await tracker.retry("llm", 1)
+
+    tracker, first, throttled, last = asyncio.run(run())
+    assert (first, throttled, last) == ("failed", "failed", True)
+    assert len(attempts) == 3
+    assert tracker.ready and tracker.phases["llm"]["failures"] == 2
+
+
+class BrokenLLM(FakeLLM):
+    """FakeLLM whose load fails while `broken` is set"""
+
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.broken = True
+        self.loads = 0
+
+    def warm(self):
+        self.loads += 1
+        if self.broken:
+            raise OSError("LoRA adapter not found")
+
+
+@pytest.fixture
+def llm():
+    return BrokenLLM()
+
+
+@pytest.fixture
+def failed_startup(monkeypatch, client, rag):
+    """Startup that ran with the client's LLM, whose load failed"""
+    tracker = StartupTracker("llm", "rag", retry_interval=60)
+
+    async def initialize():
+        tracker.begin()
+        await asyncio.gather(tracker.run_phase("llm", app.llm_client.warm), tracker.run_phase("rag", lambda: rag))
+
+    asyncio.run(initialize())
+    monkeypatch.setattr(app, "startup", tracker)
+    return tracker
+
+
+def test_failed_llm_load_is_reported_and_retried(llm, client, failed_startup):
+    health = client.get("/health").json()
+    assert health["status"] == "failed" and not health["ready"]
+    assert health["startup"]["failed"] == ["llm"]
+    assert client.get("/ready").status_code == 503
+
+    # A real error, not "starting up": the load is not retried within the interval
+    response = client.post("/chat", json={"message": "What did Jai deploy on AWS?"})
+    assert response.status_code == 500
+    assert "LoRA adapter not found" in response.json()["detail"]
+    assert "retry-after" not in response.headers
+    assert llm.loads == 1
+
+    llm.broken = False
+    failed_startup.retry_interval = 0
+    response = client.post("/chat", json={"message": "What did Jai deploy on AWS?"})
+    assert response.status_code == 200 and not response.json()["metadata"]["degraded"]
+    assert llm.loads == 2
+    assert client.get("/health").json()["status"] == "healthy"
+
+
+def test_chat_during_startup_asks_the_client_to_retry(monkeypatch, client):
+    tracker = StartupTracker("llm", "rag")
+    tracker.begin()
+    monkeypatch.setattr(app, "startup", tracker)
+    monkeypatch.setattr(app, "STARTUP_WAIT_TIMEOUT", 0.01)
+    response = client.post("/chat", json={"message": "What did Jai deploy on AWS?"})
+    assert response.status_code == 503 and response.headers["retry-after"] == "5"
+    assert client.get("/health").json()["status"] == "starting"
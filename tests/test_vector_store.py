@@ -0,0 +1,210 @@
+"""
+Vector stores (NumPy and Chroma) and ResumeRAG's incremental, persisted index sync
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from conftest import QA_PAIRS, RESUME_CHUNKS, write_processed_data
+from embeddings import ResumeRAG
+from vector_store import NumpyStore, create_vector_store
+
+
+@pytest.fixture(params=["numpy", "chroma"])
+def backend(request):
+    if request.param == "chroma":
+        pytest.importorskip("chromadb")
+    return request.param
+
+
+DOCUMENTS = {
+    "python": ("Python and PyTorch for machine learning", {"type": "resume_chunk"}),
+    "aws": ("Deployed services on AWS with Docker", {"type": "resume_chunk"}),
+    "qa": ("Q: Where are you based? A: In the United States", {"type": "qa_pair"}),
+}
+
+
+def add_documents(store, embedder):
+    ids = list(DOCUMENTS)
+    store.add(ids=ids, documents=[DOCUMENTS[i][0] for i in ids], metadatas=[DOCUMENTS[i][1] for i in ids],
+              embeddings=embedder([DOCUMENTS[i][0] for i in ids]))
+
+
+def test_store_add_query_filter_delete(backend, fake_embedder, tmp_path):
+    store = create_vector_store(backend, "test", fake_embedder, str(tmp_path))
+    add_documents(store, fake_embedder)
+
+    assert store.count() == 3
+    assert store.existing_ids(["python", "missing"]) == {"python"}
+    top = store.query([fake_embedder.embed("machine learning in Python")], top_k=2)[0]
+    assert [match["id"] for match in top][0] == "python"
+    assert top[0]["distance"] <= top[1]["distance"]
+
+    filtered = store.query([fake_embedder.embed("machine learning in Python")], top_k=3, where={"type": "qa_pair"})
+    assert [match["id"] for match in filtered[0]] == ["qa"]
+
+    store.update_metadatas(["aws"], [{"type": "resume_chunk", "index": 7}])
+    assert store.get_metadatas()["aws"] == {"type": "resume_chunk", "index": 7}
+
+    store.delete(["python", "missing"])
+    assert store.count() == 2
+    assert "python" not in store.get_metadatas()
+
+
+def test_version_changes_with_documents_only(backend, fake_embedder, tmp_path):
+    store = create_vector_store(backend, "test", fake_embedder, str(tmp_path))
+    start = store.version
+    add_documents(store, fake_embedder)
+    store.delete(["aws"])
+    assert store.version == start + 2
+    store.set_metadata({"build": "1"})  # store metadata is not content
+    assert store.version == start + 2
+
+
+def test_store_rejects_duplicate_ids(fake_embedder):
+    store = NumpyStore("test", fake_embedder)
+    add_documents(store, fake_embedder)
+    with pytest.raises(ValueError):
+        store.add(ids=["aws"], documents=["again"], metadatas=[{}])
+    assert store.count() == 3
+
+
+def test_store_persists_round_trip(backend, fake_embedder, tmp_path):
+    store = create_vector_store(backend, "test", fake_embedder, str(tmp_path))
+    add_documents(store, fake_embedder)
+    store.set_metadata({"index_hash": "abc"})
+    before = store.query([fake_embedder.embed("AWS Docker")], top_k=3)[0]
+
+    reopened = create_vector_store(backend, "test", fake_embedder, str(tmp_path))
+    assert reopened.count() == 3
+    assert reopened.metadata["index_hash"] == "abc"
+    assert sorted(reopened.get_documents()[0]) == sorted(DOCUMENTS)
+    after = reopened.query([fake_embedder.embed("AWS Docker")], top_k=3)[0]
+    assert [match["id"] for match in after] == [match["id"] for match in before]
+
+
+def test_numpy_stores_sharing_a_directory_see_each_other(fake_embedder, tmp_path):
+    first = NumpyStore("test", fake_embedder, str(tmp_path))
+    second = NumpyStore("test", fake_embedder, str(tmp_path))
+
+    first.add(ids=["a"], documents=["alpha"], metadatas=[{}])
+    second.add(ids=["b"], documents=["beta"], metadatas=[{}])
+    assert first.count() == second.count() == 2
+    assert first.version == second.version
+
+    second.delete(["a"])
+    assert first.existing_ids(["a", "b"]) == {"b"}
+
+
+def test_numpy_batch_saves_once(fake_embedder, tmp_path, monkeypatch):
+    store = NumpyStore("test", fake_embedder, str(tmp_path))
+    saves = []
+    save = store._save
+    monkeypatch.setattr(store, "_save", lambda: saves.append(1) or save())
+
+    with store.batch():
+        for i in range(5):
+            store.add(ids=[f"doc{i}"], documents=[f"document {i}"], metadatas=[{}])
+        assert not saves
+    assert len(saves) == 1
+    assert NumpyStore("test", fake_embedder, str(tmp_path)).count() == 5
+
+
+def test_numpy_store_recovers_from_files_out_of_sync(fake_embedder, tmp_path):
+    store = NumpyStore("test", fake_embedder, str(tmp_path))
+    add_documents(store, fake_embedder)
+    # A crash between the two replaces in _save: new embeddings, old records
+    np.save(store.directory / "embeddings.npy", np.zeros((1, 8), dtype=np.float32))
+
+    def batch_then_read():
+        reopened = NumpyStore("test", fake_embedder, str(tmp_path))
+        with reopened.batch():
+            counts.append(reopened.count())
+            reopened.add(ids=["a"], documents=["alpha"], metadatas=[{}])
+        counts.append(reopened.count())
+
+    counts = []
+    thread = threading.Thread(target=batch_then_read, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "batch() deadlocked on the store's own file lock"
+    assert counts == [0, 1]
+    assert NumpyStore("test", fake_embedder, str(tmp_path)).count() == 1  # the next save repaired the files
+
+
+def test_numpy_query_during_add_sees_previous_rows(fake_embedder, monkeypatch):
+    store = NumpyStore("test", fake_embedder)
+    store.add(ids=["0"], documents=["document 0"], metadatas=[{"type": "x"}])
+    seen = []
+    append = store._append
+
+    def append_then_query(*args):
+        # A reader running between the embeddings growing and the rest of the add
+        rows = append(*args)
+        seen.append(store.query([fake_embedder.embed("document")], top_k=5)[0])
+        return rows
+
+    monkeypatch.setattr(store, "_append", append_then_query)
+    store.add(ids=["1"], documents=["document 1"], metadatas=[{"type": "x"}])
+    assert [match["id"] for match in seen[0]] == ["0"]
+    assert store.count() == 2
+
+
+# Incremental sync of the resume data (ResumeRAG)
+
+def open_rag(data_dir, persist_dir, embedder, backend):
+    return ResumeRAG(data_dir=str(data_dir), persist_dir=str(persist_dir), vector_store=backend,
+                     embedding_fn=embedder)
+
+
+def test_rag_reuses_persisted_index(backend, fake_embedder, data_dir, tmp_path):
+    rag = open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+    indexed = len(RESUME_CHUNKS) + len(QA_PAIRS)
+    assert rag.store.count() == indexed
+    assert fake_embedder.calls == indexed
+
+    fake_embedder.calls = 0
+    reopened = open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+    assert reopened.store.count() == indexed
+    assert fake_embedder.calls == 0
+    assert reopened.query("PyTorch machine learning", top_k=1)[0]["text"] == RESUME_CHUNKS[0]
+
+
+def test_rag_sync_embeds_only_changes(backend, fake_embedder, data_dir, tmp_path):
+    open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+
+    chunks = RESUME_CHUNKS[:2] + ["Jai mentors junior engineers."]
+    write_processed_data(data_dir, chunks=chunks)
+    fake_embedder.calls = 0
+    rag = open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+
+    assert rag.last_sync["embedded"] == 1
+    assert rag.last_sync["deleted"] == 1
+    assert fake_embedder.calls == 1
+    documents = rag.store.get_documents()[1]
+    assert "Jai mentors junior engineers." in documents
+    assert RESUME_CHUNKS[2] not in documents
+
+
+def test_rag_sync_keeps_ingested_documents(backend, fake_embedder, data_dir, tmp_path):
+    rag = open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+    report = rag.add_documents([{"text": "Jai speaks Telugu and English."}, {"text": "Jai speaks Telugu and English."}])
+    assert (report["added"], report["duplicates"]) == (1, 1)
+
+    write_processed_data(data_dir, chunks=RESUME_CHUNKS[:1])
+    rag = open_rag(data_dir, tmp_path / "index", fake_embedder, backend)
+    assert "Jai speaks Telugu and English." in rag.store.get_documents()[1]
+
+
+def test_rag_rebuilds_for_another_embedding_model(fake_embedder, data_dir, tmp_path):
+    open_rag(data_dir, tmp_path / "index", fake_embedder, "numpy")
+
+    class OtherEmbedder(type(fake_embedder)):
+        id = "other-embedder"
+
+    other = OtherEmbedder()
+    rag = open_rag(data_dir, tmp_path / "index", other, "numpy")
+    assert other.calls == rag.store.count() == len(RESUME_CHUNKS) + len(QA_PAIRS)
+    assert rag.store.metadata["embedding_model"] == "other-embedder"